@@ -1,367 +1,401 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, send_file, session, redirect, stream_with_context, url_for
 import joblib
 import numpy as np
 import logging
 import sqlite3
-import hashlib
 import secrets
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import re
 import json
 import base64
+import os
+import multiprocessing
+import atexit
+import time
+import zlib
+
+import click
+
+from export import EXPORT_FORMATS, EXPORT_MIMETYPES, ExportChunk, check_export_format, encode_export, export_chunks, ndjson_text
+from forecast_cube import ForecastCube, build_cube, save_cube
+from jobs import JobQueue
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from parallel_inference import InferenceExecutor
+from password_hashing import UNUSABLE_PASSWORD, HashingBusy, PasswordHasher
+from prediction_cache import PredictionCache
+from profiling import ProfileStore, RequestProfiler
+from request_logging import RequestLogger, annotate_request, parse_sample_rates, setup_async_logging
+from raster import RASTER_DTYPES, encode_raster, parse_bbox, raster_mesh, raster_shape
+from city_index import CityAutocomplete, CityIndex
+from tiles import TILE_FORMATS, TILE_SIZE, TileCache, encode_tile, tile_bounds, tile_etag, tile_pixel_centres, tiles_covering
+from spatial import CLIMATE_ZONES, GHANA_BOUNDS, NearestCityIndex, climate_zone_index, region_index
+from user_db import UserDatabase
+from write_behind import WriteBehindBuffer
+from tree_compiler import compile_gradient_boosting, compile_models, verify_compiled
+from model_artifact import compute_model_version, read_model_artifact, write_model_artifact
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)  # Generate a secure secret key
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: JSON lines written by a background thread (see request_logging.py)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+setup_async_logging(LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+# One record per request, sampled per endpoint (e.g. LOG_SAMPLE_RATES="predict_weather=0.1,static=0");
+# server errors and requests slower than LOG_SLOW_REQUEST_MS are always logged
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '1.0'))
+LOG_SAMPLE_RATES = parse_sample_rates(os.environ.get('LOG_SAMPLE_RATES', 'static=0'))
+LOG_SLOW_REQUEST_MS = float(os.environ.get('LOG_SLOW_REQUEST_MS', '1000'))
+request_logger = RequestLogger(LOG_SAMPLE_RATES, LOG_SAMPLE_RATE, LOG_SLOW_REQUEST_MS)
+request_logger.init_app(app)
+
+# Opt-in request profiling (see profiling.py). Requests sending X-Profile: <PROFILE_ADMIN_TOKEN>
+# or picked by PROFILE_SAMPLE_RATE run under cProfile; with PROFILE_SLOW_MS set, every request is
+# stack-sampled and kept if slower than that. The newest PROFILE_MAX_COUNT profiles are kept in
+# PROFILE_DIR and listed at /admin/profiles, which also requires the token.
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_ADMIN_TOKEN = os.environ.get('PROFILE_ADMIN_TOKEN')
+PROFILE_SLOW_MS = float(os.environ['PROFILE_SLOW_MS']) if os.environ.get('PROFILE_SLOW_MS') else None
+request_profiler = RequestProfiler(
+    ProfileStore(PROFILE_DIR, max_profiles=int(os.environ.get('PROFILE_MAX_COUNT', 50))),
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+    slow_ms=PROFILE_SLOW_MS,
+    token=PROFILE_ADMIN_TOKEN
+)
+request_profiler.init_app(app)
+
+# Trained model file, its compiled native artifact and the optional precomputed forecast cube
+MODEL_FILE = 'combined_weather_models_geo.joblib'
+MODEL_ARTIFACT_FILE = os.environ.get('MODEL_ARTIFACT_FILE', 'combined_weather_models_geo.skymodel')
+# Shared model store published by the gunicorn master (see gunicorn.conf.py and model_store.py)
+MODEL_STORE_PATH = os.environ.get('MODEL_STORE_PATH')
+FORECAST_CUBE_FILE = os.environ.get('FORECAST_CUBE_FILE', 'forecast_cube.npy')
+
 # Load the trained models for all weather conditions
 def load_model_with_compatibility():
-    """Load model with multiple compatibility fallbacks"""
+    """Load the legacy joblib model file"""
     import warnings
-    import pickle
-    import os
-    import sys
     
     warnings.filterwarnings('ignore', category=UserWarning)
     warnings.filterwarnings('ignore', category=FutureWarning)
     warnings.filterwarnings('ignore', category=DeprecationWarning)
     
-    model_file = 'combined_weather_models_geo.joblib'
+    model_file = MODEL_FILE
     
     if not os.path.exists(model_file):
         logger.error(f"Model file {model_file} not found!")
         return None
     
-    def log_environment_info():
-        """Log environment information for debugging"""
-        import platform
-        import sklearn
-        import joblib as jl
-        
-        logger.info("Environment Information:")
-        logger.info(f"Python: {sys.version}")
-        logger.info(f"Platform: {platform.platform()}")
-        logger.info(f"scikit-learn: {sklearn.__version__}")
-        logger.info(f"joblib: {jl.__version__}")
-        logger.info(f"numpy: {np.__version__}")
-        logger.info(f"pandas: {pd.__version__ if 'pd' in globals() else 'N/A'}")
-    
-    # Log environment info for debugging
-    log_environment_info()
-    
-    # Try multiple loading strategies
-    loading_strategies = [
-        ("joblib.load with latest", 
-         lambda: joblib.load(model_file)),
-         
-        ("joblib.load with mmap_mode='r'", 
-         lambda: joblib.load(model_file, mmap_mode='r')),
-         
-        ("joblib.load with mmap_mode=None", 
-         lambda: joblib.load(model_file, mmap_mode=None)),
-    ]
-    
-    # Try loading with different encodings if needed
     try:
-        import codecs
-        loading_strategies.extend([
-            (f"joblib.load with latin1 encoding", 
-             lambda: joblib.load(model_file, encoding='latin1')),
-                
-            (f"joblib.load with bytes encoding", 
-             lambda: joblib.load(model_file, encoding='bytes')),
-        ])
-    except Exception as e:
-        logger.warning(f"Could not add encoding-based loading strategies: {e}")
-    
-    # Try each loading strategy
-    for strategy_name, load_func in loading_strategies:
-        try:
-            logger.info(f"Trying to load model using {strategy_name}...")
-            model_data = load_func()
+        logger.info(f"Loading model from {model_file}...")
+        model_data = joblib.load(model_file)
+        
+        # Verify the loaded model has the expected structure
+        if model_data and isinstance(model_data, dict):
+            logger.info("✓ Model loaded successfully")
+            logger.info(f"Model contains predictions for: {list(model_data.keys())}")
+            return model_data
+        else:
+            logger.warning(f"Model loaded but unexpected format: {type(model_data)}")
+            return model_data
             
-            # Verify the loaded model has the expected structure
-            if model_data and isinstance(model_data, dict):
-                logger.info(f"✓ Model loaded successfully using {strategy_name}")
-                logger.info(f"Model contains predictions for: {list(model_data.keys())}")
-                return model_data
-            else:
-                logger.warning(f"Model loaded but unexpected format: {type(model_data)}")
-                
-        except Exception as e:
-            logger.warning(f"✗ {strategy_name} failed: {str(e)}")
-            continue
-    
-    # If all strategies failed, try a more robust approach
-    try:
-        logger.info("Trying fallback loading with error handling...")
-        with open(model_file, 'rb') as f:
-            model_data = joblib.load(f)
-            if model_data:
-                logger.info("✓ Model loaded successfully using fallback method")
-                return model_data
     except Exception as e:
-        logger.error(f"Fallback loading failed: {e}")
+        logger.error(f"✗ Loading {model_file} failed: {str(e)}")
     
-    logger.error("All model loading strategies failed!")
+    log_environment_info()
     logger.info("\nTroubleshooting tips:")
     logger.info("1. Check if all required packages are installed with correct versions")
     logger.info("2. The model might have been saved with a different version of scikit-learn")
     logger.info("3. Try recreating the model with the current environment")
     logger.info("4. Check if the model file is not corrupted")
+    logger.info(f"5. Convert the model once with 'flask --app app convert-model' to load {MODEL_ARTIFACT_FILE} instead")
     
     return None
 
+def log_environment_info():
+    """Log environment information for debugging a failed model load"""
+    import platform
+    import sys
+    
+    logger.info("Environment Information:")
+    logger.info(f"Python: {sys.version}")
+    logger.info(f"Platform: {platform.platform()}")
+    logger.info(f"joblib: {joblib.__version__}")
+    logger.info(f"numpy: {np.__version__}")
+    try:
+        import sklearn
+        logger.info(f"scikit-learn: {sklearn.__version__}")
+    except ImportError:
+        logger.info("scikit-learn: not installed")
+
+def load_native_models(model_file=MODEL_FILE):
+    """Load compiled models in one pass, or None if no valid artifact is available
+
+    A shared model store published by the server master (MODEL_STORE_PATH)
+    takes precedence over the artifact next to the app. When model_file
+    exists, artifacts converted from a different version of it are stale
+    and skipped, so the joblib file is loaded and compiled instead.
+    """
+    current_version = compute_model_version(model_file) if os.path.exists(model_file) else None
+    
+    for artifact_file in (MODEL_STORE_PATH, MODEL_ARTIFACT_FILE):
+        if not artifact_file or not os.path.exists(artifact_file):
+            continue
+        
+        try:
+            artifact = read_model_artifact(artifact_file)
+            if current_version is not None and artifact.model_version != current_version:
+                logger.warning(
+                    f"✗ {artifact_file} was converted from model version {artifact.model_version}, "
+                    f"but {model_file} is version {current_version} - ignoring it "
+                    f"(rerun 'flask --app app convert-model' to update it)"
+                )
+                continue
+            logger.info(f"✓ Loaded {len(artifact.models)} compiled models from {artifact_file}")
+            return artifact
+        except Exception as e:
+            logger.warning(f"✗ Could not load {artifact_file}: {e}")
+    
+    return None
+
+# Ghana climate data based on meteorological records
+GHANA_CLIMATE_DATA = {
+    # Monthly averages for different regions of Ghana
+    'coastal': {  # Southern Ghana (Accra, Cape Coast, Tema)
+        'temp_range': {'wet': (24, 30), 'dry': (26, 33)},
+        'humidity_range': {'wet': (75, 90), 'dry': (60, 80)},
+        'rainfall_monthly': [15, 56, 97, 137, 180, 279, 46, 15, 64, 64, 36, 23],  # mm per month
+        'wind_speed': {'wet': 3.5, 'dry': 4.2}
+    },
+    'forest': {  # Middle belt (Kumasi, Sunyani)
+        'temp_range': {'wet': (22, 28), 'dry': (24, 32)},
+        'humidity_range': {'wet': (80, 95), 'dry': (65, 85)},
+        'rainfall_monthly': [25, 76, 147, 167, 190, 229, 76, 25, 84, 84, 46, 33],
+        'wind_speed': {'wet': 2.8, 'dry': 3.5}
+    },
+    'savanna': {  # Northern Ghana (Tamale, Bolgatanga, Wa)
+        'temp_range': {'wet': (24, 32), 'dry': (28, 38)},
+        'humidity_range': {'wet': (70, 85), 'dry': (45, 70)},
+        'rainfall_monthly': [5, 10, 25, 76, 127, 178, 203, 229, 178, 51, 8, 3],
+        'wind_speed': {'wet': 4.2, 'dry': 5.5}
+    }
+}
+
+# Array versions of the climate data indexed by [zone, is_wet, ...] or [zone, month - 1],
+# with zones in the order of spatial.CLIMATE_ZONES
+_zones = [GHANA_CLIMATE_DATA[zone] for zone in CLIMATE_ZONES]
+TEMP_RANGE_TABLE = np.array([[zone['temp_range']['dry'], zone['temp_range']['wet']] for zone in _zones], dtype=float)
+HUMIDITY_RANGE_TABLE = np.array([[zone['humidity_range']['dry'], zone['humidity_range']['wet']] for zone in _zones], dtype=float)
+RAINFALL_MONTHLY_TABLE = np.array([zone['rainfall_monthly'] for zone in _zones], dtype=float)
+WIND_SPEED_TABLE = np.array([[zone['wind_speed']['dry'], zone['wind_speed']['wet']] for zone in _zones], dtype=float)
+del _zones
+
 # Enhanced weather model with improved accuracy using real weather patterns
-class EnhancedWeatherModel:
-    """Enhanced weather model with improved accuracy based on real climate data"""
+class FusedWeatherModel:
+    """Enhanced fallback model predicting every weather type in one pass
+
+    Everything that depends on a row's climate zone and month is gathered in
+    a single lookup, and the location hash is computed once per row and
+    shared by all targets.
+    """
     
-    def __init__(self, weather_type):
-        self.weather_type = weather_type
+    TARGETS = ('Tmax', 'Tmin', 'Rainfall', 'Relative_Humidity', 'Wind_Speed')
+    
+    # predict returns one record per row with a float field per target
+    OUTPUT_DTYPE = np.dtype([(target, np.float64) for target in TARGETS])
+    
+    # Reasonable values returned when a prediction fails
+    DEFAULTS = {
+        'Tmax': 30.0, 'Tmin': 22.0, 'Rainfall': 5.0,
+        'Relative_Humidity': 75.0, 'Wind_Speed': 3.5
+    }
+    
+    # Seasons and their wet factors, indexed by month (index 0 is unused)
+    SEASONS = ('dry_harmattan', 'pre_wet', 'wet_peak', 'post_wet', 'dry')
+    SEASON_WET_FACTORS = np.array([0.1, 0.3, 0.9, 0.5, 0.2])
+    SEASON_BY_MONTH = np.array([4, 0, 0, 1, 1, 2, 2, 2, 2, 2, 3, 3, 0])
+    
+    # Months index like a Python list, so -11..0 are accepted and treated as dry season
+    MIN_MONTH, MAX_MONTH = -11, 12
+    
+    # Per-zone adjustments (coastal, forest, savanna); adding 0 or scaling by 1 leaves values unchanged
+    TMAX_ZONE_OFFSET = np.array([-1.0, 0.0, 2.0])       # Coastal areas are cooler, savanna is hotter
+    TMIN_ZONE_OFFSET = np.array([1.0, 0.0, 1.5])        # Coastal areas and savanna have higher minimums
+    RAINFALL_ZONE_FACTOR = np.array([1.2, 1.0, 1.0])    # Coastal areas get more rain
+    HUMIDITY_ZONE_OFFSET = np.array([8.0, 5.0, -10.0])  # Coastal bonus, forest bonus, savanna penalty
+    WIND_ZONE_FACTOR = np.array([1.3, 1.0, 1.2])        # Coastal areas and open savanna are windier
+    
+    # Per-season adjustments (see SEASONS): the Harmattan is hotter and windier, the wet peak cooler
+    TMAX_SEASON_OFFSET = np.array([3.0, 0.0, -2.0, 0.0, 0.0])
+    TMAX_SEASON_VARIATION = np.array([2.0, 1.5, 1.0, 1.5, 1.5])
+    TMIN_SEASON_OFFSET = np.array([2.0, 0.0, -1.0, 0.0, 0.0])
+    TMIN_SEASON_VARIATION = np.array([1.0, 1.0, 0.5, 1.0, 1.0])
+    RAINFALL_SEASON_CAP = np.array([5.0, 50.0, 50.0, 50.0, 5.0])  # Dry seasons get little rain
+    WIND_SEASON_FACTOR = np.array([1.5, 1.0, 1.0, 1.0, 1.0])
+    
+    CLIMATE_FIELDS = (
+        'wet_factor', 'temp_low', 'temp_high', 'humidity_low', 'humidity_high', 'wind_speed',
+        'monthly_rainfall', 'tmax_zone_offset', 'tmin_zone_offset', 'rainfall_zone_factor',
+        'humidity_zone_offset', 'wind_zone_factor', 'tmax_season_offset', 'tmax_season_variation',
+        'tmin_season_offset', 'tmin_season_variation', 'rainfall_season_cap', 'wind_season_factor',
+    )
+    
+    def __init__(self):
         self.model_type = "enhanced_fallback"
+        self.climate_table = self._build_climate_table()
         
-        # Ghana climate data based on meteorological records
-        self.ghana_climate_data = {
-            # Monthly averages for different regions of Ghana
-            'coastal': {  # Southern Ghana (Accra, Cape Coast, Tema)
-                'temp_range': {'wet': (24, 30), 'dry': (26, 33)},
-                'humidity_range': {'wet': (75, 90), 'dry': (60, 80)},
-                'rainfall_monthly': [15, 56, 97, 137, 180, 279, 46, 15, 64, 64, 36, 23],  # mm per month
-                'wind_speed': {'wet': 3.5, 'dry': 4.2}
-            },
-            'forest': {  # Middle belt (Kumasi, Sunyani)
-                'temp_range': {'wet': (22, 28), 'dry': (24, 32)},
-                'humidity_range': {'wet': (80, 95), 'dry': (65, 85)},
-                'rainfall_monthly': [25, 76, 147, 167, 190, 229, 76, 25, 84, 84, 46, 33],
-                'wind_speed': {'wet': 2.8, 'dry': 3.5}
-            },
-            'savanna': {  # Northern Ghana (Tamale, Bolgatanga, Wa)
-                'temp_range': {'wet': (24, 32), 'dry': (28, 38)},
-                'humidity_range': {'wet': (70, 85), 'dry': (45, 70)},
-                'rainfall_monthly': [5, 10, 25, 76, 127, 178, 203, 229, 178, 51, 8, 3],
-                'wind_speed': {'wet': 4.2, 'dry': 5.5}
-            }
-        }
+        # A stable checksum rather than hash(), which is salted per interpreter, so every
+        # process (web workers and job workers alike) predicts the same values
+        self.weather_type_seeds = np.array([zlib.crc32(target.encode('utf-8')) % 1000 for target in self.TARGETS])
         
-        logger.info(f"Initialized enhanced {weather_type} model")
+        logger.info(f"Initialized enhanced fallback model for {', '.join(self.TARGETS)}")
     
-    def _get_climate_zone(self, lat, lon):
-        """Determine climate zone based on coordinates"""
-        if lat < 6.0:  # Southern coastal region
-            return 'coastal'
-        elif lat < 8.0:  # Middle forest belt
-            return 'forest'
-        else:  # Northern savanna
-            return 'savanna'
+    def _build_climate_table(self):
+        """Climate records indexed by [zone, month - MIN_MONTH] (see CLIMATE_FIELDS)"""
+        months = np.arange(self.MIN_MONTH, self.MAX_MONTH + 1)
+        season = np.where(months >= 1, self.SEASON_BY_MONTH[np.maximum(months, 0)], 4)
+        wet_factor = self.SEASON_WET_FACTORS[season]
+        is_wet = (wet_factor > 0.5).astype(np.intp)
+        zone = np.arange(len(CLIMATE_ZONES))[:, None]
+        
+        table = np.empty((len(CLIMATE_ZONES), len(months)), dtype=[(field, np.float64) for field in self.CLIMATE_FIELDS])
+        table['wet_factor'] = wet_factor
+        table['temp_low'] = TEMP_RANGE_TABLE[zone, is_wet, 0]
+        table['temp_high'] = TEMP_RANGE_TABLE[zone, is_wet, 1]
+        table['humidity_low'] = HUMIDITY_RANGE_TABLE[zone, is_wet, 0]
+        table['humidity_high'] = HUMIDITY_RANGE_TABLE[zone, is_wet, 1]
+        table['wind_speed'] = WIND_SPEED_TABLE[zone, is_wet]
+        table['monthly_rainfall'] = RAINFALL_MONTHLY_TABLE[zone, (months - 1) % 12]
+        table['tmax_zone_offset'] = self.TMAX_ZONE_OFFSET[zone]
+        table['tmin_zone_offset'] = self.TMIN_ZONE_OFFSET[zone]
+        table['rainfall_zone_factor'] = self.RAINFALL_ZONE_FACTOR[zone]
+        table['humidity_zone_offset'] = self.HUMIDITY_ZONE_OFFSET[zone]
+        table['wind_zone_factor'] = self.WIND_ZONE_FACTOR[zone]
+        table['tmax_season_offset'] = self.TMAX_SEASON_OFFSET[season]
+        table['tmax_season_variation'] = self.TMAX_SEASON_VARIATION[season]
+        table['tmin_season_offset'] = self.TMIN_SEASON_OFFSET[season]
+        table['tmin_season_variation'] = self.TMIN_SEASON_VARIATION[season]
+        table['rainfall_season_cap'] = self.RAINFALL_SEASON_CAP[season]
+        table['wind_season_factor'] = self.WIND_SEASON_FACTOR[season]
+        return table
     
-    def _get_season_info(self, month, day_of_year):
-        """Get detailed season information"""
-        # Ghana's seasons are more nuanced than just wet/dry
-        if month in [12, 1, 2]:  # Dry season - Harmattan
-            return 'dry_harmattan', 0.1
-        elif month in [3, 4]:  # Transition to wet
-            return 'pre_wet', 0.3
-        elif month in [5, 6, 7, 8, 9]:  # Peak wet season
-            return 'wet_peak', 0.9
-        elif month in [10, 11]:  # Transition to dry
-            return 'post_wet', 0.5
-        else:
-            return 'dry', 0.2
+    def _get_climate_zone(self, lat, lon):
+        """Determine climate zone index (see CLIMATE_ZONES) based on coordinates"""
+        return climate_zone_index.classify_many(lat, lon)
     
     def _get_location_hash(self, lat, lon):
         """Create a deterministic hash based on location for consistent predictions"""
         # Use coordinates to create a deterministic seed
-        location_seed = int((abs(lat) * 1000 + abs(lon) * 1000) * 100) % 10000
+        location_seed = np.trunc((np.abs(lat) * 1000 + np.abs(lon) * 1000) * 100).astype(np.int64) % 10000
         return location_seed
     
-    def _get_deterministic_variation(self, lat, lon, weather_type, day_of_year):
-        """Get deterministic variation based on location and date"""
-        # Create location-specific variation using coordinates
-        location_hash = self._get_location_hash(lat, lon)
-        
-        # Use location and date to create deterministic but varied predictions
-        variation_seed = (location_hash + day_of_year + hash(weather_type)) % 1000
-        
-        # Convert to a value between -1 and 1
-        variation = (variation_seed / 500.0) - 1.0
-        return variation
-
+    def _get_deterministic_variation(self, lat, lon, day_of_year):
+        """Get deterministic variation in [-1, 1) for every row and target, as an N x 5 array"""
+        # Use location and date to create deterministic but varied predictions per weather type
+        location_day_seed = self._get_location_hash(lat, lon) + day_of_year
+        variation_seed = (location_day_seed[:, None] + self.weather_type_seeds) % 1000
+        return (variation_seed / 500.0) - 1.0
+    
+    def defaults(self, n_rows):
+        """Structured array of n_rows default predictions"""
+        result = np.empty(n_rows, dtype=self.OUTPUT_DTYPE)
+        for target in self.TARGETS:
+            result[target] = self.DEFAULTS[target]
+        return result
+    
     def predict(self, input_features):
-        """Generate accurate weather predictions using enhanced climate modeling"""
+        """Predict every weather type for an N x 12 feature matrix (or a single row)
+
+        Returns a structured array of N records with one field per target.
+        """
         try:
-            # Ensure we're working with a numpy array and extract features properly
-            features = np.array(input_features).flatten()
+            # Ensure we're working with a 2D numpy array of feature rows
+            features = np.asarray(input_features, dtype=float).reshape(-1, 12)
             
-            # Extract features with proper indexing
-            lat = float(features[0])
-            lon = float(features[1]) 
-            base_temp = float(features[2])
-            humidity = float(features[3])
-            pressure = float(features[4])
-            wind = float(features[5])
-            rainfall = float(features[6])
-            month = int(features[7])
-            day_of_year = int(features[8])
-            max_temp = float(features[9])
-            min_temp = float(features[10])
-            day_of_month = int(features[11])
+            # Extract feature columns: latitude, longitude and the integer month, day of year, day of month
+            lat = features[:, 0]
+            lon = features[:, 1]
+            month, day_of_year, day_of_month = features[:, [7, 8, 11]].astype(np.int64).T
             
-            # Determine climate zone and season
-            climate_zone = self._get_climate_zone(lat, lon)
-            season, wet_factor = self._get_season_info(month, day_of_year)
-            climate_data = self.ghana_climate_data[climate_zone]
+            if month.min() < self.MIN_MONTH or month.max() > self.MAX_MONTH:
+                raise IndexError(f"Month out of range: {month[(month < self.MIN_MONTH) | (month > self.MAX_MONTH)]}")
             
-            # Get deterministic variation based on location
-            location_variation = self._get_deterministic_variation(lat, lon, self.weather_type, day_of_year)
+            # Shared intermediates: climate zone and month records, and per-target location variation
+            climate = self.climate_table[self._get_climate_zone(lat, lon), month - self.MIN_MONTH]
+            variation = self._get_deterministic_variation(lat, lon, day_of_year)
             
-            # Get monthly rainfall baseline
-            monthly_rainfall = climate_data['rainfall_monthly'][month - 1]
+            result = np.empty(len(features), dtype=self.OUTPUT_DTYPE)
             
-            if self.weather_type == 'Tmax':
-                # Maximum temperature prediction
-                temp_range = climate_data['temp_range']['wet' if wet_factor > 0.5 else 'dry']
-                base_max = temp_range[1]
-                
-                # Location-specific adjustments
-                lat_adjustment = (lat - 6.0) * 1.5  # Northern locations are hotter
-                lon_adjustment = abs(lon) * 0.5  # Distance from coast affects temperature
-                
-                # Seasonal adjustments
-                if season == 'dry_harmattan':
-                    seasonal_adjustment = 3.0 + location_variation * 2
-                elif season == 'wet_peak':
-                    seasonal_adjustment = -2.0 + location_variation * 1
-                else:
-                    seasonal_adjustment = location_variation * 1.5
-                
-                predicted_temp = base_max + lat_adjustment + lon_adjustment + seasonal_adjustment
-                
-                # Coastal vs inland differences
-                if climate_zone == 'coastal':
-                    predicted_temp -= 1  # Coastal areas are cooler
-                elif climate_zone == 'savanna':
-                    predicted_temp += 2  # Savanna is hotter
-                
-                return np.array([max(22, min(42, predicted_temp))])
+            # Maximum temperature: northern locations are hotter, distance from coast matters
+            lat_adjustment = (lat - 6.0) * 1.5
+            lon_adjustment = np.abs(lon) * 0.5
+            seasonal_adjustment = climate['tmax_season_offset'] + variation[:, 0] * climate['tmax_season_variation']
+            predicted_temp = climate['temp_high'] + lat_adjustment + lon_adjustment + seasonal_adjustment
+            predicted_temp = predicted_temp + climate['tmax_zone_offset']
+            result['Tmax'] = np.maximum(22, np.minimum(42, predicted_temp))
             
-            elif self.weather_type == 'Tmin':
-                # Minimum temperature prediction
-                temp_range = climate_data['temp_range']['wet' if wet_factor > 0.5 else 'dry']
-                base_min = temp_range[0]
-                
-                # Location-specific adjustments
-                lat_adjustment = (lat - 6.0) * 1.0  # Northern locations have higher minimums
-                
-                # Seasonal adjustments
-                if season == 'dry_harmattan':
-                    seasonal_adjustment = 2.0 + location_variation * 1
-                elif season == 'wet_peak':
-                    seasonal_adjustment = -1.0 + location_variation * 0.5
-                else:
-                    seasonal_adjustment = location_variation * 1
-                
-                predicted_temp = base_min + lat_adjustment + seasonal_adjustment
-                
-                # Climate zone adjustments
-                if climate_zone == 'coastal':
-                    predicted_temp += 1  # Coastal areas have higher minimums
-                elif climate_zone == 'savanna':
-                    predicted_temp += 1.5  # Savanna has higher minimums
-                
-                return np.array([max(16, min(28, predicted_temp))])
+            # Minimum temperature: northern locations have higher minimums
+            lat_adjustment = (lat - 6.0) * 1.0
+            seasonal_adjustment = climate['tmin_season_offset'] + variation[:, 1] * climate['tmin_season_variation']
+            predicted_temp = climate['temp_low'] + lat_adjustment + seasonal_adjustment
+            predicted_temp = predicted_temp + climate['tmin_zone_offset']
+            result['Tmin'] = np.maximum(16, np.minimum(28, predicted_temp))
             
-            elif self.weather_type == 'Rainfall':
-                # Rainfall prediction based on monthly patterns and location
-                base_rainfall = monthly_rainfall * (day_of_month / 30.0)
-                
-                # Location-specific rainfall patterns
-                lat_factor = max(0.3, 1.2 - (lat - 5.0) * 0.15)  # Northern areas get less rain
-                coastal_factor = 1.2 if climate_zone == 'coastal' else 1.0
-                
-                # Seasonal and location adjustments
-                location_factor = 1.0 + location_variation * 0.3
-                
-                predicted_rainfall = base_rainfall * lat_factor * coastal_factor * location_factor
-                
-                # Ensure realistic bounds
-                if season in ['dry_harmattan', 'dry']:
-                    predicted_rainfall = max(0, min(predicted_rainfall, 5))
-                else:
-                    predicted_rainfall = max(0, min(predicted_rainfall, 50))
-                
-                return np.array([predicted_rainfall])
+            # Rainfall: monthly patterns scaled to the day, northern areas get less rain
+            base_rainfall = climate['monthly_rainfall'] * (day_of_month / 30.0)
+            lat_factor = np.maximum(0.3, 1.2 - (lat - 5.0) * 0.15)
+            location_factor = 1.0 + variation[:, 2] * 0.3
+            predicted_rainfall = base_rainfall * lat_factor * climate['rainfall_zone_factor'] * location_factor
+            result['Rainfall'] = np.maximum(0, np.minimum(predicted_rainfall, climate['rainfall_season_cap']))
             
-            elif self.weather_type == 'Relative_Humidity':
-                # Humidity prediction with location specificity
-                humidity_range = climate_data['humidity_range']['wet' if wet_factor > 0.5 else 'dry']
-                base_humidity = humidity_range[0] + (humidity_range[1] - humidity_range[0]) * wet_factor
-                
-                # Location adjustments
-                coastal_bonus = 8 if climate_zone == 'coastal' else 0
-                forest_bonus = 5 if climate_zone == 'forest' else 0
-                savanna_penalty = -10 if climate_zone == 'savanna' else 0
-                
-                # Location-specific variation
-                location_adjustment = location_variation * 8
-                
-                predicted_humidity = base_humidity + coastal_bonus + forest_bonus + savanna_penalty + location_adjustment
-                
-                return np.array([max(35, min(95, predicted_humidity))])
+            # Humidity: interpolated by the season's wet factor
+            humidity_low = climate['humidity_low']
+            base_humidity = humidity_low + (climate['humidity_high'] - humidity_low) * climate['wet_factor']
+            predicted_humidity = base_humidity + climate['humidity_zone_offset'] + variation[:, 3] * 8
+            result['Relative_Humidity'] = np.maximum(35, np.minimum(95, predicted_humidity))
             
-            elif self.weather_type == 'Wind_Speed':
-                # Wind speed prediction with location specificity
-                base_wind = climate_data['wind_speed']['wet' if wet_factor > 0.5 else 'dry']
-                
-                # Location-specific wind patterns
-                coastal_factor = 1.3 if climate_zone == 'coastal' else 1.0  # Coastal areas are windier
-                savanna_factor = 1.2 if climate_zone == 'savanna' else 1.0  # Open savanna is windier
-                
-                # Seasonal adjustments
-                if season == 'dry_harmattan':
-                    seasonal_factor = 1.5  # Harmattan winds are stronger
-                else:
-                    seasonal_factor = 1.0
-                
-                # Location-specific variation
-                location_factor = 1.0 + location_variation * 0.2
-                
-                predicted_wind = base_wind * coastal_factor * savanna_factor * seasonal_factor * location_factor
-                
-                return np.array([max(1.0, min(12, predicted_wind))])
+            # Wind speed: Harmattan winds are stronger
+            location_factor = 1.0 + variation[:, 4] * 0.2
+            predicted_wind = climate['wind_speed'] * climate['wind_zone_factor'] * climate['wind_season_factor'] * location_factor
+            result['Wind_Speed'] = np.maximum(1.0, np.minimum(12, predicted_wind))
+            
+            return result
             
-            else:
-                # Default case
-                return np.array([25.0])
-                
         except Exception as e:
-            logger.error(f"Enhanced model prediction error for {self.weather_type}: {e}")
-            logger.error(f"Input features were: {input_features}")
-            logger.error(f"Latitude: {lat}, Longitude: {lon}")
-            import traceback
-            logger.error(f"Full traceback: {traceback.format_exc()}")
-            # Return reasonable defaults based on weather type
-            defaults = {
-                'Tmax': 30.0, 'Tmin': 22.0, 'Rainfall': 5.0,
-                'Relative_Humidity': 75.0, 'Wind_Speed': 3.5
-            }
-            return np.array([defaults.get(self.weather_type, 25.0)])
+            logger.error("Enhanced model prediction error for features of shape %s: %s", np.shape(input_features), e)
+            return self.defaults(max(1, np.size(input_features) // 12))
+
+class EnhancedWeatherModel:
+    """Single weather type view of a FusedWeatherModel, for code expecting one model per target"""
+    
+    def __init__(self, weather_type, fused_model=None):
+        self.weather_type = weather_type
+        self.model_type = "enhanced_fallback"
+        self.fused_model = fused_model if fused_model is not None else FusedWeatherModel()
+    
+    def predict(self, input_features):
+        """Predict this weather type for an N x 12 feature matrix (or a single row)"""
+        predictions = self.fused_model.predict(input_features)
+        if self.weather_type not in predictions.dtype.names:
+            return np.full(len(predictions), 25.0)
+        return predictions[self.weather_type]
+
+def create_fallback_models():
+    """Per-target fallback models that share one fused model"""
+    fused_model = FusedWeatherModel()
+    return {target: EnhancedWeatherModel(target, fused_model) for target in FusedWeatherModel.TARGETS}
+
+# Prefer the compiled native artifact; only unpickle the joblib file when there is none
+model_artifact = load_native_models()
 
 try:
-    model_data = load_model_with_compatibility()
+    model_data = model_artifact.models if model_artifact is not None else load_model_with_compatibility()
     
     if model_data is None:
         logger.warning("Failed to load original model - using enhanced weather models")
         # Create enhanced models for each weather condition
-        model = {
-            'Tmax': EnhancedWeatherModel('Tmax'),
-            'Tmin': EnhancedWeatherModel('Tmin'), 
-            'Rainfall': EnhancedWeatherModel('Rainfall'),
-            'Relative_Humidity': EnhancedWeatherModel('Relative_Humidity'),
-            'Wind_Speed': EnhancedWeatherModel('Wind_Speed')
-        }
+        model = create_fallback_models()
         logger.info("✓ Enhanced weather models initialized successfully")
     else:
         # Handle different model structures
@@ -383,13 +417,7 @@ try:
                 logger.info(f"✓ Successfully loaded {len(weather_models)} weather models: {list(weather_models.keys())}")
             else:
                 logger.error("✗ No models with predict method found in the dictionary - using enhanced models")
-                model = {
-                    'Tmax': EnhancedWeatherModel('Tmax'),
-                    'Tmin': EnhancedWeatherModel('Tmin'), 
-                    'Rainfall': EnhancedWeatherModel('Rainfall'),
-                    'Relative_Humidity': EnhancedWeatherModel('Relative_Humidity'),
-                    'Wind_Speed': EnhancedWeatherModel('Wind_Speed')
-                }
+                model = create_fallback_models()
         else:
             # Single model case
             if hasattr(model_data, 'predict'):
@@ -397,13 +425,7 @@ try:
                 logger.info(f"✓ Single model loaded: {type(model_data)}")
             else:
                 logger.error(f"✗ Model does not have predict method: {type(model_data)} - using enhanced models")
-                model = {
-                    'Tmax': EnhancedWeatherModel('Tmax'),
-                    'Tmin': EnhancedWeatherModel('Tmin'), 
-                    'Rainfall': EnhancedWeatherModel('Rainfall'),
-                    'Relative_Humidity': EnhancedWeatherModel('Relative_Humidity'),
-                    'Wind_Speed': EnhancedWeatherModel('Wind_Speed')
-                }
+                model = create_fallback_models()
         
         if model is not None:
             logger.info("✓ Final model structure ready for predictions")
@@ -411,19 +433,66 @@ try:
             logger.error("✗ Model loading failed - no valid models found")
     
 except Exception as e:
-    logger.error(f"✗ Critical error loading model: {e}")
-    import traceback
-    logger.error(f"Full traceback: {traceback.format_exc()}")
+    logger.exception(f"✗ Critical error loading model: {e}")
     # Use enhanced models as last resort
-    model = {
-        'Tmax': EnhancedWeatherModel('Tmax'),
-        'Tmin': EnhancedWeatherModel('Tmin'), 
-        'Rainfall': EnhancedWeatherModel('Rainfall'),
-        'Relative_Humidity': EnhancedWeatherModel('Relative_Humidity'),
-        'Wind_Speed': EnhancedWeatherModel('Wind_Speed')
-    }
+    model = create_fallback_models()
     logger.info("✓ Using enhanced models due to critical error")
 
+# Version of the loaded models: a fingerprint of the joblib file (recorded in the artifact
+# when converted from it, and checked against the joblib file when loading), or the fallback engine
+if not isinstance(model, dict) or any(isinstance(m, EnhancedWeatherModel) for m in model.values()):
+    model_version = 'enhanced_fallback'
+elif model_artifact is not None:
+    model_version = model_artifact.model_version
+else:
+    model_version = compute_model_version(MODEL_FILE)
+
+# Swap the sklearn ensembles for flat array evaluators, each verified against sklearn first
+if model_artifact is None and model_version != 'enhanced_fallback' and os.environ.get('COMPILE_MODELS', '1') != '0':
+    model = compile_models(model)
+
+# Per-process metrics served at /metrics in the Prometheus text format
+metrics_registry = MetricsRegistry()
+predict_stage_seconds = metrics_registry.histogram(
+    'weather_predict_stage_seconds', 'Time spent in each stage of a prediction', ['stage']
+)
+model_inference_seconds = metrics_registry.histogram(
+    'weather_model_inference_seconds', 'Time spent running each model over a feature matrix', ['model']
+)
+fallback_predictions_total = metrics_registry.counter(
+    'weather_fallback_predictions_total', 'Feature matrices predicted by the fallback model', ['weather_type']
+)
+prediction_errors_total = metrics_registry.counter(
+    'weather_prediction_errors_total', 'Model predictions that failed', ['weather_type']
+)
+prediction_cache_lookups_total = metrics_registry.counter(
+    'weather_prediction_cache_lookups_total', 'Prediction cache lookups by /predict', ['result']
+)
+
+# Serve from the precomputed forecast cube when one was built for the loaded model.
+# The fallback engine is never cubed: it is cheap to evaluate and its version string does not
+# change when its formulas do.
+forecast_cube = None
+if model_version != 'enhanced_fallback':
+    forecast_cube = ForecastCube.load(FORECAST_CUBE_FILE, model_version)
+
+# In-process cache of single-location predictions, keyed on (lat, lon, date) and model version
+prediction_cache = PredictionCache(
+    max_size=int(os.environ.get('PREDICTION_CACHE_SIZE', 4096)),
+    ttl=float(os.environ.get('PREDICTION_CACHE_TTL', 3600)),
+    policy=os.environ.get('PREDICTION_CACHE_POLICY', 'lru')
+)
+
+# On-disk cache of rendered map tiles. Fallback tiles are never persisted since, as with
+# the forecast cube, the fallback version string would not invalidate them.
+TILE_CACHE_DIR = os.environ.get('TILE_CACHE_DIR', 'tile_cache')
+TILE_CACHE_MAX_BYTES = int(os.environ.get('TILE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+tile_cache = TileCache(TILE_CACHE_DIR, TILE_CACHE_MAX_BYTES if model_version != 'enhanced_fallback' else 0)
+
+# Deepest zoom level served and how long clients may reuse a tile before revalidating it
+MAX_TILE_ZOOM = int(os.environ.get('MAX_TILE_ZOOM', 12))
+TILE_MAX_AGE = int(os.environ.get('TILE_MAX_AGE', 3600))
+
 # Comprehensive location to coordinates mapping for Ghana cities and towns
 # This database includes all major cities, towns, and districts that would typically
 # be included in a Ghana weather prediction training dataset
@@ -749,6 +818,289 @@ CITY_COORDINATES = {
     'wenchi municipal': (7.7333, -2.1000),
 }
 
+# Other names people use for cities in CITY_COORDINATES
+CITY_ALIASES = {
+    'bolga': 'bolgatanga',
+    'takoradi': 'sekondi-takoradi',
+    'sekondi': 'sekondi-takoradi',
+    'kdua': 'koforidua',
+}
+
+# Exact, alias, prefix, partial and fuzzy city lookups, built once at startup
+city_index = CityIndex(CITY_COORDINATES, CITY_ALIASES)
+
+# Region and climate zone of every city, classified once with the same spatial indexes
+# the prediction path uses
+CITY_REGIONS = {
+    city: region_index.classify(lat, lon, default='Ghana') for city, (lat, lon) in CITY_COORDINATES.items()
+}
+CITY_CLIMATE_ZONES = {
+    city: climate_zone_index.classify(lat, lon) for city, (lat, lon) in CITY_COORDINATES.items()
+}
+
+# /api/cities entry for every city (name capitalized per word)
+CITY_SEARCH_RESULTS = {
+    city: {
+        'name': ' '.join(word.capitalize() for word in city.split()),
+        'region': CITY_REGIONS[city],
+        'climate_zone': CITY_CLIMATE_ZONES[city],
+        'coordinates': {'lat': lat, 'lon': lon}
+    }
+    for city, (lat, lon) in CITY_COORDINATES.items()
+}
+
+# Ranked typeahead over the city names for /api/cities
+city_autocomplete = CityAutocomplete(CITY_COORDINATES)
+AUTOCOMPLETE_DEFAULT_LIMIT = 20
+AUTOCOMPLETE_MAX_LIMIT = 100
+
+# Forecasts for raw coordinates are made for the nearest city within this many km, so they
+# share its cache entries and forecast cube row; farther points are forecast at their own
+# coordinates rounded to COORDINATE_GRID_DEGREES, so nearby requests share cache entries
+CITY_SNAP_DISTANCE_KM = float(os.environ.get('CITY_SNAP_DISTANCE_KM', 10))
+COORDINATE_GRID_DEGREES = float(os.environ.get('COORDINATE_GRID_DEGREES', 0.01))
+nearest_city_index = NearestCityIndex(CITY_COORDINATES)
+
+# Number of similar city names suggested when a location is not found
+CITY_SUGGESTION_LIMIT = int(os.environ.get('CITY_SUGGESTION_LIMIT', 5))
+
+# Maximum number of (location, date) pairs accepted by /predict/batch
+MAX_BATCH_SIZE = 1000
+
+# Maximum number of days returned by a single /predict date-range request
+MAX_RANGE_DAYS = 366
+
+# Rows predicted and encoded at a time by bulk exports, and the largest export served over HTTP
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', 20_000))
+MAX_EXPORT_ROWS = int(os.environ.get('MAX_EXPORT_ROWS', 10_000_000))
+
+# Default and finest cell size, in degrees, and the largest mesh served by /api/raster
+RASTER_DEFAULT_RESOLUTION = 0.05
+RASTER_MIN_RESOLUTION = 0.001
+MAX_RASTER_CELLS = int(os.environ.get('MAX_RASTER_CELLS', 500_000))
+
+# Display unit and number of decimals for each weather type
+PREDICTION_UNITS = {
+    'Tmax': ('°C', 1),
+    'Tmin': ('°C', 1),
+    'Rainfall': ('mm', 2),
+    'Relative_Humidity': ('%', 1),
+    'Wind_Speed': ('km/hr', 1)
+}
+
+def resolve_location(location):
+    """Resolve a location name to (display name, latitude, longitude), or None if unknown"""
+    match = city_index.lookup(location)
+    if match is None:
+        return None
+
+    if match.match_type == 'exact':
+        return location, match.latitude, match.longitude
+    return match.key.title(), match.latitude, match.longitude  # Use the standardized name
+
+def resolve_coordinates(latitude, longitude, location=None):
+    """Resolve raw coordinates to (display name, latitude, longitude) to forecast for
+
+    Raises ValueError if they are not numbers inside Ghana.
+    """
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError('Latitude and longitude must be numbers')
+
+    min_lat, min_lon, max_lat, max_lon = GHANA_BOUNDS
+    if not (min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon):
+        raise ValueError(f'Coordinates ({latitude}, {longitude}) are outside Ghana')
+
+    city, distance_km = nearest_city_index.nearest(latitude, longitude)
+    if distance_km <= CITY_SNAP_DISTANCE_KM:
+        city_latitude, city_longitude = CITY_COORDINATES[city]
+        return city.title(), city_latitude, city_longitude
+
+    # Round onto the grid (and clean up float noise such as 5.6000000000000005)
+    latitude = round(round(latitude / COORDINATE_GRID_DEGREES) * COORDINATE_GRID_DEGREES, 6)
+    longitude = round(round(longitude / COORDINATE_GRID_DEGREES) * COORDINATE_GRID_DEGREES, 6)
+    return location or f'Location ({latitude:.4f}, {longitude:.4f})', latitude, longitude
+
+def location_not_found(location):
+    """Error message and the closest known city names for an unknown location"""
+    suggestions = [city.title() for city in city_index.suggest(location, CITY_SUGGESTION_LIMIT)]
+    message = f'Location "{location}" not found in our database.'
+    if suggestions:
+        message += f' Did you mean: {", ".join(suggestions)}?'
+    return message, suggestions
+
+def date_features(dates):
+    """Vectorized (month, day_of_year, day_of_month) arrays for an array of dates"""
+    days = np.asarray(dates, dtype='datetime64[D]')
+    years = days.astype('datetime64[Y]')
+    months = days.astype('datetime64[M]')
+
+    month = (months - years).astype(np.int64) + 1
+    day_of_year = (days - years).astype(np.int64) + 1
+    day_of_month = (days - months).astype(np.int64) + 1
+    return month, day_of_year, day_of_month
+
+def build_feature_matrix(latitudes, longitudes, dates):
+    """Build the N x 12 model input matrix for N (latitude, longitude, date) rows"""
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    month, day_of_year, day_of_month = date_features(dates)
+
+    # Seasonal adjustments for Ghana's climate
+    # Ghana has two main seasons: wet (April-October) and dry (November-March)
+    is_wet_season = (month >= 4) & (month <= 10)
+    north = latitudes > 7
+
+    # Cooler in north during wet season, hotter in dry season especially north
+    base_temp = np.where(is_wet_season, np.where(north, 26.0, 28.0), np.where(north, 30.0, 32.0))
+    humidity = np.where(is_wet_season, 80.0, 60.0)
+    rainfall_likelihood = np.where(is_wet_season, 15.0, 2.0)
+
+    return np.column_stack([
+        latitudes,                                  # Feature 1: Latitude
+        longitudes,                                 # Feature 2: Longitude
+        base_temp,                                  # Feature 3: Seasonal base temperature
+        humidity,                                   # Feature 4: Seasonal humidity
+        np.full(latitudes.shape, 1013.25),          # Feature 5: Atmospheric pressure (standard)
+        np.where(is_wet_season, 6.0, 4.0),          # Feature 6: Wind speed (higher in wet season)
+        rainfall_likelihood,                        # Feature 7: Seasonal rainfall likelihood
+        month,                                      # Feature 8: Month (1-12)
+        day_of_year,                                # Feature 9: Day of year (1-366)
+        base_temp + 5,                              # Feature 10: Max temperature
+        base_temp - 5,                              # Feature 11: Min temperature
+        day_of_month                                # Feature 12: Day of month (1-31)
+    ]).astype(np.float64)
+
+def inference_tasks(targets=None):
+    """(task name -> predict function, weather type -> task name) for the loaded models
+
+    targets limits the tasks to those weather types (default all). Task names
+    are the same in every process, so process inference workers can look up
+    their own copy of a task by name.
+    """
+    tasks = {}  # task name -> predict function, run by the inference executor
+    task_names = {}  # weather type -> task producing its predictions
+
+    for weather_type, weather_model in model.items():
+        if targets is not None and weather_type not in targets:
+            continue
+        if not hasattr(weather_model, 'predict'):
+            logger.warning("Model for %s does not have predict method", weather_type)
+            continue
+
+        if isinstance(weather_model, EnhancedWeatherModel):
+            # Fallback views share one fused model, run it once for all of them
+            task_names[weather_type] = 'fallback'
+            tasks['fallback'] = weather_model.fused_model.predict
+        else:
+            task_names[weather_type] = weather_type
+            tasks[weather_type] = weather_model.predict
+
+    return tasks, task_names
+
+def init_inference_worker():
+    """Predict functions of a process inference worker, which loads the models by importing this module"""
+    return inference_tasks()[0]
+
+# Start method for inference and job worker processes. forkserver (or spawn) starts them
+# from a clean process; fork would copy this one with its background threads' locks in
+# whatever state they are in
+WORKER_START_METHOD = os.environ.get('WORKER_START_METHOD', 'forkserver')
+
+# Large feature matrices are split into (model, row chunk) units run on a thread or
+# process pool; smaller ones are predicted serially
+inference_executor = InferenceExecutor(
+    kind=os.environ.get('INFERENCE_EXECUTOR', 'thread'),
+    workers=int(os.environ.get('INFERENCE_WORKERS', os.cpu_count() or 1)),
+    min_parallel_rows=int(os.environ.get('INFERENCE_PARALLEL_MIN_ROWS', 20_000)),
+    start_method=WORKER_START_METHOD,
+    initializer=init_inference_worker
+)
+# Job workers are already one process per CPU, so each predicts its chunks serially
+serial_inference_executor = InferenceExecutor('serial')
+
+def predict_feature_matrix(features, executor=None, targets=None):
+    """Run each loaded weather model once over an N x 12 feature matrix
+
+    Returns a dict of weather type -> array of N predictions (None if that model failed).
+    executor defaults to the shared inference_executor; targets limits the models
+    run to those weather types (default all).
+    """
+    tasks, task_names = inference_tasks(targets)
+    for weather_type, task_name in task_names.items():
+        if task_name == 'fallback':
+            fallback_predictions_total.inc(weather_type=weather_type)
+
+    timings = {}
+    with predict_stage_seconds.time(stage='inference'):
+        results = (executor or inference_executor).run(tasks, features, timings)
+    for task_name, seconds in timings.items():
+        model_inference_seconds.observe(seconds, model=task_name if task_name in model else 'fallback')
+
+    predictions = {}
+    for weather_type, task_name in task_names.items():
+        try:
+            values = results[task_name]
+            if isinstance(values, Exception):
+                raise values
+            if task_name != weather_type:
+                values = values[weather_type]
+            predictions[weather_type] = np.asarray(values, dtype=np.float64).reshape(-1)
+        except Exception as model_error:
+            logger.error("Error predicting %s: %s", weather_type, model_error)
+            prediction_errors_total.inc(weather_type=weather_type)
+            predictions[weather_type] = None
+
+    return predictions
+
+def display_values(weather_type, values):
+    """Convert an array of raw predictions to display units"""
+    if weather_type == 'Wind_Speed':
+        # Convert from m/s to km/hr (multiply by 3.6)
+        return values * 3.6
+    return values
+
+def prediction_series(weather_type, values):
+    """Convert an array of raw predictions to a list in display units (None if the model failed)"""
+    if values is None:
+        return None
+    unit, decimals = PREDICTION_UNITS.get(weather_type, ('', 2))
+    return np.round(display_values(weather_type, values), decimals).tolist()
+
+def predict_locations(latitudes, longitudes, dates, executor=None):
+    """Predict every weather type for N (latitude, longitude, date) rows
+
+    Answers from the precomputed forecast cube when all rows are covered by it,
+    otherwise builds the feature matrix and runs the models.
+    """
+    if forecast_cube is not None:
+        predictions = forecast_cube.lookup(latitudes, longitudes, dates)
+        if predictions is not None:
+            return predictions
+
+    with predict_stage_seconds.time(stage='features'):
+        input_features = build_feature_matrix(latitudes, longitudes, dates)
+    logger.debug("Input features shape: %s", input_features.shape)
+    return predict_feature_matrix(input_features, executor)
+
+def format_prediction(weather_type, prediction_value):
+    """Format a single prediction value for display based on weather type"""
+    if prediction_value is None:
+        return "Error"
+    if weather_type == 'Rainfall':
+        return f"{prediction_value:.2f} mm"
+    elif weather_type == 'Relative_Humidity':
+        return f"{prediction_value:.1f}%"
+    elif weather_type in ['Tmax', 'Tmin']:
+        return f"{prediction_value:.1f}°C"
+    elif weather_type == 'Wind_Speed':
+        # Convert from m/s to km/hr (multiply by 3.6)
+        wind_speed_kmh = prediction_value * 3.6
+        return f"{wind_speed_kmh:.1f} km/hr"
+    else:
+        return f"{prediction_value:.2f}"
+
 @app.route('/')
 def landing():
     """Render the landing page"""
@@ -763,23 +1115,24 @@ def index():
 def predict_weather():
     """Predict weather for a given location and date range"""
     try:
-        # Log incoming request data for debugging
-        logger.info(f"Received prediction request. Form data: {request.form}")
-        
-        # Get location and prediction date from form
+        # Get location and prediction date (or date range) from form
         location = request.form.get('location')
         prediction_date = request.form.get('predictionDate')
+        range_start = request.form.get('start')
+        range_end = request.form.get('end')
+        is_range = bool(range_start or range_end)
+        
+        # Browser geolocation sends coordinates alongside the location name
+        latitude = request.form.get('latitude')
+        longitude = request.form.get('longitude')
+        has_coordinates = bool(latitude and longitude)
         
-        if not location:
-            logger.warning("No location provided in request")
+        if not location and not has_coordinates:
             return jsonify({'error': 'Please provide a Ghana city'}), 400
             
-        if not prediction_date:
-            logger.warning("No prediction date provided in request")
+        if not prediction_date and not is_range:
             return jsonify({'error': 'Please provide a prediction date'}), 400
             
-        logger.info(f"Processing prediction for location: {location}, date: {prediction_date}")
-        
         # Check if we have a valid model or fallback
         if model is None and not hasattr(EnhancedWeatherModel, 'predict'):
             logger.error("No prediction model available - both primary and fallback models failed to load")
@@ -788,119 +1141,69 @@ def predict_weather():
                 'details': 'Please try again later or contact support'
             }), 503
         
-        # Get coordinates for the location
-        location_lower = location.lower().strip()
+        # Get coordinates for the location: raw coordinates skip name matching entirely
+        with predict_stage_seconds.time(stage='location'):
+            if has_coordinates:
+                try:
+                    resolved = resolve_coordinates(latitude, longitude, location)
+                except ValueError as coordinate_error:
+                    return jsonify({'error': str(coordinate_error)}), 400
+            else:
+                resolved = resolve_location(location)
         
-        if location_lower in CITY_COORDINATES:
-            latitude, longitude = CITY_COORDINATES[location_lower]
-        else:
-            # Try partial matching for common variations
-            found = False
-            for city_name, coords in CITY_COORDINATES.items():
-                if location_lower in city_name or city_name in location_lower:
-                    latitude, longitude = coords
-                    location = city_name.title()  # Use the standardized name
-                    found = True
-                    break
-            
-            if not found:
-                available_cities = ', '.join([city.title() for city in sorted(CITY_COORDINATES.keys())])
-                return jsonify({
-                    'error': f'Location "{location}" not found in our database. Available cities: {available_cities}'
-                }), 400
+        if resolved is None:
+            message, suggestions = location_not_found(location)
+            return jsonify({'error': message, 'suggestions': suggestions}), 400
+        
+        location, latitude, longitude = resolved
+        
+        if is_range:
+            return predict_range(location, latitude, longitude, range_start, range_end, request.form.get('step'))
         
         # Prepare input data for the model with date-based features
         # Parse prediction date to extract temporal features
-        from datetime import datetime
-        
         try:
             pred_dt = datetime.strptime(prediction_date, '%Y-%m-%d')
-            
-            # Calculate temporal features
-            day_of_year = pred_dt.timetuple().tm_yday
-            month = pred_dt.month
-            day_of_month = pred_dt.day
-            
-            # Seasonal adjustments for Ghana's climate
-            # Ghana has two main seasons: wet (April-October) and dry (November-March)
-            is_wet_season = 4 <= month <= 10
-            
-            # Adjust weather parameters based on season and location in Ghana
-            if is_wet_season:
-                base_temp = 26.0 if latitude > 7 else 28.0  # Cooler in north during wet season
-                humidity = 80.0
-                rainfall_likelihood = 15.0
-            else:
-                base_temp = 30.0 if latitude > 7 else 32.0  # Hotter in dry season, especially north
-                humidity = 60.0
-                rainfall_likelihood = 2.0
-            
-            # Create 12 features incorporating location, season, and specific date information
-            input_features = np.array([[
-                latitude,                           # Feature 1: Latitude
-                longitude,                          # Feature 2: Longitude
-                base_temp,                          # Feature 3: Seasonal base temperature
-                humidity,                           # Feature 4: Seasonal humidity
-                1013.25,                           # Feature 5: Atmospheric pressure (standard)
-                6.0 if is_wet_season else 4.0,    # Feature 6: Wind speed (higher in wet season)
-                rainfall_likelihood,                # Feature 7: Seasonal rainfall likelihood
-                month,                             # Feature 8: Month (1-12)
-                day_of_year,                       # Feature 9: Day of year (1-365)
-                base_temp + 5,                     # Feature 10: Max temperature
-                base_temp - 5,                     # Feature 11: Min temperature
-                day_of_month                       # Feature 12: Day of month (1-31)
-            ]])
-            
         except ValueError as date_error:
-            logger.error(f"Date parsing error: {date_error}")
+            logger.error("Date parsing error: %s", date_error)
             return jsonify({'error': 'Invalid date format. Please use YYYY-MM-DD format.'}), 400
         
-        logger.info(f"Input features shape: {input_features.shape}")
-        logger.info(f"Input features: {input_features[0]}")
-        
         # Make predictions for all weather conditions
         try:
             if not isinstance(model, dict):
-                logger.error(f"Expected model to be a dictionary of weather models. Got: {type(model)}")
+                logger.error("Expected model to be a dictionary of weather models. Got: %s", type(model))
                 return jsonify({'error': f'Invalid model structure: {type(model)}'}), 500
             
-            logger.info(f"Making predictions for all weather conditions with input: {input_features}")
-            
             # Make predictions for all weather conditions
             weather_predictions = {}
             
-            for weather_type, weather_model in model.items():
-                try:
-                    if hasattr(weather_model, 'predict'):
-                        prediction = weather_model.predict(input_features)
-                        prediction_value = prediction[0] if hasattr(prediction, '__getitem__') and len(prediction) > 0 else prediction
-                        
-                        # Format the prediction based on weather type
-                        if weather_type == 'Rainfall':
-                            weather_predictions[weather_type] = f"{prediction_value:.2f} mm"
-                        elif weather_type == 'Relative_Humidity':
-                            weather_predictions[weather_type] = f"{prediction_value:.1f}%"
-                        elif weather_type in ['Tmax', 'Tmin']:
-                            weather_predictions[weather_type] = f"{prediction_value:.1f}°C"
-                        elif weather_type == 'Wind_Speed':
-                            # Convert from m/s to km/hr (multiply by 3.6)
-                            wind_speed_kmh = prediction_value * 3.6
-                            weather_predictions[weather_type] = f"{wind_speed_kmh:.1f} km/hr"
-                        else:
-                            weather_predictions[weather_type] = f"{prediction_value:.2f}"
-                        
-                        logger.info(f"{weather_type} prediction: {weather_predictions[weather_type]}")
-                    else:
-                        logger.warning(f"Model for {weather_type} does not have predict method")
-                        
-                except Exception as model_error:
-                    logger.error(f"Error predicting {weather_type}: {model_error}")
-                    weather_predictions[weather_type] = "Error"
+            cache_key = (latitude, longitude, pred_dt.date().isoformat())
+            predictions = prediction_cache.get(cache_key, model_version)
+            annotate_request(location=location, date=prediction_date, cache_hit=predictions is not None)
+            prediction_cache_lookups_total.inc(result='miss' if predictions is None else 'hit')
+            
+            if predictions is None:
+                predictions = predict_locations([latitude], [longitude], [pred_dt.date()])
+                # Only cache complete results so a failed model is retried next time
+                if all(values is not None for values in predictions.values()):
+                    prediction_cache.put(cache_key, predictions, model_version)
+            
+            serialization_started = time.perf_counter()
+            for weather_type, values in predictions.items():
+                weather_predictions[weather_type] = format_prediction(
+                    weather_type, None if values is None else values[0]
+                )
             
             if not weather_predictions:
                 return jsonify({'error': 'No valid predictions could be made'}), 500
             
-            return jsonify({
+            if 'user_id' in session:
+                forecast_history_buffer.add((
+                    session['user_id'], location, pred_dt.date().isoformat(), json.dumps(weather_predictions),
+                    datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+                ))
+            
+            response = jsonify({
                 'location': location,
                 'coordinates': {
                     'latitude': latitude,
@@ -909,69 +1212,477 @@ def predict_weather():
                 'weather_predictions': weather_predictions,
                 'success': True
             })
+            predict_stage_seconds.observe(time.perf_counter() - serialization_started, stage='serialization')
+            return response
             
         except Exception as e:
-            logger.error(f"Input features: {input_features}")
+            logger.error("Prediction failed for (%s, %s) on %s: %s", latitude, longitude, prediction_date, e)
             return jsonify({'error': f'Error making predictions: {str(e)}'}), 500
             
     except Exception as e:
-        logger.error(f"General error in prediction: {e}")
+        logger.error("General error in prediction: %s", e)
+        return jsonify({'error': 'An unexpected error occurred during prediction'}), 500
+
+def predict_range(location, latitude, longitude, range_start, range_end, step=None):
+    """Predict a whole date range for one location and return a columnar time series"""
+    if not range_start or not range_end:
+        return jsonify({'error': 'Please provide both a start and an end date'}), 400
+
+    try:
+        start_dt = datetime.strptime(range_start, '%Y-%m-%d').date()
+        end_dt = datetime.strptime(range_end, '%Y-%m-%d').date()
+    except ValueError as date_error:
+        logger.error("Date parsing error: %s", date_error)
+        return jsonify({'error': 'Invalid date format. Please use YYYY-MM-DD format.'}), 400
+
+    try:
+        step_days = int(step) if step else 1
+    except ValueError:
+        return jsonify({'error': 'Step must be a whole number of days'}), 400
+
+    if step_days < 1:
+        return jsonify({'error': 'Step must be at least 1 day'}), 400
+
+    if end_dt < start_dt:
+        return jsonify({'error': 'End date must not be before start date'}), 400
+
+    # Generate every date in the range as a datetime64 array (end date inclusive)
+    dates = np.arange(np.datetime64(start_dt), np.datetime64(end_dt) + np.timedelta64(1, 'D'), step_days, dtype='datetime64[D]')
+
+    if len(dates) > MAX_RANGE_DAYS:
+        return jsonify({'error': f'A date range may contain at most {MAX_RANGE_DAYS} days'}), 400
+
+    if not isinstance(model, dict):
+        logger.error("Expected model to be a dictionary of weather models. Got: %s", type(model))
+        return jsonify({'error': f'Invalid model structure: {type(model)}'}), 500
+
+    annotate_request(location=location, start=range_start, end=range_end, days=len(dates))
+    predictions = predict_locations(np.full(len(dates), latitude), np.full(len(dates), longitude), dates)
+
+    return jsonify({
+        'location': location,
+        'coordinates': {
+            'latitude': latitude,
+            'longitude': longitude
+        },
+        'dates': dates.astype(str).tolist(),
+        'units': {weather_type: PREDICTION_UNITS.get(weather_type, ('', 2))[0] for weather_type in predictions},
+        'weather_predictions': {
+            weather_type: prediction_series(weather_type, values)
+            for weather_type, values in predictions.items()
+        },
+        'success': True
+    })
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_weather_batch():
+    """Predict weather for many (location, date) pairs in one vectorized pass
+
+    Expects a JSON body of the form
+    {"requests": [{"location": "Accra", "predictionDate": "2024-08-15"}, ...]}
+    and runs each weather model exactly once over the combined feature matrix.
+    """
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('requests') if isinstance(data, dict) else None
+
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'Please provide a non-empty "requests" list'}), 400
+
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'A batch may contain at most {MAX_BATCH_SIZE} requests'}), 400
+
+        if not isinstance(model, dict):
+            logger.error("Expected model to be a dictionary of weather models. Got: %s", type(model))
+            return jsonify({'error': f'Invalid model structure: {type(model)}'}), 500
+
+        # Validate every item up front and collect the valid rows
+        results = [None] * len(items)
+        rows = []  # (result index, location, latitude, longitude, date)
+
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = {'error': 'Each request must be an object'}
+                continue
+
+            location = item.get('location')
+            prediction_date = item.get('predictionDate')
+            has_coordinates = item.get('latitude') is not None and item.get('longitude') is not None
+
+            if location is not None and not isinstance(location, str):
+                results[index] = {'error': 'location must be a string'}
+                continue
+
+            if not location and not has_coordinates:
+                results[index] = {'error': 'Please provide a Ghana city'}
+                continue
+
+            if not prediction_date:
+                results[index] = {'error': 'Please provide a prediction date'}
+                continue
+
+            if has_coordinates:
+                try:
+                    resolved = resolve_coordinates(item['latitude'], item['longitude'], location)
+                except ValueError as coordinate_error:
+                    results[index] = {'location': location, 'error': str(coordinate_error)}
+                    continue
+            else:
+                resolved = resolve_location(location)
+            if resolved is None:
+                message, suggestions = location_not_found(location)
+                results[index] = {'location': location, 'error': message, 'suggestions': suggestions}
+                continue
+
+            try:
+                pred_dt = datetime.strptime(str(prediction_date), '%Y-%m-%d')
+            except ValueError:
+                results[index] = {'location': location, 'error': 'Invalid date format. Please use YYYY-MM-DD format.'}
+                continue
+
+            name, latitude, longitude = resolved
+            rows.append((index, name, latitude, longitude, pred_dt.date()))
+
+        if rows:
+            indices, names, latitudes, longitudes, dates = zip(*rows)
+            annotate_request(rows=len(rows))
+            predictions = predict_locations(latitudes, longitudes, dates)
+
+            for row, index in enumerate(indices):
+                results[index] = {
+                    'location': names[row],
+                    'predictionDate': dates[row].isoformat(),
+                    'coordinates': {
+                        'latitude': latitudes[row],
+                        'longitude': longitudes[row]
+                    },
+                    'weather_predictions': {
+                        weather_type: format_prediction(weather_type, None if values is None else values[row])
+                        for weather_type, values in predictions.items()
+                    }
+                }
+
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'success': True
+        })
+
+    except Exception as e:
+        logger.error("General error in batch prediction: %s", e)
         return jsonify({'error': 'An unexpected error occurred during prediction'}), 500
 
+@app.route('/api/raster', methods=['GET'])
+def predict_raster():
+    """Forecast a whole bounding box on a regular grid and return it as a binary .npy array
+
+    Query parameters: date (YYYY-MM-DD), bbox (min_lat,min_lon,max_lat,max_lon, default
+    Ghana), resolution in degrees, targets (comma-separated, default all) and dtype
+    (float16 or float32). The array has shape (targets, rows, columns) with row 0 at the
+    northern edge; the X-Raster-* headers describe its axes. Values are in display units
+    and NaN where a model failed.
+    """
+    prediction_date = request.args.get('date')
+    if not prediction_date:
+        return jsonify({'error': 'Please provide a date'}), 400
+
+    try:
+        pred_dt = datetime.strptime(prediction_date, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Please use YYYY-MM-DD format.'}), 400
+
+    try:
+        bounds = parse_bbox(request.args['bbox']) if request.args.get('bbox') else GHANA_BOUNDS
+        resolution = float(request.args.get('resolution', RASTER_DEFAULT_RESOLUTION))
+    except ValueError as raster_error:
+        return jsonify({'error': str(raster_error)}), 400
+
+    if not np.isfinite(resolution) or resolution < RASTER_MIN_RESOLUTION:
+        return jsonify({'error': f'Resolution must be at least {RASTER_MIN_RESOLUTION} degrees'}), 400
+
+    rows, columns = raster_shape(bounds, resolution)
+    if rows * columns > MAX_RASTER_CELLS:
+        return jsonify({'error': f'A raster may contain at most {MAX_RASTER_CELLS} cells, requested {rows}x{columns}'}), 400
+
+    dtype = request.args.get('dtype', 'float16')
+    if dtype not in RASTER_DTYPES:
+        return jsonify({'error': f'dtype must be one of {", ".join(RASTER_DTYPES)}'}), 400
+
+    if not isinstance(model, dict):
+        logger.error("Expected model to be a dictionary of weather models. Got: %s", type(model))
+        return jsonify({'error': f'Invalid model structure: {type(model)}'}), 500
+
+    targets = request.args.get('targets')
+    targets = targets.split(',') if targets else list(model.keys())
+    unknown = [target for target in targets if target not in model]
+    if unknown:
+        return jsonify({'error': f'Unknown targets: {", ".join(unknown)}'}), 400
+
+    latitudes, longitudes = raster_mesh(bounds, resolution)
+    dates = np.full(len(latitudes), np.datetime64(pred_dt.date()))
+    annotate_request(date=pred_dt.date().isoformat(), cells=rows * columns, bbox=bounds)
+    # Only the requested layers' models are run over the grid
+    predictions = predict_feature_matrix(build_feature_matrix(latitudes, longitudes, dates), targets=targets)
+
+    layers = np.full((len(targets), rows, columns), np.nan, dtype=np.float32)
+    for layer, target in zip(layers, targets):
+        if predictions.get(target) is not None:
+            layer[:] = display_values(target, predictions[target]).reshape(rows, columns)
+
+    response = Response(encode_raster(layers, dtype), mimetype='application/octet-stream')
+    response.headers['Content-Disposition'] = f'attachment; filename=forecast-{pred_dt.date()}.npy'
+    response.headers['X-Raster-Bounds'] = ','.join(str(value) for value in bounds)
+    response.headers['X-Raster-Resolution'] = str(resolution)
+    response.headers['X-Raster-Targets'] = ','.join(targets)
+    response.headers['X-Raster-Units'] = ','.join(PREDICTION_UNITS.get(target, ('', 2))[0] for target in targets)
+    response.headers['X-Model-Version'] = model_version
+    return response
+
+def export_values(latitudes, longitudes, dates, executor=None):
+    """Predictions for N rows as weather type -> list of N display values (None if the model failed)"""
+    predictions = predict_locations(latitudes, longitudes, dates, executor)
+    return {
+        weather_type: prediction_series(weather_type, values) if values is not None else [None] * len(latitudes)
+        for weather_type, values in predictions.items()
+    }
+
+def parse_forecast_span(start, end, step=None, locations=None):
+    """(name, latitude, longitude) locations and the dates covered by a bulk forecast request
+
+    locations defaults to every known city. Raises ValueError for invalid dates
+    and LookupError, with the unknown name, for a location that is not found.
+    """
+    try:
+        start_dt = datetime.strptime(str(start), '%Y-%m-%d').date()
+        end_dt = datetime.strptime(str(end), '%Y-%m-%d').date()
+        step_days = int(step or 1)
+    except ValueError:
+        raise ValueError('Please provide start and end dates in YYYY-MM-DD format and a whole-number step')
+
+    if step_days < 1 or end_dt < start_dt:
+        raise ValueError('End date must not be before start date and step must be at least 1 day')
+
+    if locations is None:
+        resolved = [(city.title(), latitude, longitude) for city, (latitude, longitude) in CITY_COORDINATES.items()]
+    elif isinstance(locations, list) and locations:
+        resolved = []
+        for location in locations:
+            match = resolve_location(str(location))
+            if match is None:
+                raise LookupError(location)
+            resolved.append(match)
+    else:
+        raise ValueError('locations must be a non-empty list of Ghana cities')
+
+    dates = np.arange(np.datetime64(start_dt), np.datetime64(end_dt) + np.timedelta64(1, 'D'), step_days, dtype='datetime64[D]')
+    return resolved, dates
+
+def forecast_job_chunk(names, latitudes, longitudes, dates):
+    """Forecast one chunk of a job as NDJSON lines, one per (location, date) row"""
+    date_strings = np.asarray(dates, dtype='datetime64[D]').astype(str).tolist()
+    return ndjson_text(ExportChunk(
+        [str(name) for name in names], latitudes, longitudes, date_strings,
+        export_values(latitudes, longitudes, dates, serial_inference_executor)
+    ))
+
+def init_job_worker():
+    """Runs once in each job worker process, after importing this module has loaded the models"""
+    predict_feature_matrix(build_feature_matrix([5.6], [-0.2], [np.datetime64('2024-01-01')]))
+    logger.info(f"✓ Job worker {os.getpid()} ready with model version {model_version}")
+
+# Background jobs for forecasts too large to answer inline. Pool workers are started with
+# WORKER_START_METHOD; each imports this module (loading the models) and warms up in init_job_worker.
+JOB_DIR = os.environ.get('JOB_DIR', 'forecast_jobs')
+MAX_JOB_ROWS = int(os.environ.get('MAX_JOB_ROWS', 10_000_000))
+job_queue = JobQueue(
+    JOB_DIR,
+    forecast_job_chunk,
+    workers=int(os.environ.get('JOB_WORKERS', os.cpu_count() or 1)),
+    chunk_rows=int(os.environ.get('JOB_CHUNK_ROWS', 50_000)),
+    start_method=WORKER_START_METHOD,
+    initializer=init_job_worker
+)
+# Pick up jobs that were queued, or interrupted, before a restart. Pool workers import this
+# module too and must not run jobs themselves
+if multiprocessing.parent_process() is None:
+    job_queue.resume()
+
+@app.route('/jobs', methods=['POST'])
+def submit_forecast_job():
+    """Queue a forecast for many locations over a date range and return its job id
+
+    Expects a JSON body {"start": "2024-04-01", "end": "2024-10-31", "step": 1,
+    "locations": ["Accra", ...]}; locations defaults to every known city.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Please provide a JSON object'}), 400
+
+    try:
+        resolved, dates = parse_forecast_span(data.get('start'), data.get('end'), data.get('step'), data.get('locations'))
+    except LookupError as lookup_error:
+        message, suggestions = location_not_found(lookup_error.args[0])
+        return jsonify({'error': message, 'suggestions': suggestions}), 400
+    except ValueError as span_error:
+        return jsonify({'error': str(span_error)}), 400
+
+    total_rows = len(resolved) * len(dates)
+    if total_rows > MAX_JOB_ROWS:
+        return jsonify({'error': f'A job may contain at most {MAX_JOB_ROWS} rows, requested {total_rows}'}), 400
+
+    names, latitudes, longitudes = (np.array(column) for column in zip(*resolved))
+    job_id = job_queue.submit((
+        np.repeat(names, len(dates)),
+        np.repeat(latitudes.astype(np.float64), len(dates)),
+        np.repeat(longitudes.astype(np.float64), len(dates)),
+        np.tile(dates, len(resolved)),
+    ))
+
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'total_rows': total_rows,
+        'status_url': url_for('forecast_job_status', job_id=job_id)
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def forecast_job_status(job_id):
+    """Status and progress of a forecast job"""
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({'error': f'Unknown job {job_id}'}), 404
+    if status['status'] == 'done':
+        status['result_url'] = url_for('forecast_job_result', job_id=job_id)
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def forecast_job_result(job_id):
+    """Finished job results as NDJSON, one line per (location, date)"""
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({'error': f'Unknown job {job_id}'}), 404
+    if status['status'] != 'done':
+        return jsonify({'error': f'Job is {status["status"]}', 'status': status}), 409
+    return send_file(job_queue.result_path(job_id), mimetype='application/x-ndjson')
+
+@app.route('/export', methods=['GET'])
+def export_forecasts():
+    """Stream forecasts for every (location, date) pair as NDJSON, CSV or Parquet
+
+    Query parameters: start, end, step and format (ndjson, csv or parquet), plus
+    optional comma-separated locations (default every known city).
+    """
+    export_format = request.args.get('format', 'ndjson')
+    locations = request.args.get('locations')
+
+    try:
+        check_export_format(export_format)
+        resolved, dates = parse_forecast_span(
+            request.args.get('start'), request.args.get('end'), request.args.get('step'),
+            locations.split(',') if locations else None
+        )
+    except LookupError as lookup_error:
+        message, suggestions = location_not_found(lookup_error.args[0])
+        return jsonify({'error': message, 'suggestions': suggestions}), 400
+    except ValueError as export_error:
+        return jsonify({'error': str(export_error)}), 400
+
+    total_rows = len(resolved) * len(dates)
+    if total_rows > MAX_EXPORT_ROWS:
+        return jsonify({'error': f'An export may contain at most {MAX_EXPORT_ROWS} rows, requested {total_rows}'}), 400
+
+    logger.info("Exporting %s rows as %s", total_rows, export_format)
+    chunks = export_chunks(resolved, dates, export_values, EXPORT_CHUNK_ROWS)
+    response = Response(stream_with_context(encode_export(chunks, export_format)), mimetype=EXPORT_MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename=forecasts-{dates[0]}-{dates[-1]}.{export_format}'
+    return response
+
+def render_tile_layers(z, x, y, prediction_date):
+    """Forecast every weather type over a tile's pixels in display units, NaN outside Ghana"""
+    layers = {weather_type: np.full(TILE_SIZE * TILE_SIZE, np.nan, dtype=np.float32) for weather_type in model}
+
+    min_lat, min_lon, max_lat, max_lon = tile_bounds(z, x, y)
+    ghana_min_lat, ghana_min_lon, ghana_max_lat, ghana_max_lon = GHANA_BOUNDS
+    if min_lat < ghana_max_lat and max_lat > ghana_min_lat and min_lon < ghana_max_lon and max_lon > ghana_min_lon:
+        latitudes, longitudes = (mesh.ravel() for mesh in tile_pixel_centres(z, x, y))
+        inside = np.flatnonzero(region_index.classify_many(latitudes, longitudes) >= 0)
+
+        if len(inside):
+            dates = np.full(len(inside), np.datetime64(prediction_date))
+            predictions = predict_feature_matrix(build_feature_matrix(latitudes[inside], longitudes[inside], dates))
+            for weather_type, values in predictions.items():
+                if values is not None:
+                    layers[weather_type][inside] = display_values(weather_type, values)
+
+    return {weather_type: values.reshape(TILE_SIZE, TILE_SIZE) for weather_type, values in layers.items()}
+
+def forecast_tile(target, prediction_date, z, x, y, tile_format):
+    """Encoded tile for one weather type, from the tile cache or freshly rendered"""
+    key = (model_version, prediction_date.isoformat(), target, z, x, f'{y}.{tile_format}')
+    data = tile_cache.get(key)
+    if data is not None:
+        return data
+
+    layers = render_tile_layers(z, x, y, prediction_date)
+    if not tile_cache.enabled:
+        return encode_tile(target, layers[target], tile_format)
+
+    # Every layer comes out of the same model pass, so cache them all for clients switching layers
+    for weather_type, values in layers.items():
+        encoded = encode_tile(weather_type, values, tile_format)
+        tile_cache.put(key[:2] + (weather_type,) + key[3:], encoded)
+        if weather_type == target:
+            data = encoded
+    return data
+
+@app.route('/tiles/<target>/<date>/<int:z>/<int:x>/<int:y>.<tile_format>', methods=['GET'])
+def serve_tile(target, date, z, x, y, tile_format):
+    """Web Mercator forecast tile for one weather type and date, as PNG or float16 .npy"""
+    if not isinstance(model, dict) or target not in model:
+        return jsonify({'error': f'Unknown layer {target}'}), 404
+
+    if tile_format not in TILE_FORMATS:
+        return jsonify({'error': f'Tile format must be one of {", ".join(TILE_FORMATS)}'}), 404
+
+    if not 0 <= z <= MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({'error': f'No tile {z}/{x}/{y} (maximum zoom {MAX_TILE_ZOOM})'}), 404
+
+    try:
+        prediction_date = datetime.strptime(date, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Please use YYYY-MM-DD format.'}), 400
+
+    data = forecast_tile(target, prediction_date, z, x, y, tile_format)
+
+    response = Response(data, mimetype='image/png' if tile_format == 'png' else 'application/octet-stream')
+    response.set_etag(tile_etag(data))
+    response.cache_control.public = True
+    response.cache_control.max_age = TILE_MAX_AGE
+    return response.make_conditional(request)
+
 @app.route('/api/cities', methods=['GET'])
 def search_cities():
-    """Search for cities in Ghana with autocomplete"""
+    """Search for cities in Ghana with autocomplete
+
+    Query parameters: q (at least 2 characters), limit (default 20) and offset for paging.
+    """
     query = request.args.get('q', '').lower().strip()
     
     if not query or len(query) < 2:
-        return jsonify({'cities': []})
+        return jsonify({'cities': [], 'total': 0})
     
-    # Filter cities that match the query
-    matched_cities = []
-    for city, (lat, lon) in CITY_COORDINATES.items():
-        if query in city.lower():
-            # Format city name (capitalize each word)
-            formatted_name = ' '.join(word.capitalize() for word in city.split())
-            
-            # Determine region based on coordinates
-            region = "Ghana"  # Default region
-            
-            # Simple region detection based on coordinates (can be enhanced)
-            if 5.5 <= lat <= 6.0 and -0.5 <= lon <= 0.7:  # Greater Accra
-                region = "Greater Accra"
-            elif 6.0 <= lat <= 7.5 and -2.0 <= lon <= 0.0:  # Ashanti Region
-                region = "Ashanti"
-            elif 5.5 <= lat <= 8.5 and -3.0 <= lon <= -1.0:  # Western & Western North
-                region = "Western Region"
-            elif 6.5 <= lat <= 10.0 and -2.0 <= lon <= 1.0:  # Eastern Region
-                region = "Eastern Region"
-            elif 9.0 <= lat <= 11.0 and -2.5 <= lon <= 0.0:  # Bono, Bono East, Ahafo
-                region = "Bono Region"
-            elif 7.5 <= lat <= 10.5 and -2.5 <= lon <= -0.5:  # Ashanti & Eastern
-                region = "Ashanti/Eastern"
-            elif 8.0 <= lat <= 11.0 and 0.0 <= lon <= 2.0:  # Volta & Oti
-                region = "Volta/Oti"
-            elif 9.0 <= lat <= 11.0 and -2.0 <= lon <= 0.0:  # Bono & Ahafo
-                region = "Bono/Ahafo"
-            elif 7.0 <= lat <= 11.0 and -3.0 <= lon <= -1.5:  # Western North
-                region = "Western North"
-            elif 5.0 <= lat <= 8.0 and 0.0 <= lon <= 1.0:  # Greater Accra & Volta coastal
-                region = "Coastal Region"
-            
-            matched_cities.append({
-                'name': formatted_name,
-                'region': region,
-                'coordinates': {'lat': lat, 'lon': lon}
-            })
-            
-            # Limit results for performance
-            if len(matched_cities) >= 20:
-                break
+    limit = min(max(request.args.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT, type=int), 0), AUTOCOMPLETE_MAX_LIMIT)
+    offset = max(request.args.get('offset', 0, type=int), 0)
     
-    # Sort by relevance (shorter matches first, then alphabetical)
-    matched_cities.sort(key=lambda x: (len(x['name']), x['name']))
+    # Ranked matches come straight from the precomputed autocomplete table
+    total, cities = city_autocomplete.search(query, limit, offset)
     
-    return jsonify({'cities': matched_cities})
+    return jsonify({
+        'cities': [CITY_SEARCH_RESULTS[city] for city in cities],
+        'total': total,
+        'limit': limit,
+        'offset': offset
+    })
 
 # Health check endpoint
 @app.route('/health', methods=['GET'])
@@ -980,71 +1691,92 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'model_loaded': model_data is not None,
+        'model_version': model_version,
+        'prediction_cache': prediction_cache.stats(),
+        'password_hashing': password_hasher.stats(),
         'timestamp': datetime.utcnow().isoformat()
     }), 200
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prediction stage latencies and counters in the Prometheus text format"""
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+def profile_admin_authorized():
+    """Whether the request carries the profiling admin token as a bearer token"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and request_profiler.check_token(token)
+
+@app.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    """Stored request profiles, newest first"""
+    if not profile_admin_authorized():
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify({'profiles': request_profiler.store.list()})
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    """Download one stored profile (.pstats or .collapsed)"""
+    if not profile_admin_authorized():
+        return jsonify({'error': 'Not found'}), 404
+    stored = request_profiler.store.get(profile_id)
+    if stored is None:
+        return jsonify({'error': 'Unknown profile'}), 404
+    path, metadata = stored
+    mimetype = 'text/plain' if metadata['format'] == 'collapsed' else 'application/octet-stream'
+    return send_file(os.path.abspath(path), mimetype=mimetype, as_attachment=True, download_name=metadata['file'])
+
 # Database setup
+# User database, accessed through a per-process pool of WAL-mode connections
+USER_DB_PATH = os.environ.get('USER_DB_PATH', 'weather_users.db')
+user_db = UserDatabase(USER_DB_PATH, pool_size=int(os.environ.get('USER_DB_POOL_SIZE', 8)))
+
+def write_forecast_history(rows):
+    """Flush a batch of buffered forecast_history rows"""
+    user_db.add_forecasts(rows)
+
+# Signed-in users' forecasts are recorded through a write-behind buffer, so /predict
+# never waits on the database; batches are written every HISTORY_FLUSH_MS
+forecast_history_buffer = WriteBehindBuffer(
+    write_forecast_history,
+    interval=int(os.environ.get('HISTORY_FLUSH_MS', 250)) / 1000,
+    max_batch=int(os.environ.get('HISTORY_BATCH_SIZE', 500)),
+    max_pending=int(os.environ.get('HISTORY_MAX_PENDING', 10_000))
+)
+atexit.register(forecast_history_buffer.close)
+
+# Default and largest page size of /user/history
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
 def init_db():
     """Initialize the user database"""
-    conn = sqlite3.connect('weather_users.db')
-    cursor = conn.cursor()
-    
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP,
-            is_active BOOLEAN DEFAULT 1
-        )
-    ''')
-    
-    # Create user preferences table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_preferences (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            preferred_locations TEXT,
-            temperature_unit TEXT DEFAULT 'celsius',
-            wind_unit TEXT DEFAULT 'kmh',
-            notification_settings TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Create forecast history table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS forecast_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            location TEXT NOT NULL,
-            forecast_date TIMESTAMP,
-            predictions TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    user_db.create_schema()
     logger.info("Database initialized successfully")
 
 # User authentication functions
+# Passwords are hashed on a bounded pool so login bursts cannot take over every core;
+# raising PASSWORD_HASH_ITERATIONS upgrades each user's hash at their next login
+password_hasher = PasswordHasher(
+    iterations=int(os.environ.get('PASSWORD_HASH_ITERATIONS', 100_000)),
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+    max_queue=int(os.environ.get('PASSWORD_HASH_QUEUE', 64)),
+    wait_timeout=float(os.environ.get('PASSWORD_HASH_WAIT_TIMEOUT', 5))
+)
+
 def hash_password(password):
     """Hash a password with salt"""
-    salt = secrets.token_hex(16)
-    password_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000)
-    return salt + password_hash.hex()
+    return password_hasher.hash(password)
 
 def verify_password(password, stored_hash):
     """Verify a password against its hash"""
-    salt = stored_hash[:32]
-    stored_password_hash = stored_hash[32:]
-    password_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000)
-    return password_hash.hex() == stored_password_hash
+    return password_hasher.verify(password, stored_hash)
+
+def hashing_busy_response():
+    """503 telling the client to retry once the hashing queue has drained"""
+    response = jsonify({'success': False, 'error': 'Too many sign-in attempts right now. Please try again shortly.'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
 def validate_email(email):
     """Validate email format"""
@@ -1087,46 +1819,33 @@ def signup():
             return jsonify({'success': False, 'error': message}), 400
         
         # Check if user already exists
-        conn = sqlite3.connect('weather_users.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id FROM users WHERE email = ?', (email,))
-        if cursor.fetchone():
-            conn.close()
+        if user_db.find_user(email):
             return jsonify({'success': False, 'error': 'Email already registered'}), 400
         
-        # Create new user
-        password_hash = hash_password(password)
-        cursor.execute('''
-            INSERT INTO users (name, email, password_hash)
-            VALUES (?, ?, ?)
-        ''', (name, email, password_hash))
-        
-        user_id = cursor.lastrowid
-        
-        # Create default preferences
-        cursor.execute('''
-            INSERT INTO user_preferences (user_id, preferred_locations, temperature_unit, wind_unit)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, '', 'celsius', 'kmh'))
-        
-        conn.commit()
-        conn.close()
+        # Create new user with default preferences
+        try:
+            user_id = user_db.create_user(name, email, hash_password(password))
+        except sqlite3.IntegrityError:
+            # Registered by a concurrent request since the check above
+            return jsonify({'success': False, 'error': 'Email already registered'}), 400
         
         # Log user in
         session['user_id'] = user_id
         session['user_name'] = name
         session['user_email'] = email
         
-        logger.info(f"New user registered: {email}")
+        logger.info("New user registered: %s", email)
         return jsonify({
             'success': True,
             'message': 'Account created successfully!',
             'user': {'name': name, 'email': email}
         })
         
+    except HashingBusy:
+        logger.warning("Signup rejected: password hashing queue is full")
+        return hashing_busy_response()
     except Exception as e:
-        logger.error(f"Signup error: {e}")
+        logger.error("Signup error: %s", e)
         return jsonify({'success': False, 'error': 'Registration failed. Please try again.'}), 500
 
 @app.route('/login', methods=['POST'])
@@ -1141,49 +1860,41 @@ def login():
             return jsonify({'success': False, 'error': 'Email and password are required'}), 400
         
         # Check user credentials
-        conn = sqlite3.connect('weather_users.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, name, email, password_hash, is_active
-            FROM users WHERE email = ?
-        ''', (email,))
-        
-        user = cursor.fetchone()
+        user = user_db.find_user(email)
         
         if not user:
-            conn.close()
             return jsonify({'success': False, 'error': 'Invalid email or password'}), 401
         
         user_id, name, user_email, password_hash, is_active = user
         
         if not is_active:
-            conn.close()
             return jsonify({'success': False, 'error': 'Account is deactivated'}), 401
         
         if not verify_password(password, password_hash):
-            conn.close()
             return jsonify({'success': False, 'error': 'Invalid email or password'}), 401
         
-        # Update last login
-        cursor.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?', (user_id,))
-        conn.commit()
-        conn.close()
+        # Update last login, and the stored hash if it predates the current cost settings
+        user_db.record_login(user_id)
+        if password_hasher.needs_rehash(password_hash):
+            user_db.update_password_hash(user_id, hash_password(password))
         
         # Log user in
         session['user_id'] = user_id
         session['user_name'] = name
         session['user_email'] = user_email
         
-        logger.info(f"User logged in: {email}")
+        logger.info("User logged in: %s", email)
         return jsonify({
             'success': True,
             'message': 'Login successful!',
             'user': {'name': name, 'email': user_email}
         })
         
+    except HashingBusy:
+        logger.warning("Login rejected: password hashing queue is full")
+        return hashing_busy_response()
     except Exception as e:
-        logger.error(f"Login error: {e}")
+        logger.error("Login error: %s", e)
         return jsonify({'success': False, 'error': 'Login failed. Please try again.'}), 500
 
 @app.route('/logout', methods=['POST'])
@@ -1233,54 +1944,31 @@ def google_auth():
             if not email or not name:
                 return jsonify({'success': False, 'error': 'Invalid Google credential'}), 400
             
-            logger.info(f"Google user info extracted: {name} ({email})")
+            logger.info("Google user info extracted: %s (%s)", name, email)
             
         except Exception as e:
-            logger.error(f"JWT decode error: {e}")
+            logger.error("JWT decode error: %s", e)
             return jsonify({'success': False, 'error': 'Invalid credential format'}), 400
         
         # Check if user exists
-        conn = sqlite3.connect('weather_users.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id, name, is_active FROM users WHERE email = ?', (email,))
-        existing_user = cursor.fetchone()
+        existing_user = user_db.find_user(email)
         
         if existing_user:
-            user_id, user_name, is_active = existing_user
+            user_id, user_name, _, _, is_active = existing_user
             
             if not is_active:
-                conn.close()
                 return jsonify({'success': False, 'error': 'Account is deactivated'}), 401
             
             # Update last login
-            cursor.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?', (user_id,))
-            conn.commit()
+            user_db.record_login(user_id)
             
             message = f'Welcome back, {user_name}!'
         else:
-            # Create new user
-            # Generate a random password hash for Google users
-            dummy_password_hash = hash_password(secrets.token_urlsafe(32))
-            
-            cursor.execute('''
-                INSERT INTO users (name, email, password_hash)
-                VALUES (?, ?, ?)
-            ''', (name, email, dummy_password_hash))
-            
-            user_id = cursor.lastrowid
+            # Create new user; Google users sign in without a password
+            user_id = user_db.create_user(name, email, UNUSABLE_PASSWORD)
             
-            # Create default preferences
-            cursor.execute('''
-                INSERT INTO user_preferences (user_id, preferred_locations, temperature_unit, wind_unit)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, '', 'celsius', 'kmh'))
-            
-            conn.commit()
             message = f'Welcome to Skycast, {name}!'
-            logger.info(f"New Google user registered: {email}")
-        
-        conn.close()
+            logger.info("New Google user registered: %s", email)
         
         # Log user in
         session['user_id'] = user_id
@@ -1295,7 +1983,7 @@ def google_auth():
         })
         
     except Exception as e:
-        logger.error(f"Google auth error: {e}")
+        logger.error("Google auth error: %s", e)
         return jsonify({'success': False, 'error': 'Google authentication failed'}), 500
 
 @app.route('/user/profile')
@@ -1305,19 +1993,7 @@ def get_user_profile():
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
     
     try:
-        conn = sqlite3.connect('weather_users.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT u.name, u.email, u.created_at, u.last_login,
-                   p.preferred_locations, p.temperature_unit, p.wind_unit
-            FROM users u
-            LEFT JOIN user_preferences p ON u.id = p.user_id
-            WHERE u.id = ?
-        ''', (session['user_id'],))
-        
-        user_data = cursor.fetchone()
-        conn.close()
+        user_data = user_db.get_profile(session['user_id'])
         
         if user_data:
             return jsonify({
@@ -1337,9 +2013,137 @@ def get_user_profile():
             return jsonify({'success': False, 'error': 'User not found'}), 404
             
     except Exception as e:
-        logger.error(f"Profile error: {e}")
+        logger.error("Profile error: %s", e)
         return jsonify({'success': False, 'error': 'Failed to get profile'}), 500
 
+def encode_history_cursor(created_at, history_id):
+    """Opaque /user/history cursor for the position after a row"""
+    return base64.urlsafe_b64encode(f'{created_at}|{history_id}'.encode('utf-8')).decode('ascii')
+
+def decode_history_cursor(cursor):
+    """(created_at, id) from a /user/history cursor; raises ValueError if it is malformed"""
+    try:
+        created_at, history_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return created_at, int(history_id)
+    except (UnicodeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+@app.route('/user/history')
+def get_forecast_history():
+    """Current user's forecasts, newest first, paged with an opaque cursor"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    try:
+        limit = int(request.args.get('limit', HISTORY_PAGE_SIZE))
+        before = decode_history_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as history_error:
+        return jsonify({'success': False, 'error': str(history_error)}), 400
+    limit = min(max(limit, 1), HISTORY_MAX_PAGE_SIZE)
+
+    try:
+        # Fetch one extra row to learn whether there is a next page
+        rows = user_db.forecast_history(session['user_id'], limit + 1, before)
+    except Exception as e:
+        logger.error("History error: %s", e)
+        return jsonify({'success': False, 'error': 'Failed to get forecast history'}), 500
+
+    page = rows[:limit]
+    next_cursor = encode_history_cursor(page[-1][4], page[-1][0]) if len(rows) > limit else None
+    return jsonify({
+        'success': True,
+        'history': [
+            {
+                'id': history_id,
+                'location': location,
+                'forecast_date': forecast_date,
+                'predictions': json.loads(predictions) if predictions else None,
+                'created_at': created_at
+            }
+            for history_id, location, forecast_date, predictions, created_at in page
+        ],
+        'next_cursor': next_cursor
+    })
+
+@app.cli.command('build-forecast-cube')
+@click.option('--output', default=FORECAST_CUBE_FILE, show_default=True, help='Path of the .npy cube to write')
+def build_forecast_cube_command(output):
+    """Precompute forecasts for every city and calendar day into a memory-mappable cube"""
+    if model_version == 'enhanced_fallback':
+        raise click.ClickException('The trained model is not loaded - refusing to build a cube from the fallback engine')
+
+    coordinates = sorted(set(CITY_COORDINATES.values()))
+    targets = list(model.keys())
+
+    cube = build_cube(
+        coordinates, targets,
+        lambda latitudes, longitudes, dates: predict_feature_matrix(build_feature_matrix(latitudes, longitudes, dates))
+    )
+    save_cube(output, cube, coordinates, targets, model_version)
+    click.echo(f"Wrote forecast cube {cube.shape} for model {model_version} to {output}")
+
+@app.cli.command('prewarm-tiles')
+@click.option('--days', default=7, show_default=True, help='Number of days to render, starting at --start')
+@click.option('--start', default=None, help='First date to render (YYYY-MM-DD)  [default: today]')
+@click.option('--min-zoom', default=6, show_default=True, help='Shallowest zoom level to render')
+@click.option('--max-zoom', default=9, show_default=True, help='Deepest zoom level to render')
+@click.option('--format', 'tile_format', default='png', show_default=True, type=click.Choice(TILE_FORMATS))
+def prewarm_tiles_command(days, start, min_zoom, max_zoom, tile_format):
+    """Render every tile over Ghana for the coming days into the tile cache"""
+    if not tile_cache.enabled:
+        raise click.ClickException('The tile cache is disabled (TILE_CACHE_MAX_BYTES=0 or the fallback engine is loaded)')
+
+    first_date = datetime.strptime(start, '%Y-%m-%d').date() if start else datetime.now().date()
+    tiles = [(z, x, y) for z in range(min_zoom, max_zoom + 1) for x, y in tiles_covering(GHANA_BOUNDS, z)]
+    target = next(iter(model))
+
+    for offset in range(days):
+        prediction_date = first_date + timedelta(days=offset)
+        for z, x, y in tiles:
+            # Rendering one layer caches all of them
+            forecast_tile(target, prediction_date, z, x, y, tile_format)
+        click.echo(f"Rendered {len(tiles)} tiles for {prediction_date}")
+
+@app.cli.command('export-forecasts')
+@click.option('--start', required=True, help='First date (YYYY-MM-DD)')
+@click.option('--end', required=True, help='Last date (YYYY-MM-DD)')
+@click.option('--step', default=1, show_default=True, help='Days between exported dates')
+@click.option('--locations', default=None, help='Comma-separated locations  [default: every city]')
+@click.option('--format', 'export_format', default='ndjson', show_default=True, type=click.Choice(EXPORT_FORMATS))
+@click.option('--output', default='-', show_default=True, help='File to write, - for stdout')
+def export_forecasts_command(start, end, step, locations, export_format, output):
+    """Write forecasts for every (location, date) pair, one chunk at a time"""
+    try:
+        check_export_format(export_format)
+        resolved, dates = parse_forecast_span(start, end, step, locations.split(',') if locations else None)
+    except LookupError as lookup_error:
+        raise click.ClickException(location_not_found(lookup_error.args[0])[0])
+    except ValueError as export_error:
+        raise click.ClickException(str(export_error))
+
+    with click.open_file(output, 'wb') as f:
+        for data in encode_export(export_chunks(resolved, dates, export_values, EXPORT_CHUNK_ROWS), export_format):
+            f.write(data)
+
+@app.cli.command('convert-model')
+@click.option('--source', default=MODEL_FILE, show_default=True, help='Legacy joblib model file')
+@click.option('--output', default=MODEL_ARTIFACT_FILE, show_default=True, help='Native model artifact to write')
+def convert_model_command(source, output):
+    """Convert the legacy joblib models into the native, checksummed artifact format"""
+    source_models = joblib.load(source)
+    if not isinstance(source_models, dict):
+        raise click.ClickException(f'Expected {source} to hold a dict of models, got {type(source_models).__name__}')
+
+    compiled_models = {}
+    for weather_type, weather_model in source_models.items():
+        compiled = compile_gradient_boosting(weather_model)
+        if not verify_compiled(weather_model, compiled):
+            raise click.ClickException(f'Compiled {weather_type} model does not match scikit-learn')
+        compiled_models[weather_type] = compiled
+
+    write_model_artifact(output, compiled_models, compute_model_version(source))
+    click.echo(f"Wrote {len(compiled_models)} models from {source} to {output}")
+
 # Initialize database on startup
 init_db()
 
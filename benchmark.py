@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for model loading, inference, city lookup and the HTTP endpoints
+
+Inference is timed for a single row, a 1000-row batch and a 20000-row batch,
+for both the loaded (usually compiled) models and the original sklearn
+estimators, so the two can be compared at every size.
+
+    python benchmark.py                                 # run everything and print a table
+    python benchmark.py -k predict --output results.json
+    python benchmark.py --baseline baseline.json        # exit status 1 on regressions
+
+Each case is a zero-argument callable built once by collect_benchmarks(), so
+setup (test client, feature matrices) is not timed. A case is called once to
+warm up and calibrate, then timed for a number of rounds of enough calls to
+last at least --min-time seconds each. Results are written in the JSON layout
+pytest-benchmark uses ({"benchmarks": [{"name": ..., "stats": {...}}]}), so a
+baseline saved by either tool can be compared against the other; with
+pytest-benchmark installed the same cases also run under pytest
+(test_benchmark.py).
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Rows in the batched prediction cases
+BATCH_ROWS = 1000
+
+# Rows in the large-batch cases (raster and forecast job sized inputs)
+LARGE_BATCH_ROWS = 20000
+
+# Default fraction a case's median may grow by before it is reported as a regression
+DEFAULT_TOLERANCE = 0.25
+
+def sample_features(weather_app, n_rows, seed=0):
+    """A reproducible N x 12 feature matrix for random points in Ghana and dates in 2024"""
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64('2024-01-01') + rng.integers(0, 366, n_rows)
+    return weather_app.build_feature_matrix(rng.uniform(4.7, 11.2, n_rows), rng.uniform(-3.3, 1.2, n_rows), dates)
+
+def collect_benchmarks(weather_app):
+    """Case name -> callable to time, for the loaded app module"""
+    from model_artifact import read_model_artifact
+
+    cases = {}
+    if os.path.exists(weather_app.MODEL_FILE):
+        cases['load/joblib'] = weather_app.load_model_with_compatibility
+    if os.path.exists(weather_app.MODEL_ARTIFACT_FILE):
+        cases['load/artifact'] = functools.partial(read_model_artifact, weather_app.MODEL_ARTIFACT_FILE)
+
+    features = sample_features(weather_app, BATCH_ROWS)
+    large_features = sample_features(weather_app, LARGE_BATCH_ROWS, seed=1)
+    for weather_type, weather_model in weather_app.model.items():
+        cases[f'predict/{weather_type}/single'] = functools.partial(weather_model.predict, features[:1])
+        cases[f'predict/{weather_type}/batch'] = functools.partial(weather_model.predict, features)
+        cases[f'predict/{weather_type}/large'] = functools.partial(weather_model.predict, large_features)
+
+    # The same inputs through the original sklearn estimators, as a reference for the compiled models
+    if os.path.exists(weather_app.MODEL_FILE) and weather_app.model_version != 'enhanced_fallback':
+        for weather_type, estimator in (weather_app.load_model_with_compatibility() or {}).items():
+            if hasattr(estimator, 'predict') and weather_type in weather_app.model:
+                cases[f'sklearn/{weather_type}/single'] = functools.partial(estimator.predict, features[:1])
+                cases[f'sklearn/{weather_type}/batch'] = functools.partial(estimator.predict, features)
+                cases[f'sklearn/{weather_type}/large'] = functools.partial(estimator.predict, large_features)
+    cases['predict/all/batch'] = functools.partial(weather_app.predict_feature_matrix, features)
+    cases['fallback/batch'] = functools.partial(weather_app.FusedWeatherModel().predict, features)
+
+    # Exact names, different case, and a misspelling that falls through to fuzzy matching
+    names = list(weather_app.CITY_COORDINATES)[:50]
+    lookups = names + [name.upper() for name in names[:10]] + ['Kumasee', 'Tamalle']
+    cases['lookup/cities'] = lambda: [weather_app.resolve_location(name) for name in lookups]
+
+    client = weather_app.app.test_client()
+    form = {'location': 'Kumasi', 'predictionDate': '2024-08-15'}
+
+    def predict_uncached():
+        weather_app.prediction_cache.clear()
+        return client.post('/predict', data=form)
+
+    cases['http/api_cities'] = functools.partial(client.get, '/api/cities?q=ta')
+    cases['http/predict/cached'] = functools.partial(client.post, '/predict', data=form)
+    cases['http/predict/uncached'] = predict_uncached
+    cases['http/predict_batch'] = functools.partial(client.post, '/predict/batch', json={
+        'requests': [{'location': name, 'predictionDate': '2024-08-15'} for name in names]
+    })
+    return cases
+
+def measure(fn, rounds=5, min_time=0.05):
+    """Per-call timing statistics of fn in seconds, in pytest-benchmark's layout"""
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    loops = max(1, int(min_time / max(elapsed, 1e-9)))
+
+    times = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        times.append((time.perf_counter() - started) / loops)
+
+    mean = statistics.fmean(times)
+    return {
+        'min': min(times),
+        'max': max(times),
+        'mean': mean,
+        'median': statistics.median(times),
+        'stddev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'rounds': rounds,
+        'iterations': loops,
+        'ops': 1 / mean if mean else 0.0,
+    }
+
+def run_benchmarks(cases, pattern=None, rounds=5, min_time=0.05):
+    """Results document for every case whose name contains pattern"""
+    benchmarks = [
+        {'name': name, 'stats': measure(fn, rounds, min_time)}
+        for name, fn in cases.items() if not pattern or pattern in name
+    ]
+    return {'machine_info': machine_info(), 'datetime': datetime.now(timezone.utc).isoformat(), 'benchmarks': benchmarks}
+
+def machine_info():
+    info = {
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+    }
+    try:
+        import sklearn
+        info['sklearn'] = sklearn.__version__
+    except ImportError:
+        pass
+    return info
+
+def _medians(document):
+    # pytest-benchmark names entries after the test; the parametrized case name is in 'param'
+    return {entry.get('param') or entry['name']: entry['stats']['median'] for entry in document['benchmarks']}
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """(name, baseline median, median, ratio, regressed) for every case present in both documents"""
+    baseline_medians = _medians(baseline)
+    rows = []
+    for name, median in _medians(results).items():
+        if name in baseline_medians and baseline_medians[name] > 0:
+            ratio = median / baseline_medians[name]
+            rows.append((name, baseline_medians[name], median, ratio, ratio > 1 + tolerance))
+    return rows
+
+def _format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.3f} {unit}'
+    return f'{seconds / 1e-9:.1f} ns'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('-k', '--filter', help='only run cases whose name contains this text')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.05, help='minimum seconds per round')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against results saved with --output (or by pytest-benchmark)')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='allowed slowdown as a fraction of the baseline median')
+    args = parser.parse_args(argv)
+
+    import app as weather_app
+
+    # Request records and model-loading messages would swamp the table and the timings
+    logging.disable(logging.INFO)
+
+    results = run_benchmarks(collect_benchmarks(weather_app), args.filter, args.rounds, args.min_time)
+    results['model_version'] = weather_app.model_version
+
+    print(f"{'benchmark':<36} {'median':>12} {'min':>12} {'ops/s':>12}")
+    for entry in results['benchmarks']:
+        stats = entry['stats']
+        print(f"{entry['name']:<36} {_format_seconds(stats['median']):>12} {_format_seconds(stats['min']):>12} {stats['ops']:>12.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(results, json.load(f), args.tolerance)
+        print(f"\n{'benchmark':<36} {'baseline':>12} {'current':>12} {'ratio':>8}")
+        for name, baseline_median, median, ratio, regressed in rows:
+            mark = '  ✗ regression' if regressed else ''
+            print(f"{name:<36} {_format_seconds(baseline_median):>12} {_format_seconds(median):>12} {ratio:>8.2f}{mark}")
+        regressions = sum(regressed for *_, regressed in rows)
+        if regressions:
+            print(f"✗ {regressions} benchmark(s) slower than the baseline by more than {args.tolerance:.0%}")
+            return 1
+        print(f"✓ No regressions against {args.baseline}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
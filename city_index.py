@@ -0,0 +1,225 @@
+"""
+Startup-time index over the city coordinate table
+
+Resolves a free-text location to a known city without scanning every name:
+
+    exact     normalized name (case, accents, punctuation and spacing ignored)
+    alias     alternative names and the name with its spaces removed
+    prefix    bisect over the sorted normalized names
+    partial   the query inside a name (via an index of every 1-3 character
+              substring) or a whole name inside the query (via its word spans)
+    fuzzy     names sharing the most trigrams with the query, scored with difflib
+
+Ties between several prefix or partial matches go to the name listed first in
+the coordinate table, as the previous linear scan did.
+"""
+import bisect
+import difflib
+import re
+import unicodedata
+from collections import Counter, namedtuple
+
+# Substrings up to this length are indexed; longer queries intersect their trigrams
+GRAM_SIZE = 3
+
+# Minimum difflib similarity for a fuzzy match to resolve a location
+FUZZY_RESOLVE_CUTOFF = 0.85
+
+# Minimum similarity for a name to be offered as a suggestion
+FUZZY_SUGGEST_CUTOFF = 0.6
+
+# Candidates (by shared trigrams) scored with difflib per fuzzy query
+FUZZY_CANDIDATES = 20
+
+CityMatch = namedtuple('CityMatch', ['key', 'latitude', 'longitude', 'match_type'])
+
+_NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+
+def normalize_name(name):
+    """Lowercase, strip accents and collapse punctuation and whitespace to single spaces"""
+    decomposed = unicodedata.normalize('NFKD', str(name))
+    ascii_name = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_ALPHANUMERIC.sub(' ', ascii_name.lower()).strip()
+
+def _grams(text, size):
+    """Every distinct substring of text of exactly size characters"""
+    return {text[start:start + size] for start in range(len(text) - size + 1)}
+
+class CityIndex:
+    """Lookup structures over a {city key: (latitude, longitude)} table"""
+
+    def __init__(self, coordinates, aliases=None):
+        self.coordinates = coordinates
+        self._order = {key: rank for rank, key in enumerate(coordinates)}
+
+        # Normalized name -> city key, for exact and alias matches
+        self._names = {}
+        for key in coordinates:
+            self._names.setdefault(normalize_name(key), key)
+
+        self._aliases = {}
+        for alias, key in (aliases or {}).items():
+            if key not in coordinates:
+                raise ValueError(f"Alias {alias!r} refers to unknown city {key!r}")
+            self._aliases[normalize_name(alias)] = key
+
+        # Multi-word names typed without spaces ("capecoast"), matched exactly only
+        self._squashed = {}
+        for name, key in self._names.items():
+            squashed = name.replace(' ', '')
+            if squashed != name and squashed not in self._names and squashed not in self._aliases:
+                self._squashed.setdefault(squashed, key)
+
+        # Sorted normalized names for prefix search
+        self._sorted_names = sorted(self._names)
+
+        # Substring (length 1..GRAM_SIZE) -> normalized names containing it
+        self._grams = {}
+        for name in self._names:
+            for size in range(1, GRAM_SIZE + 1):
+                for gram in _grams(name, size):
+                    self._grams.setdefault(gram, set()).add(name)
+
+        # Lengths, in words, of the known names, for finding names inside a longer query
+        self._name_word_counts = sorted({name.count(' ') + 1 for name in self._names}, reverse=True)
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    def _key(self, name):
+        """City key of a normalized name or alias"""
+        return self._names.get(name) or self._aliases.get(name) or self._squashed[name]
+
+    def _match(self, name, match_type):
+        key = self._key(name)
+        latitude, longitude = self.coordinates[key]
+        return CityMatch(key, latitude, longitude, match_type)
+
+    def _first(self, names):
+        """The name whose city comes first in the coordinate table"""
+        return min(names, key=lambda name: self._order[self._key(name)])
+
+    def names_with_prefix(self, prefix):
+        """Normalized names starting with prefix, in alphabetical order"""
+        start = bisect.bisect_left(self._sorted_names, prefix)
+        end = bisect.bisect_left(self._sorted_names, prefix + '\uffff')
+        return self._sorted_names[start:end]
+
+    def names_containing(self, text):
+        """Normalized names that contain text as a substring"""
+        if len(text) <= GRAM_SIZE:
+            return self._grams.get(text, set())
+
+        postings = sorted((self._grams.get(gram, set()) for gram in _grams(text, GRAM_SIZE)), key=len)
+        candidates = set.intersection(*postings)
+        return {name for name in candidates if text in name}
+
+    def names_within(self, text):
+        """Normalized names that appear in text as whole words, longest first"""
+        words = text.split()
+        found = []
+        for count in self._name_word_counts:
+            for start in range(len(words) - count + 1):
+                span = ' '.join(words[start:start + count])
+                if span in self._names:
+                    found.append(span)
+            if found:
+                break
+        return found
+
+    def _fuzzy_scores(self, query, cutoff):
+        """(similarity, name) of names and aliases resembling query, best first"""
+        overlap = Counter()
+        for gram in _grams(query, GRAM_SIZE) or _grams(query, GRAM_SIZE - 1):
+            overlap.update(self._grams.get(gram, ()))
+        # Aliases are few, so they are always scored
+        candidates = [name for name, _ in overlap.most_common(FUZZY_CANDIDATES)]
+        candidates.extend(self._aliases)
+
+        scored = []
+        matcher = difflib.SequenceMatcher(b=query, autojunk=False)
+        for name in candidates:
+            matcher.set_seq1(name)
+            if matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+                continue
+            score = matcher.ratio()
+            if score >= cutoff:
+                scored.append((score, name))
+
+        scored.sort(key=lambda item: (-item[0], self._order[self._key(item[1])]))
+        return scored
+
+    def lookup(self, query):
+        """Resolve query to a CityMatch, or None if nothing matches closely enough"""
+        name = normalize_name(query)
+        if not name:
+            return None
+
+        if name in self._names:
+            return self._match(name, 'exact')
+        if name in self._aliases or name in self._squashed:
+            return self._match(name, 'alias')
+
+        prefixed = self.names_with_prefix(name)
+        if prefixed:
+            return self._match(self._first(prefixed), 'prefix')
+
+        containing = self.names_containing(name)
+        if containing:
+            return self._match(self._first(containing), 'partial')
+
+        within = self.names_within(name)
+        if within:
+            return self._match(self._first(within), 'partial')
+
+        scored = self._fuzzy_scores(name, FUZZY_RESOLVE_CUTOFF)
+        if scored:
+            return self._match(scored[0][1], 'fuzzy')
+
+        return None
+
+    def suggest(self, query, limit=5):
+        """Up to limit city keys resembling query, most similar first"""
+        name = normalize_name(query)
+        if not name or limit <= 0:
+            return []
+
+        suggestions = []
+        for _, match_name in self._fuzzy_scores(name, FUZZY_SUGGEST_CUTOFF):
+            key = self._key(match_name)
+            if key not in suggestions:
+                suggestions.append(key)
+                if len(suggestions) == limit:
+                    break
+        return suggestions
+
+class CityAutocomplete:
+    """Ranked typeahead over city keys, answered from a precomputed substring table
+
+    Every substring of every normalized name maps to the keys containing it,
+    already ranked: names starting with the text first, then names with a word
+    starting with it, then any other match; shorter names and then
+    alphabetical order within each group.
+    """
+
+    def __init__(self, keys):
+        ranked = {}
+        for key in keys:
+            name = normalize_name(key)
+            word_starts = {0} | {i + 1 for i, ch in enumerate(name) if ch == ' '}
+            for start in range(len(name)):
+                tier = 0 if start == 0 else 1 if start in word_starts else 2
+                for end in range(start + 1, len(name) + 1):
+                    text = name[start:end]
+                    entry = ranked.setdefault(text, {})
+                    entry[key] = min(tier, entry.get(key, tier))
+
+        self._ranked = {
+            text: tuple(sorted(matches, key=lambda key: (matches[key], len(key), key)))
+            for text, matches in ranked.items()
+        }
+
+    def search(self, query, limit=20, offset=0):
+        """(total matches, up to limit city keys from offset) for a typed query"""
+        matches = self._ranked.get(normalize_name(query), ())
+        return len(matches), list(matches[offset:offset + limit])
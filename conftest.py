@@ -0,0 +1,20 @@
+"""
+Shared test setup: importing app must not touch files in the repository
+
+app opens the user database (creating its schema and switching it to WAL
+mode) and creates its job, tile and profile directories at import time, so
+every test session points them at a scratch directory first.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix='weather-tests-')
+# Registered before app is imported, so it runs after app's own exit handlers have flushed
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+
+os.environ['USER_DB_PATH'] = os.path.join(_scratch, 'weather_users.db')
+os.environ['JOB_DIR'] = os.path.join(_scratch, 'forecast_jobs')
+os.environ['TILE_CACHE_DIR'] = os.path.join(_scratch, 'tile_cache')
+os.environ['PROFILE_DIR'] = os.path.join(_scratch, 'profiles')
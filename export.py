@@ -0,0 +1,156 @@
+"""
+Streaming bulk export of forecasts for every (location, date) pair
+
+Rows are generated lazily: the flat row range over locations x dates is cut
+into chunks, each chunk is predicted in one batch and encoded, and only then
+is the next chunk built. Memory use therefore depends on the chunk size, not
+on the size of the export. Rows are ordered by location, then date.
+
+NDJSON and CSV are plain text; Parquet needs the optional pyarrow package and
+is written as one row group per chunk.
+"""
+import csv
+import io
+import json
+from collections import namedtuple
+
+import numpy as np
+
+EXPORT_FORMATS = ('ndjson', 'csv', 'parquet')
+
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# One chunk of rows: parallel sequences, plus weather type -> list of values (None where a model failed)
+ExportChunk = namedtuple('ExportChunk', ['names', 'latitudes', 'longitudes', 'dates', 'values'])
+
+def export_chunks(locations, dates, predict_fn, chunk_rows=50_000):
+    """Yield ExportChunks covering every (location, date) pair
+
+    locations is a list of (name, latitude, longitude); predict_fn(latitudes,
+    longitudes, dates) returns weather type -> display values for each row.
+    """
+    names = np.array([name for name, _, _ in locations])
+    latitudes = np.array([latitude for _, latitude, _ in locations], dtype=np.float64)
+    longitudes = np.array([longitude for _, _, longitude in locations], dtype=np.float64)
+    dates = np.asarray(dates, dtype='datetime64[D]')
+
+    total_rows = len(locations) * len(dates)
+    for start in range(0, total_rows, chunk_rows):
+        rows = np.arange(start, min(start + chunk_rows, total_rows))
+        location_index, date_index = np.divmod(rows, len(dates))
+        chunk_dates = dates[date_index]
+        yield ExportChunk(
+            names[location_index].tolist(),
+            latitudes[location_index],
+            longitudes[location_index],
+            chunk_dates.astype(str).tolist(),
+            predict_fn(latitudes[location_index], longitudes[location_index], chunk_dates),
+        )
+
+def ndjson_text(chunk):
+    """NDJSON lines for a chunk, one object per row"""
+    lines = []
+    for row, name in enumerate(chunk.names):
+        record = {
+            'location': name,
+            'date': chunk.dates[row],
+            'latitude': float(chunk.latitudes[row]),
+            'longitude': float(chunk.longitudes[row]),
+        }
+        for weather_type, values in chunk.values.items():
+            record[weather_type] = values[row]
+        lines.append(json.dumps(record))
+    return '\n'.join(lines) + '\n'
+
+def csv_text(chunk, header=False):
+    """CSV lines for a chunk, with the header row first if requested"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if header:
+        writer.writerow(['location', 'date', 'latitude', 'longitude', *chunk.values])
+    value_columns = list(chunk.values.values())
+    for row, name in enumerate(chunk.names):
+        writer.writerow([
+            name, chunk.dates[row], float(chunk.latitudes[row]), float(chunk.longitudes[row]),
+            *('' if values[row] is None else values[row] for values in value_columns)
+        ])
+    return buffer.getvalue()
+
+def _parquet_table(chunk):
+    import pyarrow as pa
+
+    columns = {
+        'location': pa.array(chunk.names, pa.string()),
+        'date': pa.array(np.asarray(chunk.dates, dtype='datetime64[D]')),
+        'latitude': pa.array(chunk.latitudes, pa.float64()),
+        'longitude': pa.array(chunk.longitudes, pa.float64()),
+    }
+    for weather_type, values in chunk.values.items():
+        columns[weather_type] = pa.array(values, pa.float64())
+    return pa.table(columns)
+
+class _DrainingSink(io.RawIOBase):
+    """Write-only file whose contents are handed out and dropped as they are written
+
+    The writer still sees the true stream position, which Parquet records in its footer.
+    """
+
+    def __init__(self):
+        self._pieces = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._pieces.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._pieces)
+        self._pieces.clear()
+        return data
+
+def _parquet_bytes(chunks):
+    """Parquet file contents, yielded after every row group"""
+    import pyarrow.parquet as pq
+
+    sink = _DrainingSink()
+    writer = None
+    for chunk in chunks:
+        table = _parquet_table(chunk)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+def check_export_format(export_format):
+    """Raise ValueError if export_format is unknown or its dependency is missing"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Export format must be one of {', '.join(EXPORT_FORMATS)}")
+    if export_format == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ValueError('Parquet export requires the pyarrow package')
+
+def encode_export(chunks, export_format):
+    """Encode chunks as a stream of bytes in the given format"""
+    if export_format == 'parquet':
+        yield from _parquet_bytes(chunks)
+        return
+
+    for index, chunk in enumerate(chunks):
+        text = ndjson_text(chunk) if export_format == 'ndjson' else csv_text(chunk, header=index == 0)
+        yield text.encode('utf-8')
@@ -0,0 +1,137 @@
+"""
+Precomputed forecast cube for every known location and calendar day
+
+The model inputs are fully determined by a location's coordinates and the
+calendar date, so the whole output space can be computed offline and served
+by array lookup. The cube has shape (locations, 2, 366, targets): axis 1 is
+the leap-year flag and axis 2 the day of year, which together pin down the
+month and day of month fed to the models.
+"""
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Reference years used to generate dates for each leap-year flag (index 0 = common, 1 = leap)
+CALENDAR_YEARS = (2023, 2024)
+
+def is_leap_year(years):
+    """Vectorized leap year test"""
+    years = np.asarray(years)
+    return (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+
+def cube_dates():
+    """Reference dates for every (leap flag, day of year) slot, shape (2, 366)
+
+    Day 366 of a common year does not exist and is marked with NaT.
+    """
+    dates = np.full((2, 366), np.datetime64('NaT', 'D'))
+    for leap, year in enumerate(CALENDAR_YEARS):
+        start = np.datetime64(f'{year}-01-01')
+        days_in_year = 366 if leap else 365
+        dates[leap, :days_in_year] = start + np.arange(days_in_year)
+    return dates
+
+def build_cube(coordinates, targets, predict_fn):
+    """Compute the forecast cube for a list of (latitude, longitude) pairs
+
+    predict_fn(latitudes, longitudes, dates) must return a dict mapping each
+    target name to an array of predictions, one per row.
+    """
+    dates = cube_dates()
+    valid = ~np.isnat(dates)
+    slot_dates = dates[valid]
+
+    coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    n_locations, n_slots = len(coordinates), len(slot_dates)
+
+    # One row per (location, valid calendar slot)
+    latitudes = np.repeat(coordinates[:, 0], n_slots)
+    longitudes = np.repeat(coordinates[:, 1], n_slots)
+    row_dates = np.tile(slot_dates, n_locations)
+
+    predictions = predict_fn(latitudes, longitudes, row_dates)
+
+    cube = np.full((n_locations, 2, 366, len(targets)), np.nan, dtype=np.float64)
+    for target_index, target in enumerate(targets):
+        values = predictions.get(target)
+        if values is None:
+            raise ValueError(f"No predictions produced for {target}")
+        cube[:, valid, target_index] = np.asarray(values, dtype=np.float64).reshape(n_locations, n_slots)
+
+    return cube
+
+def save_cube(path, cube, coordinates, targets, model_version):
+    """Write the cube as .npy plus a JSON sidecar describing its axes"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, cube)
+    os.replace(tmp_path, path)
+
+    metadata = {
+        'model_version': model_version,
+        'targets': list(targets),
+        'coordinates': [[float(lat), float(lon)] for lat, lon in coordinates],
+        'shape': list(cube.shape),
+    }
+    with open(metadata_path(path), 'w') as f:
+        json.dump(metadata, f)
+
+def metadata_path(path):
+    """Path of the JSON sidecar for a cube file"""
+    return os.path.splitext(path)[0] + '.json'
+
+class ForecastCube:
+    """Read-only, memory-mapped forecast cube answering predictions by lookup"""
+
+    def __init__(self, values, coordinates, targets):
+        self.values = values
+        self.targets = list(targets)
+        self.location_index = {
+            (float(lat), float(lon)): index for index, (lat, lon) in enumerate(coordinates)
+        }
+
+    @classmethod
+    def load(cls, path, model_version):
+        """Memory-map a cube from disk, or return None if it is missing or stale"""
+        if not os.path.exists(path) or not os.path.exists(metadata_path(path)):
+            return None
+
+        try:
+            with open(metadata_path(path)) as f:
+                metadata = json.load(f)
+
+            if metadata.get('model_version') != model_version:
+                logger.warning("Forecast cube %s was built for a different model - ignoring it", path)
+                return None
+
+            values = np.load(path, mmap_mode='r')
+            if list(values.shape) != metadata['shape']:
+                logger.warning("Forecast cube %s does not match its metadata - ignoring it", path)
+                return None
+
+            logger.info("✓ Forecast cube loaded from %s: %s", path, values.shape)
+            return cls(values, metadata['coordinates'], metadata['targets'])
+        except Exception as e:
+            logger.warning("Could not load forecast cube %s: %s", path, e)
+            return None
+
+    def lookup(self, latitudes, longitudes, dates):
+        """Return a dict of target -> predictions for N rows, or None if any location is not in the cube"""
+        location_rows = []
+        for lat, lon in zip(latitudes, longitudes):
+            index = self.location_index.get((float(lat), float(lon)))
+            if index is None:
+                return None
+            location_rows.append(index)
+
+        days = np.asarray(dates, dtype='datetime64[D]')
+        years = days.astype('datetime64[Y]')
+        leap = is_leap_year(years.astype(np.int64) + 1970).astype(np.int64)
+        day_of_year = (days - years).astype(np.int64) + 1
+
+        values = self.values[np.asarray(location_rows), leap, day_of_year - 1]
+        return {target: np.array(values[:, index]) for index, target in enumerate(self.targets)}
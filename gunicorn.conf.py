@@ -0,0 +1,40 @@
+"""
+Gunicorn configuration for multi-worker deployments
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The master compiles the models once into a shared model store and every
+worker memory-maps it, so startup time and model memory stay flat as
+workers are added.
+"""
+import logging
+import multiprocessing
+import os
+
+from model_store import publish_model_store, remove_model_store
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Workers import app.py themselves rather than being forked from a preloaded master:
+# the models are already shared through the store, and threads started at import
+# time would not survive the fork.
+preload_app = False
+
+def on_starting(server):
+    """Publish the compiled models before any worker is spawned"""
+    logging.basicConfig(level=logging.INFO)
+    store_path = publish_model_store(
+        os.environ.get('MODEL_ARTIFACT_FILE', 'combined_weather_models_geo.skymodel'),
+        'combined_weather_models_geo.joblib',
+        os.environ.get('MODEL_STORE_PATH'),
+    )
+    # Workers are forked from the master and inherit its environment
+    os.environ['MODEL_STORE_PATH'] = store_path
+    server.model_store_path = store_path
+
+def on_exit(server):
+    """Remove the shared model store when gunicorn shuts down"""
+    store_path = getattr(server, 'model_store_path', None)
+    if store_path:
+        remove_model_store(store_path)
@@ -0,0 +1,250 @@
+"""
+Background forecast jobs for requests too large to answer inline
+
+A job is a set of equal-length input columns (for example names, latitudes,
+longitudes and dates). Submitting a job saves its columns to the job
+directory and records it as queued in a small SQLite database there. A
+dispatcher thread claims queued jobs from the database one at a time, splits
+each into chunks, runs a chunk function over them in a process pool and
+appends the returned text to the job's result file in order, as chunks
+complete.
+
+Since both the inputs and the state are on disk, any web worker sharing the
+directory can report status, serve results and run queued jobs, and jobs
+survive a restart: resume() requeues jobs whose process died while running
+them and starts working through the queue.
+"""
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+
+def _chunks(columns, chunk_rows):
+    """Slice equal-length columns into tuples of at most chunk_rows rows"""
+    total_rows = len(columns[0])
+    for start in range(0, total_rows, chunk_rows):
+        yield tuple(column[start:start + chunk_rows] for column in columns)
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, but belongs to another user
+    return True
+
+class JobQueue:
+    """Runs queued jobs one at a time, fanning each job's chunks out to a process pool
+
+    chunk_fn (and initializer, run once per worker) must be module-level
+    functions, since they are sent to the workers by reference. With the
+    default forkserver start method every worker imports their module afresh
+    from a clean, single-threaded server process; fork would copy this
+    process, threads' locks and all, at whatever point the pool is started.
+
+    The dispatcher checks the database for jobs queued by other processes
+    every poll_interval seconds while idle.
+    """
+
+    def __init__(self, directory, chunk_fn, workers=None, chunk_rows=50_000, start_method='forkserver',
+                 initializer=None, suffix='.ndjson', poll_interval=1.0):
+        self.directory = directory
+        self.db_path = os.path.join(directory, 'jobs.db')
+        self.chunk_fn = chunk_fn
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_rows = chunk_rows
+        self.start_method = start_method
+        self.initializer = initializer
+        self.suffix = suffix
+        self.poll_interval = poll_interval
+
+        self._owner = f'{socket.gethostname()}:{os.getpid()}'
+        self._wake = threading.Event()
+        self._stopping = False
+        self._executor = None
+        self._dispatcher = None
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    total_rows INTEGER NOT NULL,
+                    done_rows INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    owner TEXT
+                )
+            ''')
+            # Databases created before jobs were claimed by a process lack the owner column
+            if 'owner' not in {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}:
+                conn.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _update(self, job_id, **fields):
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def _inputs_path(self, job_id):
+        return os.path.join(self.directory, f'{job_id}.inputs.npz')
+
+    def result_path(self, job_id):
+        return os.path.join(self.directory, f'{job_id}{self.suffix}')
+
+    def submit(self, columns):
+        """Queue a job over equal-length columns (NumPy arrays, not of object dtype) and return its id"""
+        columns = [np.asarray(column) for column in columns]
+        total_rows = len(columns[0])
+        if any(len(column) != total_rows for column in columns):
+            raise ValueError('Job columns must all have the same length')
+
+        job_id = uuid.uuid4().hex
+        # Inputs are complete on disk before the job can be claimed
+        with open(self._inputs_path(job_id) + '.tmp', 'wb') as f:
+            np.savez(f, *columns)
+        os.replace(self._inputs_path(job_id) + '.tmp', self._inputs_path(job_id))
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, total_rows, created_at) VALUES (?, ?, ?, ?)',
+                (job_id, 'queued', total_rows, datetime.now().isoformat())
+            )
+
+        self._start()
+        self._wake.set()
+        logger.info("✓ Queued job %s with %d rows", job_id, total_rows)
+        return job_id
+
+    def status(self, job_id):
+        """Dict describing a job, or None if it is unknown"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def resume(self):
+        """Requeue jobs left running by processes on this host that have exited, and start
+        working through any queued jobs. Returns the number of queued jobs."""
+        host = socket.gethostname()
+        with self._connect() as conn:
+            for job_id, owner in conn.execute("SELECT id, owner FROM jobs WHERE status = 'running'").fetchall():
+                owner_host, _, pid = (owner or '').rpartition(':')
+                if owner_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                    logger.warning("Requeuing job %s, interrupted when process %s exited", job_id, pid)
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', owner = NULL, done_rows = 0 WHERE id = ? AND status = 'running'",
+                        (job_id,)
+                    )
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+        if queued:
+            self._start()
+            self._wake.set()
+        return queued
+
+    def _start(self):
+        """Create the pool and dispatcher on first use"""
+        with self._lock:
+            if self._dispatcher is not None:
+                return
+            self._stopping = False
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context(self.start_method),
+                initializer=self.initializer
+            )
+            self._dispatcher = threading.Thread(target=self._dispatch, name='job-dispatcher', daemon=True)
+            self._dispatcher.start()
+
+    def _claim(self):
+        """Mark the oldest queued job as running in this process and return its id, or None"""
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, started_at = ? WHERE id = ?",
+                (self._owner, datetime.now().isoformat(), row[0])
+            )
+        return row[0]
+
+    def _dispatch(self):
+        while not self._stopping:
+            self._wake.clear()
+            job_id = self._claim()
+            if job_id is None:
+                self._wake.wait(self.poll_interval)
+                continue
+            try:
+                self._run(job_id)
+            except Exception as e:
+                logger.error("✗ Job %s failed: %s", job_id, e)
+                try:
+                    os.remove(self.result_path(job_id) + '.part')
+                except FileNotFoundError:
+                    pass
+                self._update(job_id, status='failed', error=str(e), finished_at=datetime.now().isoformat())
+            finally:
+                try:
+                    os.remove(self._inputs_path(job_id))
+                except FileNotFoundError:
+                    pass
+
+    def _run(self, job_id):
+        with np.load(self._inputs_path(job_id), allow_pickle=False) as inputs:
+            columns = [inputs[f'arr_{index}'] for index in range(len(inputs.files))]
+        partial_path = self.result_path(job_id) + '.part'
+        done_rows = 0
+
+        # Keep a bounded number of chunks in flight so memory stays flat for huge jobs
+        in_flight = deque()
+        chunks = _chunks(columns, self.chunk_rows)
+        with open(partial_path, 'w') as result_file:
+            for chunk in chunks:
+                in_flight.append((len(chunk[0]), self._executor.submit(self.chunk_fn, *chunk)))
+                if len(in_flight) >= 2 * self.workers:
+                    done_rows += self._write_next(job_id, in_flight, result_file, done_rows)
+            while in_flight:
+                done_rows += self._write_next(job_id, in_flight, result_file, done_rows)
+
+        os.replace(partial_path, self.result_path(job_id))
+        self._update(job_id, status='done', done_rows=done_rows, finished_at=datetime.now().isoformat())
+        logger.info("✓ Finished job %s: %d rows", job_id, done_rows)
+
+    def _write_next(self, job_id, in_flight, result_file, done_rows):
+        """Append the oldest chunk's output to the result file and record progress"""
+        rows, future = in_flight.popleft()
+        result_file.write(future.result())
+        result_file.flush()
+        self._update(job_id, done_rows=done_rows + rows)
+        return rows
+
+    def shutdown(self):
+        """Stop the dispatcher after the running job and shut the pool down"""
+        with self._lock:
+            if self._dispatcher is None:
+                return
+            self._stopping = True
+            self._wake.set()
+            self._dispatcher.join()
+            self._executor.shutdown()
+            self._dispatcher = self._executor = None
@@ -0,0 +1,180 @@
+"""
+Native model artifact format for the compiled weather models
+
+Layout (all integers little-endian):
+
+    8 bytes   magic b'SKYMODEL'
+    4 bytes   format version (uint32)
+    4 bytes   header length in bytes (uint32)
+    N bytes   JSON header
+    padding   zeros up to a multiple of ALIGNMENT
+    payload   raw array data, each array starting on an ALIGNMENT boundary
+
+The header records, for each weather type, the base value, feature count and
+the offset/dtype/shape of its flat tree arrays and of its precomputed scoring
+tables (format version 2), along with a SHA-256 of the payload and the
+fingerprint of the joblib file the models were converted from. Loading
+memory-maps the file and wraps the arrays without copying them, so processes
+loading the same file share the scoring tables as well as the trees; version
+1 files, which only hold the trees, have their tables rebuilt on load.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from tree_compiler import CompiledTreeEnsemble
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SKYMODEL'
+FORMAT_VERSION = 2
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+ALIGNMENT = 64
+
+# Flat tree arrays stored for every model, with their on-disk dtypes
+ARRAY_DTYPES = {
+    'feature': '<i8',
+    'threshold': '<f8',
+    'left': '<i8',
+    'right': '<i8',
+    'value': '<f8',
+    'roots': '<i8',
+}
+
+# Scoring tables stored for every model; prefix_masks keeps its (little-endian) mask width
+SCORING_ARRAY_DTYPES = {
+    'split_features': '<i8',
+    'split_offsets': '<i8',
+    'split_thresholds': '<f8',
+    'prefix_masks': None,
+    'value_table': '<f8',
+    'table_offsets': '<i8',
+}
+
+_PREAMBLE = struct.Struct('<8sII')
+
+def compute_model_version(model_file):
+    """Fingerprint of the model file, used to detect when the loaded model changes"""
+    with open(model_file, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+def _padding(size):
+    """Bytes needed to pad size up to the next ALIGNMENT boundary"""
+    return -size % ALIGNMENT
+
+def _append_array(payload, array, dtype):
+    """Append an array on an ALIGNMENT boundary and return its header entry"""
+    data = np.ascontiguousarray(array, dtype=dtype)
+    payload += b'\0' * _padding(len(payload))
+    spec = {'offset': len(payload), 'dtype': data.dtype.str, 'shape': list(data.shape)}
+    payload += data.tobytes()
+    return spec
+
+def _wrap_arrays(buffer, payload_start, specs):
+    return {
+        name: np.frombuffer(
+            buffer, dtype=spec['dtype'], count=int(np.prod(spec['shape'])),
+            offset=payload_start + spec['offset']
+        ).reshape(spec['shape'])
+        for name, spec in specs.items()
+    }
+
+def write_model_artifact(path, models, model_version):
+    """Write a dict of CompiledTreeEnsemble models to path"""
+    payload = bytearray()
+    model_headers = {}
+
+    for weather_type, compiled in models.items():
+        arrays = {
+            name: _append_array(payload, getattr(compiled, name), dtype)
+            for name, dtype in ARRAY_DTYPES.items()
+        }
+
+        tables = compiled.scoring_tables()
+        scoring_arrays = {}
+        for name, dtype in SCORING_ARRAY_DTYPES.items():
+            table = tables[name]
+            scoring_arrays[name] = _append_array(payload, table, dtype or table.dtype.newbyteorder('<'))
+
+        model_headers[weather_type] = {
+            'base_value': compiled.base_value,
+            'n_features': compiled.n_features_in_,
+            'arrays': arrays,
+            'scoring': {'mask_is_index': tables['mask_is_index'], 'arrays': scoring_arrays},
+        }
+
+    header = json.dumps({
+        'format_version': FORMAT_VERSION,
+        'model_version': model_version,
+        'payload_size': len(payload),
+        'payload_sha256': hashlib.sha256(payload).hexdigest(),
+        'models': model_headers,
+    }).encode('utf-8')
+
+    preamble = _PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header))
+    padding = b'\0' * _padding(len(preamble) + len(header))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(preamble)
+        f.write(header)
+        f.write(padding)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+class ModelArtifact:
+    """A memory-mapped model artifact: its models and the model version they came from"""
+
+    def __init__(self, path, buffer, header, payload_start):
+        self.path = path
+        self.model_version = header['model_version']
+        self.models = {}
+
+        for weather_type, model_header in header['models'].items():
+            scoring = model_header.get('scoring')
+            scoring_tables = None
+            if scoring is not None:
+                scoring_tables = _wrap_arrays(buffer, payload_start, scoring['arrays'])
+                scoring_tables['mask_is_index'] = scoring['mask_is_index']
+
+            self.models[weather_type] = CompiledTreeEnsemble(
+                base_value=model_header['base_value'],
+                n_features=model_header['n_features'],
+                scoring_tables=scoring_tables,
+                **_wrap_arrays(buffer, payload_start, model_header['arrays'])
+            )
+
+def read_model_artifact(path, verify=True):
+    """Memory-map and parse a model artifact, raising ValueError if it is invalid"""
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(buffer) < _PREAMBLE.size:
+        raise ValueError(f"{path} is too short to be a model artifact")
+
+    magic, format_version, header_length = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a model artifact")
+    if format_version not in SUPPORTED_FORMAT_VERSIONS:
+        raise ValueError(f"{path} has format version {format_version}, expected one of {SUPPORTED_FORMAT_VERSIONS}")
+
+    header_end = _PREAMBLE.size + header_length
+    header = json.loads(bytes(buffer[_PREAMBLE.size:header_end]).decode('utf-8'))
+    payload_start = header_end + _padding(header_end)
+
+    if payload_start + header['payload_size'] > len(buffer):
+        raise ValueError(f"{path} is truncated")
+
+    if verify:
+        view = memoryview(buffer)[payload_start:payload_start + header['payload_size']]
+        checksum = hashlib.sha256(view).hexdigest()
+        view.release()
+        if checksum != header['payload_sha256']:
+            raise ValueError(f"{path} failed checksum verification")
+
+    return ModelArtifact(path, buffer, header, payload_start)
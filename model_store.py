@@ -0,0 +1,65 @@
+"""
+Shared model store for multi-worker (gunicorn/prefork) deployments
+
+The master process compiles the models once and publishes them as a native
+model artifact on a shared-memory filesystem (/dev/shm when available).
+Workers find it through the MODEL_STORE_PATH environment variable and
+memory-map it read-only, so every worker maps the same physical pages
+instead of unpickling and compiling its own copy.
+"""
+import logging
+import os
+import shutil
+import tempfile
+
+from model_artifact import compute_model_version, read_model_artifact, write_model_artifact
+
+logger = logging.getLogger(__name__)
+
+def default_store_path():
+    """Per-master store location, on tmpfs when the platform has one"""
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, f'skycast-models-{os.getpid()}.skymodel')
+
+def publish_model_store(artifact_file, model_file, store_path=None):
+    """Materialize the compiled models at store_path and return that path
+
+    Copies the native artifact if it exists, is valid and was converted from
+    the current model_file, otherwise compiles the legacy joblib models (this
+    is the only process that imports sklearn).
+    """
+    store_path = store_path or default_store_path()
+
+    if os.path.exists(artifact_file):
+        try:
+            artifact = read_model_artifact(artifact_file)
+            if os.path.exists(model_file) and artifact.model_version != compute_model_version(model_file):
+                raise ValueError(f"it was converted from model version {artifact.model_version}, not the current {model_file}")
+            shutil.copyfile(artifact_file, store_path + '.tmp')
+            os.replace(store_path + '.tmp', store_path)
+            logger.info("✓ Published %s to shared model store %s", artifact_file, store_path)
+            return store_path
+        except Exception as e:
+            logger.warning("✗ Could not publish %s, compiling %s instead: %s", artifact_file, model_file, e)
+
+    import joblib
+    from tree_compiler import compile_gradient_boosting, verify_compiled
+
+    source_models = joblib.load(model_file)
+    compiled_models = {}
+    for weather_type, weather_model in source_models.items():
+        compiled = compile_gradient_boosting(weather_model)
+        if not verify_compiled(weather_model, compiled):
+            raise ValueError(f"Compiled {weather_type} model does not match scikit-learn")
+        compiled_models[weather_type] = compiled
+
+    write_model_artifact(store_path, compiled_models, compute_model_version(model_file))
+    logger.info("✓ Compiled %s into shared model store %s", model_file, store_path)
+    return store_path
+
+def remove_model_store(store_path):
+    """Delete a published store; workers that still map it keep their pages until they exit"""
+    try:
+        os.remove(store_path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,142 @@
+"""
+Parallel model inference over (model, row chunk) work units
+
+predict_feature_matrix runs several independent models over one feature
+matrix. For large matrices the executor splits the rows into one chunk per
+worker and evaluates every (model, chunk) pair on a thread or process pool,
+concatenating each model's chunks back in row order. Smaller matrices run
+serially, where pool overhead would outweigh the gain.
+
+Threads suit the NumPy tree evaluator and sklearn, which both release the GIL
+for most of their work. Process workers are started from a forkserver (or
+spawned) rather than forked from the multi-threaded web process, and get their
+predict functions from an initializer that loads the models in the worker, so
+only task names, feature chunks and predictions cross process boundaries.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ('serial', 'thread', 'process')
+
+# Predict functions of a process worker, set up by its initializer
+_process_tasks = {}
+
+def _init_process_worker(initializer, initargs):
+    _process_tasks.update(initializer(*initargs))
+
+def _run_process_task(name, features):
+    return _process_tasks[name](features)
+
+def _call(fn, features):
+    """fn(features), or the exception it raised"""
+    try:
+        return fn(features)
+    except Exception as e:
+        return e
+
+class InferenceExecutor:
+    """Runs named predict functions over a feature matrix, in parallel once it is large enough
+
+    The process kind needs an initializer: a module-level function that is
+    called with initargs once in every worker and returns the worker's dict of
+    task name -> predict function. Tasks passed to run() are looked up there by
+    name; the functions themselves are only called in the parent for serial runs.
+    """
+
+    def __init__(self, kind='thread', workers=None, min_parallel_rows=20_000, min_chunk_rows=4096,
+                 start_method='forkserver', initializer=None, initargs=()):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind {kind!r}, expected one of {EXECUTOR_KINDS}")
+        if kind == 'process' and initializer is None:
+            raise ValueError("The process executor needs an initializer returning the workers' predict functions")
+
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.min_parallel_rows = min_parallel_rows
+        self.min_chunk_rows = min_chunk_rows
+        self.start_method = start_method
+        self.initializer = initializer
+        self.initargs = tuple(initargs)
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @property
+    def parallel(self):
+        return self.kind != 'serial' and self.workers > 1
+
+    def _get_pool(self):
+        if os.getpid() != self._pid:
+            # A forked child inherits the pool without its threads or processes, and possibly
+            # the lock in a held state; start over with its own
+            self._pool, self._lock = None, threading.Lock()
+            self._pid = os.getpid()
+
+        with self._lock:
+            if self._pool is None:
+                if self.kind == 'thread':
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+                else:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=_init_process_worker,
+                        initargs=(self.initializer, self.initargs),
+                    )
+                    logger.info("✓ Started %d inference processes (%s)", self.workers, self.start_method)
+            return self._pool
+
+    def run(self, tasks, features, timings=None):
+        """Dict of task name -> fn(features) for a dict of name -> predict function
+
+        A task that raised maps to its exception instead, so one failing model
+        does not take the others down. If a timings dict is given it receives
+        each task's duration in seconds (in parallel runs, the time until all of
+        its chunks were done).
+        """
+        n_rows = len(features)
+        started = time.perf_counter()
+        if not self.parallel or n_rows < self.min_parallel_rows:
+            results = {}
+            for name, fn in tasks.items():
+                results[name] = _call(fn, features)
+                if timings is not None:
+                    timings[name] = time.perf_counter() - started
+                    started = time.perf_counter()
+            return results
+
+        pool = self._get_pool()
+        chunk_rows = max(self.min_chunk_rows, -(-n_rows // self.workers))
+        starts = range(0, n_rows, chunk_rows)
+
+        futures = {}
+        for name, fn in tasks.items():
+            if self.kind == 'thread':
+                futures[name] = [pool.submit(fn, features[start:start + chunk_rows]) for start in starts]
+            else:
+                futures[name] = [pool.submit(_run_process_task, name, features[start:start + chunk_rows]) for start in starts]
+
+        results = {}
+        for name, parts in futures.items():
+            try:
+                results[name] = np.concatenate([part.result() for part in parts])
+            except Exception as e:
+                results[name] = e
+            if timings is not None:
+                timings[name] = time.perf_counter() - started
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
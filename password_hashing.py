@@ -0,0 +1,130 @@
+"""
+PBKDF2 password hashing on a bounded worker pool
+
+Hashes are stored as pbkdf2_sha256$<iterations>$<salt>$<hex digest>, so the
+cost they were made with travels with them and can be raised without
+invalidating existing passwords: a login whose hash is weaker than the
+current setting (or still in the original salt-plus-digest format) is
+rehashed. Hashing runs on a small thread pool (pbkdf2_hmac releases the GIL)
+with a bounded number of waiting jobs, so a burst of logins cannot occupy
+more than `workers` cores; when the queue is full callers get HashingBusy
+instead of piling on.
+"""
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_ALGORITHM = 'pbkdf2_sha256'
+
+# Cost of hashes stored before the format carried its parameters
+LEGACY_ITERATIONS = 100_000
+LEGACY_SALT_LENGTH = 32
+
+# Stored for accounts that have no password (Google sign-ups); never matches any password
+UNUSABLE_PASSWORD = '!'
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+def make_hash(password, iterations, salt=None):
+    """Hash a password with a random (or given) salt in the self-describing format"""
+    salt = salt or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), iterations)
+    return f'{HASH_ALGORITHM}${iterations}${salt}${digest.hex()}'
+
+def parse_hash(stored_hash):
+    """(iterations, salt, hex digest) of a stored hash, or None if it can never match"""
+    if stored_hash.startswith(HASH_ALGORITHM + '$'):
+        try:
+            _, iterations, salt, digest = stored_hash.split('$')
+            return int(iterations), salt, digest
+        except ValueError:
+            return None
+    if len(stored_hash) > LEGACY_SALT_LENGTH:
+        return LEGACY_ITERATIONS, stored_hash[:LEGACY_SALT_LENGTH], stored_hash[LEGACY_SALT_LENGTH:]
+    return None
+
+def check_hash(password, stored_hash):
+    """Whether password matches a stored hash in either format"""
+    parsed = parse_hash(stored_hash)
+    if parsed is None:
+        return False
+    iterations, salt, digest = parsed
+    candidate = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), iterations)
+    return hmac.compare_digest(candidate.hex(), digest)
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a bounded pool of hashing threads"""
+
+    def __init__(self, iterations=LEGACY_ITERATIONS, workers=2, max_queue=64, wait_timeout=5.0):
+        self.iterations = iterations
+        self.workers = workers
+        self.max_queue = max_queue
+        self.wait_timeout = wait_timeout
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.started = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    def _submit(self, fn, *args):
+        """Run fn(*args) on the pool and return its result, waiting at most wait_timeout for a slot"""
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HashingBusy('Password hashing queue is full')
+
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+        def run():
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.started += 1
+                self.total_wait += time.perf_counter() - submitted_at
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                self._slots.release()
+
+        return self._executor.submit(run).result()
+
+    def hash(self, password):
+        return self._submit(make_hash, password, self.iterations)
+
+    def verify(self, password, stored_hash):
+        return self._submit(check_hash, password, stored_hash)
+
+    def needs_rehash(self, stored_hash):
+        """Whether a (verified) hash is in the legacy format or cheaper than the current cost"""
+        parsed = parse_hash(stored_hash)
+        return parsed is not None and (not stored_hash.startswith(HASH_ALGORITHM + '$') or parsed[0] < self.iterations)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'iterations': self.iterations,
+                'workers': self.workers,
+                'queue_depth': self.queued,
+                'max_queue_depth': self.max_queued,
+                'running': self.running,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'average_wait_ms': round(1000 * self.total_wait / self.started, 3) if self.started else 0.0,
+            }
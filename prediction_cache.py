@@ -0,0 +1,110 @@
+"""
+Bounded in-process cache for weather predictions
+
+Entries are keyed on (latitude, longitude, date) and tagged with the model
+version they were computed with, so a different model never serves stale
+predictions.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+EVICTION_POLICIES = ('lru', 'fifo')
+
+class PredictionCache:
+    """Thread-safe LRU/FIFO cache with a maximum size and per-entry TTL"""
+
+    def __init__(self, max_size=4096, ttl=3600.0, policy='lru'):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy!r}, expected one of {EVICTION_POLICIES}")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.policy = policy
+        self.model_version = None
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def _check_version(self, model_version):
+        """Drop every entry if the model changed since they were stored (lock must be held)"""
+        if model_version != self.model_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.model_version = model_version
+
+    def get(self, key, model_version):
+        """Return the cached value for key, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            self._check_version(model_version)
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if self.ttl and time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            if self.policy == 'lru':
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, model_version):
+        """Store a value, evicting the oldest (FIFO) or least recently used (LRU) entry when full"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._check_version(model_version)
+            expires_at = time.monotonic() + self.ttl if self.ttl else None
+
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (expires_at, value)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'policy': self.policy,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'model_version': self.model_version,
+            }
@@ -0,0 +1,243 @@
+"""
+Opt-in request profiling with an on-disk ring buffer of profiles
+
+Two profilers are available:
+
+- cProfile, for requests that carry the profiling header or are picked by the
+  sampling rate. Its output is saved as a .pstats file (open it with pstats,
+  snakeviz or gprof2dot). Since Python 3.12 cProfile observes every thread
+  and only one can be active at a time, so requests that arrive while another
+  is being profiled are stack-sampled instead.
+- A stack sampler, used for the slow-request threshold: one background thread
+  records the stacks of every in-flight request every few milliseconds, and
+  a request's samples are only kept if it turned out slower than the
+  threshold. The result is saved in the collapsed-stack format
+  ("frame;frame;frame count" lines) that flamegraph.pl and speedscope read.
+
+Each profile is stored as a data file plus a JSON metadata file. The store
+keeps the newest `max_profiles` and deletes older ones as new ones arrive.
+"""
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FORMATS = {'pstats': '.pstats', 'collapsed': '.collapsed'}
+
+_PROFILE_ID = re.compile(r'^\d{20}-[0-9a-f]{8}$')
+
+def collapse_stack(frame):
+    """Collapsed-stack line for a frame and its callers, outermost first"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+class StackSampler:
+    """Samples the stacks of registered threads from a single background thread"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._samples = {}  # thread id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = os.getpid()
+
+    def start(self, ident):
+        with self._lock:
+            if os.getpid() != self._pid:
+                # The sampler thread does not survive a fork
+                self._samples, self._thread, self._pid = {}, None, os.getpid()
+            self._samples[ident] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, ident):
+        """Stop sampling a thread and return its Counter of collapsed stacks"""
+        with self._lock:
+            return self._samples.pop(ident, Counter())
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._samples:
+                    self._wake.clear()
+                for ident, counts in self._samples.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        counts[collapse_stack(frame)] += 1
+            del frames
+
+class ProfileStore:
+    """Directory holding the newest max_profiles profiles"""
+
+    def __init__(self, directory, max_profiles=50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def _path(self, profile_id, extension):
+        return os.path.join(self.directory, profile_id + extension)
+
+    def save(self, profile_format, write_fn, metadata):
+        """Store a profile written by write_fn(path) and return its id"""
+        profile_id = f'{time.time_ns():020d}-{secrets.token_hex(4)}'
+        extension = PROFILE_FORMATS[profile_format]
+        # Created on the first save, so the directory only exists once something was profiled
+        os.makedirs(self.directory, exist_ok=True)
+        write_fn(self._path(profile_id, extension))
+
+        metadata = dict(metadata, id=profile_id, format=profile_format, file=profile_id + extension)
+        temp_path = self._path(profile_id, '.json.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(metadata, f)
+        # The metadata file appears last, so listed profiles are always complete
+        os.replace(temp_path, self._path(profile_id, '.json'))
+
+        self._prune()
+        return profile_id
+
+    def _prune(self):
+        profile_ids = sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.json'))
+        for profile_id in profile_ids[:-self.max_profiles]:
+            for extension in ('.json', *PROFILE_FORMATS.values()):
+                try:
+                    os.remove(self._path(profile_id, extension))
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        """Metadata of the stored profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # Pruned by another process while listing
+        return profiles
+
+    def get(self, profile_id):
+        """(path, metadata) of a stored profile, or None"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, '.json')) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+        path = os.path.join(self.directory, metadata['file'])
+        return (path, metadata) if os.path.exists(path) else None
+
+class RequestProfiler:
+    """Profiles requests from Flask request hooks when a trigger applies
+
+    Triggers: a profile_header carrying the admin token, a sample_rate
+    fraction of requests, or (with slow_ms set) any request slower than slow_ms.
+    """
+
+    def __init__(self, store, sample_rate=0.0, slow_ms=None, token=None, profile_header='X-Profile', sampler_interval=0.005):
+        self.store = store
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.token = token
+        self.profile_header = profile_header
+
+        self._sampler = StackSampler(sampler_interval)
+        self._cprofile_lock = threading.Lock()
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.teardown_request(self._finish)
+
+    def check_token(self, candidate):
+        """Whether candidate is the admin token (always False when no token is configured)"""
+        return bool(self.token and candidate) and hmac.compare_digest(candidate.encode(), self.token.encode())
+
+    def _trigger(self):
+        if self.check_token(request.headers.get(self.profile_header)):
+            return 'header'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sampled'
+        if self.slow_ms is not None:
+            return 'slow'
+        return None
+
+    def _start(self):
+        trigger = self._trigger()
+        if trigger is None:
+            return
+
+        g.profile_trigger = trigger
+        g.profile_started = time.perf_counter()
+        if trigger != 'slow' and self._cprofile_lock.acquire(blocking=False):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                g.cprofile = profile
+                return
+            except ValueError:
+                # Another profiler (e.g. one wrapping the whole server) is already active
+                self._cprofile_lock.release()
+        g.profile_thread = threading.get_ident()
+        self._sampler.start(g.profile_thread)
+
+    def _finish(self, exc=None):
+        trigger = g.pop('profile_trigger', None)
+        if trigger is None:
+            return
+
+        duration_ms = (time.perf_counter() - g.pop('profile_started')) * 1000
+        profile = g.pop('cprofile', None)
+        if profile is not None:
+            profile.disable()
+            self._cprofile_lock.release()
+            profile_format, write_fn = 'pstats', profile.dump_stats
+        else:
+            samples = self._sampler.stop(g.pop('profile_thread'))
+            if trigger == 'slow' and duration_ms < self.slow_ms or not samples:
+                return
+            profile_format, write_fn = 'collapsed', lambda path: _write_collapsed(path, samples)
+
+        metadata = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'trigger': trigger,
+            'duration_ms': round(duration_ms, 2),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'pid': os.getpid(),
+        }
+        try:
+            profile_id = self.store.save(profile_format, write_fn, metadata)
+            logger.info("✓ Saved %s profile %s for %s %s (%.1f ms)", profile_format, profile_id, request.method, request.path, duration_ms)
+        except OSError as e:
+            logger.error("✗ Could not save profile for %s: %s", request.path, e)
+
+def _write_collapsed(path, samples):
+    with open(path, 'w') as f:
+        for stack, count in samples.most_common():
+            f.write(f'{stack} {count}\n')
@@ -0,0 +1,55 @@
+"""
+Gridded forecasts over a latitude/longitude bounding box
+
+A raster is a regular mesh of cell centres, north-west cell first, so row 0
+is the northern edge as in an image. Layers are stacked into one
+(targets, rows, columns) array and sent as a .npy file, which NumPy reads
+back with np.load and browsers can parse with a few lines of code.
+"""
+import io
+
+import numpy as np
+
+# Dtypes a raster may be encoded with; float16 halves the payload and keeps ~3 significant digits
+RASTER_DTYPES = {'float16': np.float16, 'float32': np.float32}
+
+def parse_bbox(text):
+    """Parse "min_lat,min_lon,max_lat,max_lon" into a tuple of floats
+
+    Raises ValueError if it is malformed or empty.
+    """
+    try:
+        bounds = tuple(float(part) for part in str(text).split(','))
+    except ValueError:
+        raise ValueError('bbox must be four comma-separated numbers: min_lat,min_lon,max_lat,max_lon')
+    if len(bounds) != 4 or not all(np.isfinite(bounds)):
+        raise ValueError('bbox must be four comma-separated numbers: min_lat,min_lon,max_lat,max_lon')
+
+    min_lat, min_lon, max_lat, max_lon = bounds
+    if min_lat >= max_lat or min_lon >= max_lon:
+        raise ValueError('bbox minimums must be below its maximums')
+    return bounds
+
+def raster_shape(bounds, resolution):
+    """(rows, columns) of the mesh covering bounds with cells resolution degrees wide"""
+    min_lat, min_lon, max_lat, max_lon = bounds
+    # Cells that would only cover float noise past the edge are dropped
+    rows = int(np.ceil(round((max_lat - min_lat) / resolution, 9)))
+    columns = int(np.ceil(round((max_lon - min_lon) / resolution, 9)))
+    return rows, columns
+
+def raster_mesh(bounds, resolution):
+    """Latitudes and longitudes of every cell centre, each flattened to rows * columns"""
+    min_lat, min_lon, max_lat, max_lon = bounds
+    rows, columns = raster_shape(bounds, resolution)
+
+    latitudes = max_lat - (np.arange(rows) + 0.5) * resolution
+    longitudes = min_lon + (np.arange(columns) + 0.5) * resolution
+    lat_mesh, lon_mesh = np.meshgrid(latitudes, longitudes, indexing='ij')
+    return lat_mesh.ravel(), lon_mesh.ravel()
+
+def encode_raster(layers, dtype='float16'):
+    """Serialize a (targets, rows, columns) array as .npy bytes"""
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(layers, dtype=RASTER_DTYPES[dtype]), allow_pickle=False)
+    return buffer.getvalue()
@@ -0,0 +1,152 @@
+"""
+Asynchronous, structured and sampled logging
+
+Log calls on request threads only put the record on an in-memory queue; a
+background listener thread formats it as one JSON line and writes it out, so
+neither formatting nor disk I/O happens on the request path. Records keep
+their %-style arguments until the writer formats them, which means
+disabled levels cost almost nothing and enabled ones are formatted off the
+request thread (arguments should therefore be values that are not modified
+after the call).
+
+Every request produces one compact record (endpoint, status, duration and
+whatever the handler annotated) instead of several free-text lines. Routes
+can be sampled at their own rate; server errors and slow requests are always
+logged, and each record carries the rate it was sampled at so counts can be
+scaled back up.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# LogRecord attributes that are not extra fields
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single JSON object, with any extra= fields at the top level"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+class DeferredQueueHandler(QueueHandler):
+    """Queues records without formatting them first
+
+    The stock QueueHandler formats every record before queuing it so that it
+    can be pickled; the listener here is a thread in the same process, so
+    only the traceback (which would keep frames alive) is rendered eagerly.
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def setup_async_logging(level=logging.INFO, stream=None, target=None):
+    """Send target's records (the root logger by default) through a queue to a JSON writer thread
+
+    Like logging.basicConfig this does nothing if the logger already has
+    handlers. Returns the started QueueListener, or None.
+    """
+    target = target if target is not None else logging.getLogger()
+    if target.handlers:
+        return None
+
+    writer = logging.StreamHandler(stream)
+    writer.setFormatter(JsonFormatter())
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    listener = QueueListener(records, writer, respect_handler_level=True)
+
+    target.addHandler(handler)
+    target.setLevel(level)
+    listener.start()
+    atexit.register(listener.stop)
+
+    def restart_in_child():
+        # The writer thread does not survive a fork; give the child its own queue and listener
+        if handler not in target.handlers:
+            return
+        handler.queue = queue.SimpleQueue()
+        child_listener = QueueListener(handler.queue, writer, respect_handler_level=True)
+        child_listener.start()
+        atexit.register(child_listener.stop)
+
+    os.register_at_fork(after_in_child=restart_in_child)
+    return listener
+
+def parse_sample_rates(spec):
+    """Endpoint -> sampling rate for a spec like 'predict_weather=0.1,static=0'"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        endpoint, _, rate = item.partition('=')
+        try:
+            rates[endpoint.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            raise ValueError(f"Invalid sampling rate for {endpoint.strip()!r}: {rate!r}")
+    return rates
+
+def annotate_request(**fields):
+    """Add fields to the current request's log record"""
+    g.setdefault('log_fields', {}).update(fields)
+
+class RequestLogger:
+    """Emits one sampled record per request from Flask request hooks"""
+
+    def __init__(self, sample_rates=None, default_rate=1.0, slow_ms=1000.0):
+        self.sample_rates = sample_rates or {}
+        self.default_rate = default_rate
+        self.slow_ms = slow_ms
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g.request_started = time.perf_counter()
+
+    def _finish(self, response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        rate = self.sample_rates.get(request.endpoint, self.default_rate)
+        always = response.status_code >= 500 or duration_ms >= self.slow_ms
+        if not always and (rate <= 0.0 or random.random() >= rate):
+            return response
+
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'sample_rate': 1.0 if always else rate,
+        }
+        fields.update(g.get('log_fields', {}))
+        level = logging.ERROR if response.status_code >= 500 else logging.WARNING if duration_ms >= self.slow_ms else logging.INFO
+        logger.log(level, '%s %s %s', request.method, request.path, response.status_code, extra=fields)
+        return response
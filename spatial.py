@@ -0,0 +1,284 @@
+"""
+Region and climate-zone classification of coordinates
+
+Each layer is a set of non-overlapping polygons, given as (latitude, longitude)
+vertices, indexed by a regular grid of 1/16 degree cells. A cell that no
+polygon edge passes through lies entirely inside one polygon (or none), so its
+label is stored directly; only points in the few cells crossed by an edge are
+tested against the polygons whose edges cross that cell. Classifying a point
+is therefore a constant-time array lookup in almost every case.
+
+Points on an edge shared by two polygons belong to the polygon to the north
+and to the east of the edge, consistent with the grid's floor-based cells.
+"""
+import math
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Mean Earth radius, for great-circle distances
+EARTH_RADIUS_KM = 6371.0
+
+# Grid cells per degree; a power of two keeps cell boundaries exact in floating point
+CELLS_PER_DEGREE = 16
+
+# Grid extent (min_lat, min_lon, max_lat, max_lon), covering Ghana with a margin
+GHANA_BOUNDS = (4, -4, 12, 2)
+
+# Simplified outlines of the ten regions the city table is grouped by, as
+# (latitude, longitude) vertices. Neighbouring regions share their boundary vertices.
+REGION_POLYGONS = {
+    'Greater Accra': [
+        (5.28, -0.38), (5.35, -0.20), (5.60, 0.40), (5.78, 0.25), (5.775, -0.38),
+    ],
+    'Central': [
+        (5.28, -0.38), (5.775, -0.38), (5.75, -0.70), (5.85, -1.05), (6.10, -1.20),
+        (6.05, -1.85), (5.60, -1.60), (4.85, -1.55), (4.90, -1.40), (5.20, -0.60),
+    ],
+    'Western': [
+        (4.85, -1.55), (5.60, -1.60), (6.05, -1.85), (6.30, -2.20), (6.60, -2.20),
+        (6.60, -3.20), (5.50, -3.10), (4.70, -3.20), (4.55, -2.10),
+    ],
+    'Eastern': [
+        (5.775, -0.38), (5.78, 0.25), (6.00, 0.25), (6.40, 0.20), (7.00, 0.10),
+        (7.30, -0.45), (6.95, -0.65), (6.65, -0.85), (6.20, -0.85), (6.10, -1.20),
+        (5.85, -1.05), (5.75, -0.70),
+    ],
+    'Volta': [
+        (5.78, 0.25), (5.60, 0.40), (5.70, 0.90), (5.95, 1.25), (6.20, 1.25),
+        (6.60, 1.10), (7.00, 0.65), (7.60, 0.60), (8.35, 0.65), (8.35, -0.20),
+        (7.60, -0.20), (7.30, -0.45), (7.00, 0.10), (6.40, 0.20), (6.00, 0.25),
+    ],
+    'Ashanti': [
+        (6.05, -1.85), (6.10, -1.20), (6.20, -0.85), (6.65, -0.85), (6.95, -0.65),
+        (7.30, -0.45), (7.45, -1.00), (7.45, -1.60), (7.00, -2.05), (6.60, -2.20),
+        (6.30, -2.20),
+    ],
+    'Brong Ahafo': [
+        (6.60, -2.20), (7.00, -2.05), (7.45, -1.60), (7.45, -1.00), (7.30, -0.45),
+        (7.60, -0.20), (8.35, -0.20), (8.40, -1.50), (8.70, -3.00), (8.30, -3.10),
+        (7.50, -3.30), (6.60, -3.20),
+    ],
+    'Northern': [
+        (8.70, -3.00), (8.40, -1.50), (8.35, -0.20), (8.35, 0.65), (9.00, 0.75),
+        (9.80, 0.55), (10.60, 0.15), (10.60, -0.60), (10.35, -0.95), (10.35, -1.70),
+        (10.00, -1.70), (10.00, -3.00), (9.60, -3.00), (9.00, -2.80),
+    ],
+    'Upper East': [
+        (10.35, -1.70), (10.35, -0.95), (10.60, -0.60), (10.60, 0.15), (11.25, 0.10),
+        (11.25, -1.70),
+    ],
+    'Upper West': [
+        (10.00, -3.00), (10.00, -1.70), (11.25, -1.70), (11.25, -3.00),
+    ],
+}
+
+# The climate zones the fallback model is calibrated on: the southern coastal
+# belt below 6°N, the middle forest belt below 8°N and the northern savanna.
+# They are latitude bands, so points outside GHANA_BOUNDS take the zone of the
+# nearest edge of the grid.
+CLIMATE_ZONE_POLYGONS = {
+    'coastal': [(4, -4), (6, -4), (6, 2), (4, 2)],
+    'forest': [(6, -4), (8, -4), (8, 2), (6, 2)],
+    'savanna': [(8, -4), (12, -4), (12, 2), (8, 2)],
+}
+
+def _points_in_polygon(lats, lons, vertices):
+    """Crossing-number test of arrays of points against one polygon's (lat, lon) vertices"""
+    inside = np.zeros(len(lats), dtype=bool)
+    count = len(vertices)
+    for i in range(count):
+        lat_i, lon_i = vertices[i]
+        lat_j, lon_j = vertices[i - 1]
+        if lat_i == lat_j:
+            continue
+        crosses = (lat_i > lats) != (lat_j > lats)
+        edge_lon = lon_i + (lats - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+        inside ^= crosses & (lons < edge_lon)
+    return inside
+
+def _point_in_polygon(lat, lon, vertices):
+    """Crossing-number test of a single point, matching _points_in_polygon"""
+    inside = False
+    lat_j, lon_j = vertices[-1]
+    for lat_i, lon_i in vertices:
+        if (lat_i > lat) != (lat_j > lat) and lon < lon_i + (lat - lat_i) * (lon_j - lon_i) / (lat_j - lat_i):
+            inside = not inside
+        lat_j, lon_j = lat_i, lon_i
+    return inside
+
+def _segment_crosses_cells(start, end, cell_lat, cell_lon, size):
+    """Which cells (given by their south-west corners) a segment passes through the interior of
+
+    Liang-Barsky clipping against the open cell: touching a cell's border or
+    corner does not count.
+    """
+    (lat0, lon0), (lat1, lon1) = start, end
+    t_enter = np.zeros(len(cell_lat))
+    t_exit = np.ones(len(cell_lat))
+    crosses = np.ones(len(cell_lat), dtype=bool)
+
+    for delta, low, high, origin in ((lon1 - lon0, cell_lon, cell_lon + size, lon0),
+                                     (lat1 - lat0, cell_lat, cell_lat + size, lat0)):
+        if delta == 0:
+            crosses &= (origin > low) & (origin < high)
+            continue
+        t_low = (low - origin) / delta
+        t_high = (high - origin) / delta
+        t_enter = np.maximum(t_enter, np.minimum(t_low, t_high))
+        t_exit = np.minimum(t_exit, np.maximum(t_low, t_high))
+
+    return crosses & (t_enter < t_exit)
+
+class PolygonGridIndex:
+    """Grid index classifying coordinates into one of a set of labelled polygons"""
+
+    def __init__(self, polygons, bounds=GHANA_BOUNDS, cells_per_degree=CELLS_PER_DEGREE, extend_edges=False):
+        self.labels = tuple(polygons)
+        self.polygons = [list(polygons[label]) for label in self.labels]
+        self.min_lat, self.min_lon, self.max_lat, self.max_lon = bounds
+        self.cells_per_degree = cells_per_degree
+        self.extend_edges = extend_edges
+
+        self.rows = int((self.max_lat - self.min_lat) * cells_per_degree)
+        self.cols = int((self.max_lon - self.min_lon) * cells_per_degree)
+        size = 1.0 / cells_per_degree
+
+        row, col = np.divmod(np.arange(self.rows * self.cols), self.cols)
+        cell_lat = self.min_lat + row * size
+        cell_lon = self.min_lon + col * size
+
+        # Polygons whose boundary passes through each cell
+        crossing = np.zeros((self.rows * self.cols, len(self.polygons)), dtype=bool)
+        for index, vertices in enumerate(self.polygons):
+            for i in range(len(vertices)):
+                crossing[:, index] |= _segment_crosses_cells(vertices[i - 1], vertices[i], cell_lat, cell_lon, size)
+
+        # Label of the polygon containing the whole cell apart from those crossing it, -1 for none
+        center_lat = cell_lat + size / 2
+        center_lon = cell_lon + size / 2
+        self.cell_labels = np.full(self.rows * self.cols, -1, dtype=np.intp)
+        for index, vertices in enumerate(self.polygons):
+            inside = _points_in_polygon(center_lat, center_lon, vertices) & ~crossing[:, index]
+            self.cell_labels[inside] = index
+
+        self.cell_crossing = crossing
+        self.boundary_cells = crossing.any(axis=1)
+
+        # Plain Python copies for classifying single points; candidates are checked last
+        # polygon first so a point on a shared vertex gets the same label as classify_many
+        self._cell_label_list = self.cell_labels.tolist()
+        self._cell_candidates = {
+            int(cell): np.flatnonzero(crossing[cell])[::-1].tolist() for cell in np.flatnonzero(self.boundary_cells)
+        }
+
+    def _classify_point(self, lat, lon):
+        """classify_many for a single point, without NumPy's per-call overhead"""
+        if self.extend_edges:
+            half = 0.5 / self.cells_per_degree
+            lat = min(max(lat, self.min_lat + half), self.max_lat - half)
+            lon = min(max(lon, self.min_lon + half), self.max_lon - half)
+
+        row = (lat - self.min_lat) * self.cells_per_degree
+        col = (lon - self.min_lon) * self.cells_per_degree
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return -1
+
+        cell = int(row) * self.cols + int(col)
+        for index in self._cell_candidates.get(cell, ()):
+            if _point_in_polygon(lat, lon, self.polygons[index]):
+                return index
+        return self._cell_label_list[cell]
+
+    def classify_many(self, latitudes, longitudes):
+        """Polygon index (see labels) of every point, -1 for points outside every polygon"""
+        lats = np.asarray(latitudes, dtype=np.float64).reshape(-1)
+        lons = np.asarray(longitudes, dtype=np.float64).reshape(-1)
+
+        if len(lats) == 1:
+            return np.array([self._classify_point(float(lats[0]), float(lons[0]))], dtype=np.intp)
+
+        if self.extend_edges:
+            # Clamp onto the centre lines of the outermost cells so points beyond the grid
+            # take the label of the nearest edge
+            half = 0.5 / self.cells_per_degree
+            lats = np.minimum(np.maximum(lats, self.min_lat + half), self.max_lat - half)
+            lons = np.minimum(np.maximum(lons, self.min_lon + half), self.max_lon - half)
+
+        row = (lats - self.min_lat) * self.cells_per_degree
+        col = (lons - self.min_lon) * self.cells_per_degree
+        found = (row >= 0) & (row < self.rows) & (col >= 0) & (col < self.cols)
+        all_found = found.all()
+        if not all_found:
+            row = np.where(found, row, 0)
+            col = np.where(found, col, 0)
+
+        # Truncation is floor for the non-negative offsets left
+        cells = row.astype(np.intp) * self.cols + col.astype(np.intp)
+        result = self.cell_labels[cells]
+        on_boundary = self.boundary_cells[cells]
+        if not all_found:
+            result[~found] = -1
+            on_boundary &= found
+
+        if on_boundary.any():
+            rows = np.flatnonzero(on_boundary)
+            candidates = self.cell_crossing[cells[rows]]
+            for index in np.flatnonzero(candidates.any(axis=0)):
+                check = rows[candidates[:, index]]
+                inside = _points_in_polygon(lats[check], lons[check], self.polygons[index])
+                result[check[inside]] = index
+
+        return result
+
+    def classify(self, latitude, longitude, default=None):
+        """Label of the polygon containing one point, or default if none does"""
+        index = self._classify_point(float(latitude), float(longitude))
+        return self.labels[index] if index >= 0 else default
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between two points given in degrees"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+class NearestCityIndex:
+    """KD-tree over a {city key: (latitude, longitude)} table for snapping points to the nearest city
+
+    Points are projected onto a local equirectangular plane in km, which is
+    accurate to well under 1% across Ghana. The few closest cities in that
+    plane are then compared by great-circle distance.
+    """
+
+    # Candidates compared by great-circle distance per query
+    CANDIDATES = 4
+
+    def __init__(self, coordinates):
+        # One entry per distinct location; the city listed first wins duplicates
+        locations = {}
+        for key, (lat, lon) in coordinates.items():
+            locations.setdefault((lat, lon), key)
+
+        self.keys = list(locations.values())
+        points = np.array(list(locations), dtype=np.float64)
+        self._lon_scale = math.cos(math.radians(points[:, 0].mean()))
+        self._tree = cKDTree(self._project(points[:, 0], points[:, 1]))
+        self._points = points
+
+    def _project(self, lats, lons):
+        km_per_degree = math.radians(EARTH_RADIUS_KM)
+        return np.column_stack([np.asarray(lats) * km_per_degree, np.asarray(lons) * km_per_degree * self._lon_scale])
+
+    def nearest(self, latitude, longitude):
+        """(city key, great-circle distance in km) of the city nearest to a point"""
+        _, candidates = self._tree.query(self._project([latitude], [longitude])[0], k=min(self.CANDIDATES, len(self.keys)))
+        distance, index = min(
+            (haversine_km(latitude, longitude, *self._points[index]), index) for index in np.atleast_1d(candidates)
+        )
+        return self.keys[index], distance
+
+region_index = PolygonGridIndex(REGION_POLYGONS)
+climate_zone_index = PolygonGridIndex(CLIMATE_ZONE_POLYGONS, extend_edges=True)
+
+# Climate zone labels, in the order of climate_zone_index's polygon indices
+CLIMATE_ZONES = climate_zone_index.labels
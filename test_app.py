@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Tests for the prediction endpoints using Flask's test client
+"""
+import io
+import os
+
+import numpy as np
+
+from app import app
+
+
+def post_predict(client, location, prediction_date):
+    """POST a single-location prediction request"""
+    return client.post('/predict', data={'location': location, 'predictionDate': prediction_date})
+
+
+def test_batch_matches_single_predictions():
+    """Batched predictions should match one-at-a-time /predict results"""
+    client = app.test_client()
+    pairs = [('accra', '2024-08-15'), ('kumasi', '2024-01-05'), ('tamale', '2024-12-31')]
+
+    response = client.post('/predict/batch', json={
+        'requests': [{'location': loc, 'predictionDate': date} for loc, date in pairs]
+    })
+    assert response.status_code == 200
+    results = response.get_json()['results']
+
+    for (location, prediction_date), result in zip(pairs, results):
+        single = post_predict(client, location, prediction_date).get_json()
+        assert result['weather_predictions'] == single['weather_predictions']
+        assert result['coordinates'] == single['coordinates']
+
+
+def test_batch_reports_invalid_items():
+    """Invalid batch entries get a per-item error instead of failing the batch"""
+    client = app.test_client()
+    response = client.post('/predict/batch', json={'requests': [
+        {'location': 'accra', 'predictionDate': '2024-08-15'},
+        {'location': 'not-a-real-place', 'predictionDate': '2024-08-15'},
+        {'location': 'accra', 'predictionDate': '15/08/2024'},
+        {'location': 123, 'predictionDate': '2024-08-15'},
+        {'location': None, 'predictionDate': '2024-08-15'},
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert 'weather_predictions' in results[0]
+    assert all('error' in result and 'weather_predictions' not in result for result in results[1:])
+    assert results[3]['error'] == 'location must be a string'
+
+
+def test_unknown_location_returns_suggestions():
+    """An unknown location gets a short list of similar names, not the whole city database"""
+    client = app.test_client()
+    response = post_predict(client, 'Kumasee', '2024-08-15')
+    assert response.status_code == 400
+    body = response.get_json()
+    assert 0 < len(body['suggestions']) <= 5
+    assert 'Kumasi' in body['suggestions']
+    assert 'Available cities' not in body['error']
+
+
+def test_coordinates_snap_to_nearest_city():
+    """Coordinates near a city reuse its forecast; far-off or foreign ones do not"""
+    client = app.test_client()
+    by_name = post_predict(client, 'accra', '2024-08-15').get_json()
+    latitude, longitude = by_name['coordinates']['latitude'], by_name['coordinates']['longitude']
+
+    snapped = client.post('/predict', data={
+        'latitude': latitude + 0.01, 'longitude': longitude - 0.01, 'predictionDate': '2024-08-15',
+    }).get_json()
+    assert snapped['coordinates'] == by_name['coordinates']
+    assert snapped['weather_predictions'] == by_name['weather_predictions']
+
+    outside = client.post('/predict', data={'latitude': 51.5, 'longitude': -0.1, 'predictionDate': '2024-08-15'})
+    assert outside.status_code == 400
+
+
+def test_geolocated_form_posts_coordinates_with_the_place_name():
+    """The page's geolocated request succeeds even when the reverse-geocoded name is not a known city"""
+    client = app.test_client()
+    form = {'location': 'Nearby Location', 'predictionDate': '2024-08-15'}
+    assert client.post('/predict', data=form).status_code == 400
+
+    # What the submit handler builds from the input's data-latitude/data-longitude
+    response = client.post('/predict', data=dict(form, latitude='5.603716', longitude='-0.186964'))
+    assert response.status_code == 200
+    assert response.get_json()['weather_predictions']
+
+
+def test_raster_matches_point_forecasts():
+    """A raster cell centred on a city holds that city's point forecast"""
+    client = app.test_client()
+    point = client.post('/predict', data={'location': 'accra', 'start': '2024-08-15', 'end': '2024-08-15'}).get_json()
+    latitude, longitude = point['coordinates']['latitude'], point['coordinates']['longitude']
+
+    bbox = f'{latitude - 0.15},{longitude - 0.15},{latitude + 0.15},{longitude + 0.15}'
+    response = client.get(f'/api/raster?date=2024-08-15&bbox={bbox}&resolution=0.1&dtype=float32')
+    assert response.status_code == 200
+    raster = np.load(io.BytesIO(response.data))
+    targets = response.headers['X-Raster-Targets'].split(',')
+    assert raster.shape == (len(targets), 3, 3)
+
+    for layer, target in zip(raster, targets):
+        assert abs(layer[1, 1] - point['weather_predictions'][target][0]) <= 0.051
+
+    # A single-layer raster only runs that layer's model
+    import app as weather_app
+    others = [target for target in weather_app.model if target != 'Tmax']
+    before = [weather_app.model_inference_seconds.count(model=target) for target in others]
+    single = client.get(f'/api/raster?date=2024-08-15&bbox={bbox}&resolution=0.1&dtype=float32&targets=Tmax')
+    assert np.load(io.BytesIO(single.data)).shape == (1, 3, 3)
+    assert [weather_app.model_inference_seconds.count(model=target) for target in others] == before
+
+    too_large = client.get('/api/raster?date=2024-08-15&resolution=0.001')
+    assert too_large.status_code == 400
+
+
+def test_city_search_pages_ranked_results():
+    """Autocomplete pages through one consistently ranked list"""
+    client = app.test_client()
+    full = client.get('/api/cities?q=west&limit=100').get_json()
+    first = client.get('/api/cities?q=west&limit=5').get_json()
+    second = client.get('/api/cities?q=west&limit=5&offset=5').get_json()
+
+    assert full['total'] == len(full['cities']) > 10
+    assert first['cities'] + second['cities'] == full['cities'][:10]
+    # Names starting with the query come first
+    assert full['cities'][0]['name'].startswith('West')
+
+
+def test_batch_requires_requests_list():
+    """An empty or missing requests list, or a body that is not an object, is rejected"""
+    client = app.test_client()
+    assert client.post('/predict/batch', json={}).status_code == 400
+    assert client.post('/predict/batch', json={'requests': []}).status_code == 400
+    assert client.post('/predict/batch', json=[{'location': 'Accra'}]).status_code == 400
+    assert client.post('/predict/batch', json='Accra').status_code == 400
+
+
+def test_range_matches_single_predictions():
+    """A date-range request returns one column per weather type matching /predict"""
+    client = app.test_client()
+    response = client.post('/predict', data={
+        'location': 'kumasi', 'start': '2024-03-30', 'end': '2024-04-03', 'step': '2'
+    })
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['dates'] == ['2024-03-30', '2024-04-01', '2024-04-03']
+
+    for index, prediction_date in enumerate(data['dates']):
+        single = post_predict(client, 'kumasi', prediction_date).get_json()['weather_predictions']
+        assert single['Tmax'] == f"{data['weather_predictions']['Tmax'][index]:.1f}°C"
+        assert single['Rainfall'] == f"{data['weather_predictions']['Rainfall'][index]:.2f} mm"
+
+
+def test_range_rejects_reversed_dates():
+    """End dates before the start date are rejected"""
+    client = app.test_client()
+    response = client.post('/predict', data={'location': 'accra', 'start': '2024-08-14', 'end': '2024-08-01'})
+    assert response.status_code == 400
+
+
+def test_forecast_cube_matches_models(tmp_path):
+    """Cube lookups return the same values as running the models"""
+    import numpy as np
+    import app as weather_app
+    from forecast_cube import ForecastCube, build_cube, save_cube
+
+    coordinates = [weather_app.CITY_COORDINATES['accra'], weather_app.CITY_COORDINATES['tamale']]
+    targets = list(weather_app.model.keys())
+    predict_fn = lambda lats, lons, dates: weather_app.predict_feature_matrix(
+        weather_app.build_feature_matrix(lats, lons, dates)
+    )
+
+    cube_file = str(tmp_path / 'cube.npy')
+    save_cube(cube_file, build_cube(coordinates, targets, predict_fn), coordinates, targets, 'test-version')
+    cube = ForecastCube.load(cube_file, 'test-version')
+    assert ForecastCube.load(cube_file, 'other-version') is None
+
+    dates = np.array(['2023-03-01', '2024-02-29', '2024-12-31'], dtype='datetime64[D]')
+    lats = np.array([coordinates[0][0], coordinates[1][0], coordinates[0][0]])
+    lons = np.array([coordinates[0][1], coordinates[1][1], coordinates[0][1]])
+
+    expected = predict_fn(lats, lons, dates)
+    actual = cube.lookup(lats, lons, dates)
+    for target in targets:
+        np.testing.assert_allclose(actual[target], expected[target])
+
+    assert cube.lookup([0.0], [0.0], dates[:1]) is None
+
+
+def test_tiles_are_cached_and_revalidated(tmp_path, monkeypatch):
+    """A rendered tile caches every layer and answers If-None-Match with 304"""
+    import app as weather_app
+    from tiles import TileCache
+
+    monkeypatch.setattr(weather_app, 'tile_cache', TileCache(str(tmp_path), 10 ** 8))
+    client = app.test_client()
+
+    # Zoom 7 tile over Kumasi
+    response = client.get('/tiles/Tmax/2024-08-15/7/63/61.png')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png' and response.data.startswith(b'\x89PNG')
+    assert len(list(tmp_path.rglob('*.png'))) == len(weather_app.model)
+
+    etag = response.headers['ETag']
+    repeat = client.get('/tiles/Tmax/2024-08-15/7/63/61.png', headers={'If-None-Match': etag})
+    assert repeat.status_code == 304
+
+    assert client.get('/tiles/Tmax/2024-08-15/7/128/61.png').status_code == 404
+    assert client.get('/tiles/Pressure/2024-08-15/7/63/61.png').status_code == 404
+
+
+def test_forecast_job_matches_range_predictions(tmp_path, monkeypatch):
+    """A chunked background job produces the same values as /predict date ranges"""
+    import json
+    import time
+    import app as weather_app
+    from jobs import JobQueue
+
+    job_queue = JobQueue(str(tmp_path), weather_app.forecast_job_chunk, workers=2, chunk_rows=7)
+    monkeypatch.setattr(weather_app, 'job_queue', job_queue)
+    client = app.test_client()
+
+    try:
+        response = client.post('/jobs', json={'locations': ['Accra', 'Tamale'], 'start': '2024-03-01', 'end': '2024-03-10'})
+        assert response.status_code == 202
+        job_id = response.get_json()['job_id']
+
+        deadline = time.time() + 60
+        while client.get(f'/jobs/{job_id}').get_json()['status'] not in ('done', 'failed') and time.time() < deadline:
+            time.sleep(0.05)
+        status = client.get(f'/jobs/{job_id}').get_json()
+        assert status['status'] == 'done' and status['done_rows'] == 20
+
+        rows = [json.loads(line) for line in client.get(status['result_url']).data.decode().splitlines()]
+    finally:
+        job_queue.shutdown()
+
+    assert [row['location'] for row in rows] == ['Accra'] * 10 + ['Tamale'] * 10
+    expected = client.post('/predict', data={'location': 'tamale', 'start': '2024-03-01', 'end': '2024-03-10'}).get_json()
+    for target, values in expected['weather_predictions'].items():
+        assert [row[target] for row in rows[10:]] == values
+
+    assert client.get('/jobs/not-a-job').status_code == 404
+    assert client.post('/jobs', json=['Accra']).status_code == 400
+
+
+def test_csv_export_matches_range_predictions():
+    """The streamed CSV export holds the same values as a /predict date range"""
+    import csv
+
+    client = app.test_client()
+    response = client.get('/export?format=csv&start=2024-06-01&end=2024-06-05&locations=Accra,Kumasi')
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['location'] for row in rows] == ['Accra'] * 5 + ['Kumasi'] * 5
+
+    expected = client.post('/predict', data={'location': 'kumasi', 'start': '2024-06-01', 'end': '2024-06-05'}).get_json()
+    for target, values in expected['weather_predictions'].items():
+        assert [float(row[target]) for row in rows[5:]] == values
+
+    assert client.get('/export?format=xml&start=2024-06-01&end=2024-06-05').status_code == 400
+    assert client.get('/export?start=2024-06-01&end=2024-06-05&locations=Kumasee Zongo Nowhere').status_code == 400
+
+
+def test_signup_login_and_profile(tmp_path, monkeypatch):
+    """Auth routes work end to end through the user database layer"""
+    import app as weather_app
+    from user_db import UserDatabase
+
+    user_db = UserDatabase(str(tmp_path / 'users.db'))
+    user_db.create_schema()
+    monkeypatch.setattr(weather_app, 'user_db', user_db)
+    client = app.test_client()
+
+    account = {'name': 'Ama', 'email': 'ama@example.com', 'password': 'secret123', 'confirmPassword': 'secret123'}
+    assert client.post('/signup', json=account).get_json()['success']
+    assert client.post('/signup', json=account).status_code == 400
+
+    client.post('/logout')
+    assert client.get('/user/profile').status_code == 401
+    assert client.post('/login', json={'email': 'ama@example.com', 'password': 'wrong1234'}).status_code == 401
+    assert client.post('/login', json={'email': 'AMA@example.com', 'password': 'secret123'}).get_json()['success']
+
+    profile = client.get('/user/profile').get_json()['user']
+    assert profile['name'] == 'Ama' and profile['last_login'] is not None
+
+    # Signed-in forecasts are recorded once the write-behind buffer flushes
+    for day in range(1, 4):
+        post_predict(client, 'Accra', f'2024-08-0{day}')
+    weather_app.forecast_history_buffer.flush()
+
+    first = client.get('/user/history?limit=2').get_json()
+    second = client.get(f"/user/history?limit=2&cursor={first['next_cursor']}").get_json()
+    dates = [entry['forecast_date'] for entry in first['history'] + second['history']]
+    assert dates == ['2024-08-03', '2024-08-02', '2024-08-01']
+    assert second['next_cursor'] is None
+    assert first['history'][0]['predictions'].keys() == weather_app.model.keys()
+    assert client.get('/user/history?cursor=garbage').status_code == 400
+
+
+def test_login_upgrades_legacy_hashes_and_google_users_get_none(tmp_path, monkeypatch):
+    """A legacy hash is rewritten in the current format on login; Google sign-ups store no hash"""
+    import base64
+    import hashlib
+    import json
+    import app as weather_app
+    from password_hashing import UNUSABLE_PASSWORD
+    from user_db import UserDatabase
+
+    user_db = UserDatabase(str(tmp_path / 'users.db'))
+    user_db.create_schema()
+    monkeypatch.setattr(weather_app, 'user_db', user_db)
+    client = app.test_client()
+
+    salt = 'cd' * 16
+    legacy = salt + hashlib.pbkdf2_hmac('sha256', b'secret123', salt.encode('utf-8'), 100000).hex()
+    user_db.create_user('Kofi', 'kofi@example.com', legacy)
+
+    assert client.post('/login', json={'email': 'kofi@example.com', 'password': 'secret123'}).get_json()['success']
+    upgraded = user_db.find_user('kofi@example.com')[3]
+    assert upgraded.startswith('pbkdf2_sha256$')
+    client.post('/logout')
+    assert client.post('/login', json={'email': 'kofi@example.com', 'password': 'secret123'}).get_json()['success']
+
+    payload = base64.urlsafe_b64encode(json.dumps({'sub': '1', 'email': 'esi@example.com', 'name': 'Esi'}).encode()).decode()
+    assert client.post('/google-auth', json={'credential': f'e30.{payload}.sig'}).get_json()['success']
+    assert user_db.find_user('esi@example.com')[3] == UNUSABLE_PASSWORD
+    assert client.post('/login', json={'email': 'esi@example.com', 'password': UNUSABLE_PASSWORD}).status_code == 401
+
+
+def test_metrics_report_prediction_stages():
+    """A /predict request shows up in the stage histograms and cache counters"""
+    client = app.test_client()
+    post_predict(client, 'Tamale', '2023-03-09')
+    post_predict(client, 'Tamale', '2023-03-09')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    for stage in ('location', 'features', 'inference', 'serialization'):
+        assert f'weather_predict_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'weather_prediction_cache_lookups_total{result="hit"}' in text
+    assert 'weather_model_inference_seconds_count{model=' in text
+
+
+def test_profiles_are_listed_and_downloaded_with_the_admin_token(tmp_path, monkeypatch):
+    """Profile endpoints hide behind the admin token, and a request sent with the profile header is listed and downloadable"""
+    import app as weather_app
+    from profiling import ProfileStore
+
+    monkeypatch.setattr(weather_app.request_profiler, 'store', ProfileStore(str(tmp_path)))
+    monkeypatch.setattr(weather_app.request_profiler, 'token', 'admin-token')
+    client = app.test_client()
+    auth = {'Authorization': 'Bearer admin-token'}
+
+    assert client.get('/admin/profiles').status_code == 404
+    post_predict(client, 'Accra', '2024-08-15')
+    assert client.get('/admin/profiles', headers=auth).get_json()['profiles'] == []
+
+    client.post('/predict', data={'location': 'Ho', 'predictionDate': '2024-02-01'}, headers={'X-Profile': 'admin-token'})
+    [profile] = client.get('/admin/profiles', headers=auth).get_json()['profiles']
+    assert profile['endpoint'] == 'predict_weather'
+
+    assert client.get(f"/admin/profiles/{profile['id']}").status_code == 404
+    response = client.get(f"/admin/profiles/{profile['id']}", headers=auth)
+    assert response.status_code == 200 and response.data
+
+
+def test_stale_model_artifacts_are_not_loaded(tmp_path, monkeypatch):
+    """Artifacts converted from another version of the joblib file are skipped and not published"""
+    import joblib
+    from sklearn.ensemble import GradientBoostingRegressor
+    import app as weather_app
+    from model_artifact import compute_model_version, read_model_artifact, write_model_artifact
+    from model_store import publish_model_store
+    from tree_compiler import compile_gradient_boosting
+
+    X = np.random.default_rng(0).normal(size=(200, 12))
+    estimator = GradientBoostingRegressor(n_estimators=5, random_state=0).fit(X, X[:, 0])
+    model_file = str(tmp_path / 'models.joblib')
+    joblib.dump({'Tmax': estimator}, model_file)
+    current_version = compute_model_version(model_file)
+
+    compiled = {'Tmax': compile_gradient_boosting(estimator)}
+    stale = str(tmp_path / 'stale.skymodel')
+    fresh = str(tmp_path / 'fresh.skymodel')
+    write_model_artifact(stale, compiled, 'replaced-model')
+    write_model_artifact(fresh, compiled, current_version)
+
+    monkeypatch.setattr(weather_app, 'MODEL_STORE_PATH', stale)
+    monkeypatch.setattr(weather_app, 'MODEL_ARTIFACT_FILE', str(tmp_path / 'missing.skymodel'))
+    assert weather_app.load_native_models(model_file) is None
+    monkeypatch.setattr(weather_app, 'MODEL_ARTIFACT_FILE', fresh)
+    assert weather_app.load_native_models(model_file).model_version == current_version
+
+    store = publish_model_store(stale, model_file, str(tmp_path / 'store.skymodel'))
+    assert read_model_artifact(store).model_version == current_version
+
+
+def test_process_inference_workers_load_their_own_models():
+    """Process workers started from a forkserver predict the same values as the serial path"""
+    import app as weather_app
+    from parallel_inference import InferenceExecutor
+
+    features = weather_app.build_feature_matrix(
+        np.linspace(5.0, 11.0, 300), np.linspace(-3.0, 1.0, 300), np.full(300, np.datetime64('2024-08-15'))
+    )
+    executor = InferenceExecutor(
+        'process', workers=2, min_parallel_rows=100, min_chunk_rows=50, initializer=weather_app.init_inference_worker
+    )
+    try:
+        parallel = weather_app.predict_feature_matrix(features, executor)
+    finally:
+        executor.shutdown()
+
+    serial = weather_app.predict_feature_matrix(features, weather_app.serial_inference_executor)
+    assert set(parallel) == set(serial)
+    for weather_type, values in serial.items():
+        np.testing.assert_array_equal(parallel[weather_type], values)
+
+
+def test_import_sets_up_the_scratch_user_database():
+    """Schema and history indexes are created in the test database, never in the tracked weather_users.db"""
+    import app as weather_app
+
+    tracked_db = os.path.join(os.path.dirname(os.path.abspath(weather_app.__file__)), 'weather_users.db')
+    assert os.path.abspath(weather_app.USER_DB_PATH) != tracked_db
+
+    with weather_app.user_db.connection() as conn:
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_forecast_history_user_created', 'idx_forecast_history_created'} <= indexes
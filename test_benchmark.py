@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for the benchmark suite; with pytest-benchmark installed the cases themselves run too
+"""
+import importlib.util
+
+import pytest
+
+import app as weather_app
+from benchmark import collect_benchmarks, compare, measure
+
+CASES = collect_benchmarks(weather_app)
+
+
+def test_cases_cover_every_target_and_endpoint():
+    """Every model target has single and batch cases, and the HTTP cases work against the loaded app"""
+    for weather_type in weather_app.model:
+        assert f'predict/{weather_type}/single' in CASES
+        assert f'predict/{weather_type}/batch' in CASES
+        assert f'predict/{weather_type}/large' in CASES
+    assert {'fallback/batch', 'lookup/cities', 'http/api_cities', 'http/predict/uncached'} <= set(CASES)
+
+    # Every case runs against the loaded app
+    assert CASES['http/predict/uncached']().status_code == 200
+
+
+def test_measure_reports_per_call_stats():
+    """Timings are per call after one warm-up call, across the requested rounds"""
+    calls = []
+    stats = measure(lambda: calls.append(1), rounds=3, min_time=0.001)
+    assert stats['rounds'] == 3 and stats['iterations'] >= 1
+    assert len(calls) == 1 + 3 * stats['iterations']
+    assert stats['min'] <= stats['median'] <= stats['max']
+
+
+def test_compare_flags_regressions_against_either_format():
+    """Baselines saved by pytest-benchmark are matched on the parametrized case name"""
+    results = {'benchmarks': [
+        {'name': 'lookup/cities', 'stats': {'median': 1.5}},
+        {'name': 'http/api_cities', 'stats': {'median': 1.1}},
+        {'name': 'fallback/batch', 'stats': {'median': 1.0}},
+    ]}
+    baseline = {'benchmarks': [
+        {'name': 'lookup/cities', 'stats': {'median': 1.0}},
+        {'name': 'test_benchmark[http/api_cities]', 'param': 'http/api_cities', 'stats': {'median': 1.0}},
+    ]}
+    rows = {name: regressed for name, _, _, _, regressed in compare(results, baseline, tolerance=0.25)}
+    assert rows == {'lookup/cities': True, 'http/api_cities': False}
+
+
+@pytest.mark.skipif(importlib.util.find_spec('pytest_benchmark') is None, reason='pytest-benchmark is not installed')
+@pytest.mark.parametrize('name', list(CASES))
+def test_benchmark(benchmark, name):
+    """Each collected case under pytest-benchmark (optional, skipped when it is not installed)"""
+    benchmark(CASES[name])
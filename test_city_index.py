@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the city lookup index
+"""
+from city_index import CityAutocomplete, CityIndex
+
+COORDINATES = {
+    'accra': (5.6037, -0.1870),
+    'sunyani municipal': (7.3386, -2.3265),
+    'sunyani west': (7.2000, -2.5000),
+    'sekondi-takoradi': (4.9344, -1.7133),
+    'kumasi': (6.6885, -1.6244),
+    'ho': (6.6111, 0.4708),
+}
+
+
+def test_exact_alias_and_prefix_matches():
+    """Normalized names, aliases and prefixes resolve without a scan"""
+    index = CityIndex(COORDINATES, {'takoradi': 'sekondi-takoradi'})
+
+    assert index.lookup('  ACCRA ').match_type == 'exact'
+    assert index.lookup('Sekondi Takoradi').key == 'sekondi-takoradi'
+    assert index.lookup('sekonditakoradi').match_type == 'alias'
+    assert index.lookup('Takoradi').key == 'sekondi-takoradi'
+    # Several prefix matches resolve to the one listed first
+    assert index.lookup('sunyani').key == 'sunyani municipal'
+
+
+def test_partial_and_fuzzy_matches():
+    """Substrings, names inside a longer query and close typos resolve"""
+    index = CityIndex(COORDINATES)
+
+    assert index.lookup('west').key == 'sunyani west'
+    assert index.lookup('Accra Central Market').key == 'accra'
+    assert index.lookup('kumashi').match_type == 'fuzzy'
+    # Short names only match whole words of a longer query
+    assert index.lookup('shoe') is None
+    assert index.lookup('xyzzy') is None
+
+
+def test_suggestions_are_limited():
+    """Suggestions return only the closest few names"""
+    index = CityIndex(COORDINATES)
+
+    assert index.suggest('sunyan west', limit=1) == ['sunyani west']
+    assert len(index.suggest('sunyani', limit=5)) <= 5
+    assert index.suggest('xyzzy') == []
+
+
+def test_autocomplete_ranking_and_paging():
+    """Name prefixes rank before word prefixes before other matches, shortest first"""
+    autocomplete = CityAutocomplete(COORDINATES)
+
+    total, page = autocomplete.search('su', limit=2)
+    assert total == 2
+    assert page == ['sunyani west', 'sunyani municipal']
+    assert autocomplete.search('west') == (1, ['sunyani west'])
+    assert autocomplete.search('ra')[1] == ['accra', 'sekondi-takoradi']
+    assert autocomplete.search('su', limit=5, offset=1) == (2, ['sunyani municipal'])
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming export helpers
+"""
+import csv
+import io
+import json
+
+import numpy as np
+
+from export import encode_export, export_chunks
+
+
+def fake_predict(latitudes, longitudes, dates):
+    """Display values derived from the inputs, with one failed model"""
+    return {'Tmax': (latitudes + longitudes).tolist(), 'Rainfall': [None] * len(latitudes)}
+
+
+LOCATIONS = [('Accra', 5.6, -0.2), ('Kumasi', 6.7, -1.6), ('Tamale', 9.4, -0.8)]
+DATES = np.arange(np.datetime64('2024-01-30'), np.datetime64('2024-02-03'))
+
+
+def test_chunks_cover_every_pair_in_order():
+    """Chunks are bounded in size and walk locations, then dates"""
+    chunks = list(export_chunks(LOCATIONS, DATES, fake_predict, chunk_rows=5))
+    assert [len(chunk.names) for chunk in chunks] == [5, 5, 2]
+
+    pairs = [(name, date) for chunk in chunks for name, date in zip(chunk.names, chunk.dates)]
+    assert pairs == [(name, str(date)) for name, _, _ in LOCATIONS for date in DATES]
+
+
+def test_ndjson_and_csv_hold_the_same_rows():
+    """Both text formats carry every row, with failed models as null or empty"""
+    ndjson = b''.join(encode_export(export_chunks(LOCATIONS, DATES, fake_predict, 5), 'ndjson')).decode()
+    text = b''.join(encode_export(export_chunks(LOCATIONS, DATES, fake_predict, 5), 'csv')).decode()
+
+    records = [json.loads(line) for line in ndjson.splitlines()]
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert len(records) == len(rows) == 12
+
+    for record, row in zip(records, rows):
+        assert record['location'] == row['location'] and record['date'] == row['date']
+        assert record['Tmax'] == float(row['Tmax'])
+        assert record['Rainfall'] is None and row['Rainfall'] == ''
+
+
+def test_encoding_is_lazy():
+    """Nothing is predicted before the stream is consumed, and one chunk at a time after"""
+    calls = []
+
+    def counting_predict(latitudes, longitudes, dates):
+        calls.append(len(latitudes))
+        return fake_predict(latitudes, longitudes, dates)
+
+    stream = encode_export(export_chunks(LOCATIONS, DATES, counting_predict, 4), 'csv')
+    assert calls == []
+    next(stream)
+    assert calls == [4]
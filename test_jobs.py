@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for the background job queue
+"""
+import multiprocessing
+import os
+import signal
+import time
+
+import numpy as np
+
+from jobs import JobQueue
+
+
+def format_chunk(values):
+    """Chunk function: one line per value"""
+    return ''.join(f'{value * 2}\n' for value in values)
+
+
+def fail_chunk(values):
+    """Chunk function that always fails"""
+    raise RuntimeError('boom')
+
+
+def wait_for(job_queue, job_id):
+    deadline = time.time() + 60
+    while job_queue.status(job_id)['status'] not in ('done', 'failed') and time.time() < deadline:
+        time.sleep(0.02)
+    return job_queue.status(job_id)
+
+
+def test_job_results_keep_row_order(tmp_path):
+    """Chunks finishing out of order are still written in row order"""
+    job_queue = JobQueue(str(tmp_path), format_chunk, workers=3, chunk_rows=4)
+    try:
+        job_id = job_queue.submit((np.arange(50),))
+        status = wait_for(job_queue, job_id)
+    finally:
+        job_queue.shutdown()
+
+    assert status['status'] == 'done' and status['done_rows'] == status['total_rows'] == 50
+    with open(job_queue.result_path(job_id)) as f:
+        assert f.read().split() == [str(value * 2) for value in range(50)]
+
+
+def test_failed_job_reports_error(tmp_path):
+    """An exception in a chunk marks the job failed and leaves no result file"""
+    job_queue = JobQueue(str(tmp_path), fail_chunk, workers=1)
+    try:
+        status = wait_for(job_queue, job_queue.submit((np.arange(3),)))
+    finally:
+        job_queue.shutdown()
+
+    assert status['status'] == 'failed' and 'boom' in status['error']
+    assert not (tmp_path / f"{status['id']}.ndjson").exists()
+
+
+def test_status_is_shared_through_the_database(tmp_path):
+    """A second queue over the same directory sees jobs submitted by the first"""
+    job_queue = JobQueue(str(tmp_path), format_chunk, workers=1)
+    try:
+        job_id = job_queue.submit((np.arange(5),))
+        wait_for(job_queue, job_id)
+    finally:
+        job_queue.shutdown()
+
+    other = JobQueue(str(tmp_path), format_chunk)
+    assert other.status(job_id)['status'] == 'done'
+    assert other.status('missing') is None
+
+
+def slow_format_chunk(values):
+    """Chunk function that takes a while, so a job is still running when its process exits"""
+    time.sleep(0.1)
+    return format_chunk(values)
+
+
+def submit_and_wait(directory, connection):
+    """Child process: queue a job and report its id once it is running"""
+    os.setpgrp()  # So the test can kill this process and its job workers together
+    job_queue = JobQueue(directory, slow_format_chunk, workers=1, chunk_rows=4)
+    job_id = job_queue.submit((np.arange(20),))
+    while job_queue.status(job_id)['status'] == 'queued':
+        time.sleep(0.01)
+    connection.send(job_id)
+    time.sleep(60)
+
+
+def test_jobs_survive_a_restart(tmp_path):
+    """A job whose process was killed mid-run is resumed and served by a fresh queue"""
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    child = context.Process(target=submit_and_wait, args=(str(tmp_path), sender))
+    child.start()
+    job_id = receiver.recv()
+    os.killpg(child.pid, signal.SIGKILL)
+    child.join(60)
+
+    job_queue = JobQueue(str(tmp_path), format_chunk, workers=1, chunk_rows=4)
+    assert job_queue.status(job_id)['status'] == 'running'
+    try:
+        assert job_queue.resume() == 1
+        status = wait_for(job_queue, job_id)
+    finally:
+        job_queue.shutdown()
+
+    assert status['status'] == 'done' and status['done_rows'] == 20
+    with open(job_queue.result_path(job_id)) as f:
+        assert f.read().split() == [str(value * 2) for value in range(20)]
+    assert set(os.listdir(tmp_path)) == {'jobs.db', f'{job_id}.ndjson'}  # Inputs are removed once done
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus metrics registry
+"""
+import pytest
+
+from metrics import MetricsRegistry
+
+
+def test_counter_renders_one_sample_per_label_set():
+    """Each label set gets its own sample line, with quotes in label values escaped"""
+    registry = MetricsRegistry()
+    errors = registry.counter('errors_total', 'Failed predictions', ['weather_type'])
+    errors.inc(weather_type='Tmax')
+    errors.inc(2, weather_type='Rain "heavy"')
+
+    assert errors.value(weather_type='Tmax') == 1
+    assert registry.render().splitlines() == [
+        '# HELP errors_total Failed predictions',
+        '# TYPE errors_total counter',
+        'errors_total{weather_type="Rain \\"heavy\\""} 2',
+        'errors_total{weather_type="Tmax"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    """Bucket counts include every smaller bucket and +Inf equals the total count"""
+    registry = MetricsRegistry()
+    latency = registry.histogram('stage_seconds', 'Stage latency', ['stage'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, stage='inference')
+    with latency.time(stage='location'):
+        pass
+
+    lines = registry.render().splitlines()
+    assert 'stage_seconds_bucket{stage="inference",le="0.1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="inference",le="1.0"} 3' in lines
+    assert 'stage_seconds_bucket{stage="inference",le="+Inf"} 4' in lines
+    assert 'stage_seconds_sum{stage="inference"} 3.65' in lines
+    assert 'stage_seconds_count{stage="inference"} 4' in lines
+    assert latency.count(stage='location') == 1
+
+
+def test_labels_must_match():
+    """Recording with labels other than the declared ones is rejected"""
+    counter = MetricsRegistry().counter('hits_total', 'Cache hits', ['result'])
+    with pytest.raises(ValueError):
+        counter.inc(outcome='hit')
@@ -86,5 +86,84 @@ def test_model_loading():
         import traceback
         traceback.print_exc()
 
+def test_compiled_model_matches_sklearn():
+    """Compiled tree ensembles should reproduce GradientBoostingRegressor predictions"""
+    from sklearn.ensemble import GradientBoostingRegressor
+    from tree_compiler import compile_gradient_boosting, compile_models
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 12))
+    y = 3 * X[:, 0] + np.sin(X[:, 1]) + X[:, 2] * X[:, 3]
+
+    for max_depth in (3, 5):
+        sklearn_model = GradientBoostingRegressor(n_estimators=30, max_depth=max_depth, random_state=0).fit(X, y)
+        compiled = compile_gradient_boosting(sklearn_model)
+
+        X_test = rng.normal(size=(1200, 12))  # Spans several prediction chunks
+        np.testing.assert_allclose(compiled.predict(X_test), sklearn_model.predict(X_test), rtol=1e-9)
+        np.testing.assert_allclose(compiled.predict(X_test[0]), sklearn_model.predict(X_test[:1]), rtol=1e-9)
+
+    # Models that cannot be compiled are passed through untouched
+    passthrough = object()
+    models = compile_models({'Tmax': sklearn_model, 'Other': passthrough})
+    assert models['Other'] is passthrough
+    assert models['Tmax'] is not sklearn_model
+
+def test_model_artifact_roundtrip(tmp_path):
+    """Native model artifacts load back identical models and reject corrupted payloads"""
+    import pytest
+    from sklearn.ensemble import GradientBoostingRegressor
+    from tree_compiler import compile_gradient_boosting
+    from model_artifact import read_model_artifact, write_model_artifact
+
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(300, 12))
+    compiled = compile_gradient_boosting(
+        GradientBoostingRegressor(n_estimators=20, random_state=0).fit(X, X[:, 0] - X[:, 1])
+    )
+    deep = compile_gradient_boosting(
+        GradientBoostingRegressor(n_estimators=10, max_depth=5, random_state=0).fit(X, X[:, 2] * X[:, 3])
+    )
+
+    path = str(tmp_path / 'models.skymodel')
+    write_model_artifact(path, {'Tmax': compiled, 'Tmin': deep}, 'abc123')
+
+    artifact = read_model_artifact(path)
+    assert artifact.model_version == 'abc123'
+    np.testing.assert_array_equal(artifact.models['Tmax'].predict(X), compiled.predict(X))
+    np.testing.assert_array_equal(artifact.models['Tmin'].predict(X), deep.predict(X))
+
+    # Scoring tables are read-only views of the mapped file rather than rebuilt per process
+    for loaded in artifact.models.values():
+        tables = loaded.scoring_tables()
+        assert all(not tables[name].flags.writeable for name in tables if name != 'mask_is_index')
+
+    # Flip the last payload byte: the checksum must catch it
+    with open(path, 'r+b') as f:
+        f.seek(-1, 2)
+        last = f.read(1)
+        f.seek(-1, 2)
+        f.write(bytes([last[0] ^ 0xFF]))
+    with pytest.raises(ValueError):
+        read_model_artifact(path)
+
+def test_enhanced_model_predicts_batches():
+    """The fused fallback model predicts a whole matrix exactly as it predicts each row"""
+    from app import EnhancedWeatherModel, FusedWeatherModel, build_feature_matrix
+
+    rng = np.random.default_rng(2)
+    dates = np.datetime64('2024-01-01') + rng.integers(0, 366, 300)
+    features = build_feature_matrix(rng.uniform(4.7, 11.2, 300), rng.uniform(-3.3, 1.2, 300), dates)
+
+    fused = FusedWeatherModel()
+    batch = fused.predict(features)
+    assert batch.shape == (300,)
+    assert batch.dtype.names == FusedWeatherModel.TARGETS
+
+    for weather_type in FusedWeatherModel.TARGETS:
+        fallback = EnhancedWeatherModel(weather_type, fused)
+        np.testing.assert_array_equal(fallback.predict(features), batch[weather_type])
+        np.testing.assert_array_equal(batch[weather_type], [fused.predict(row)[weather_type][0] for row in features])
+
 if __name__ == "__main__":
     test_model_loading()
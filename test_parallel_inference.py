@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for the parallel inference executor
+"""
+import numpy as np
+import pytest
+
+from parallel_inference import InferenceExecutor
+
+
+def row_sums(features):
+    return features.sum(axis=1)
+
+
+def structured_rows(features):
+    result = np.empty(len(features), dtype=[('low', 'f8'), ('high', 'f8')])
+    result['low'], result['high'] = features.min(axis=1), features.max(axis=1)
+    return result
+
+
+def broken(features):
+    raise RuntimeError('model failed')
+
+
+TASKS = {'sums': row_sums, 'structured': structured_rows, 'broken': broken}
+
+
+def process_tasks():
+    return TASKS
+
+
+@pytest.mark.parametrize('kind', ['thread', 'process'])
+def test_parallel_matches_serial(kind):
+    """Chunked parallel runs reassemble every task's rows in order"""
+    features = np.random.default_rng(0).normal(size=(1000, 12))
+    expected = InferenceExecutor('serial').run(TASKS, features)
+
+    executor = InferenceExecutor(kind, workers=3, min_parallel_rows=100, min_chunk_rows=50, initializer=process_tasks)
+    try:
+        results = executor.run(TASKS, features)
+    finally:
+        executor.shutdown()
+
+    np.testing.assert_array_equal(results['sums'], expected['sums'])
+    np.testing.assert_array_equal(results['structured'], expected['structured'])
+    assert isinstance(results['broken'], RuntimeError)
+
+
+def test_small_batches_run_serially():
+    """Matrices below the threshold never start a pool"""
+    executor = InferenceExecutor('thread', workers=4, min_parallel_rows=100)
+    timings = {}
+    results = executor.run({'sums': row_sums, 'broken': broken}, np.ones((99, 3)), timings)
+    assert executor._pool is None
+    np.testing.assert_array_equal(results['sums'], np.full(99, 3.0))
+    assert set(timings) == {'sums', 'broken'} and min(timings.values()) >= 0
+
+
+def test_unknown_kind_is_rejected():
+    """Unknown kinds, and process executors without an initializer for their workers, are rejected"""
+    with pytest.raises(ValueError):
+        InferenceExecutor('gpu')
+    with pytest.raises(ValueError):
+        InferenceExecutor('process')
+
+
+@pytest.mark.filterwarnings('ignore:This process .* is multi-threaded:DeprecationWarning')
+def test_forked_child_starts_its_own_pool():
+    """A child forked after the pool exists does not wait on the parent's dead threads"""
+    import multiprocessing
+
+    features = np.ones((400, 3))
+    executor = InferenceExecutor('thread', workers=2, min_parallel_rows=100, min_chunk_rows=50)
+    executor.run({'sums': row_sums}, features)
+    assert executor._pool is not None
+
+    def run_in_child(results):
+        results.put(executor.run({'sums': row_sums}, features)['sums'].sum())
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    child = context.Process(target=run_in_child, args=(results,))
+    try:
+        child.start()
+        assert results.get(timeout=30) == 1200.0
+        child.join(30)
+    finally:
+        if child.is_alive():
+            child.kill()
+        executor.shutdown()
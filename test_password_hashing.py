@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for password hashing and the bounded hashing pool
+"""
+import hashlib
+import threading
+
+import pytest
+
+from password_hashing import UNUSABLE_PASSWORD, HashingBusy, PasswordHasher, check_hash, make_hash
+
+
+def legacy_hash(password, salt='ab' * 16):
+    """Hash in the original salt-plus-digest format"""
+    return salt + hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000).hex()
+
+
+def test_hashes_record_their_cost():
+    """Both formats verify; weaker or legacy hashes are flagged for rehashing"""
+    hasher = PasswordHasher(iterations=2000, workers=1)
+    stored = hasher.hash('secret123')
+
+    assert stored.startswith('pbkdf2_sha256$2000$')
+    assert hasher.verify('secret123', stored) and not hasher.verify('wrong', stored)
+    assert check_hash('secret123', legacy_hash('secret123'))
+    assert not check_hash('', UNUSABLE_PASSWORD)
+
+    assert not hasher.needs_rehash(stored)
+    assert hasher.needs_rehash(make_hash('secret123', 1000))
+    assert hasher.needs_rehash(legacy_hash('secret123'))
+    assert not hasher.needs_rehash(UNUSABLE_PASSWORD)
+
+
+def test_full_queue_rejects_with_backpressure():
+    """Beyond workers + max_queue waiting hashes, callers are turned away"""
+    hasher = PasswordHasher(workers=1, max_queue=1, wait_timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return 'done'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(hasher._submit(blocking))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(5)
+
+    with pytest.raises(HashingBusy):
+        hasher.hash('secret123')
+    stats = hasher.stats()
+    assert stats['rejected'] == 1 and stats['running'] == 1
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['done', 'done']
+    assert hasher.stats()['queue_depth'] == 0
+
+
+def test_stats_track_completed_hashes():
+    hasher = PasswordHasher(iterations=1000, workers=2)
+    for _ in range(3):
+        hasher.hash('secret123')
+    stats = hasher.stats()
+    assert stats['completed'] == 3 and stats['queue_depth'] == 0 and stats['running'] == 0
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-process prediction cache
+"""
+import time
+
+from prediction_cache import PredictionCache
+
+
+def test_lru_eviction_and_counters():
+    """The least recently used entry is evicted once the cache is full"""
+    cache = PredictionCache(max_size=2, ttl=0)
+    cache.put('accra', 1, 'v1')
+    cache.put('kumasi', 2, 'v1')
+    assert cache.get('accra', 'v1') == 1  # accra is now most recently used
+    cache.put('tamale', 3, 'v1')
+
+    assert cache.get('kumasi', 'v1') is None
+    assert cache.get('accra', 'v1') == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (2, 1, 1)
+
+
+def test_fifo_ignores_reads():
+    """FIFO eviction drops the oldest insert even if it was just read"""
+    cache = PredictionCache(max_size=2, ttl=0, policy='fifo')
+    cache.put('accra', 1, 'v1')
+    cache.put('kumasi', 2, 'v1')
+    cache.get('accra', 'v1')
+    cache.put('tamale', 3, 'v1')
+    assert cache.get('accra', 'v1') is None
+
+
+def test_ttl_and_model_version_invalidation():
+    """Entries expire after the TTL and are dropped when the model version changes"""
+    cache = PredictionCache(max_size=10, ttl=0.01)
+    cache.put('accra', 1, 'v1')
+    time.sleep(0.02)
+    assert cache.get('accra', 'v1') is None
+    assert cache.stats()['expirations'] == 1
+
+    cache.put('accra', 1, 'v1')
+    assert cache.get('accra', 'v2') is None
+    assert cache.stats()['invalidations'] == 1
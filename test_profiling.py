@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for opt-in request profiling and the profile ring buffer
+"""
+import pstats
+import time
+
+from flask import Flask
+
+from profiling import ProfileStore, RequestProfiler
+
+
+def write_text(text):
+    def write(path):
+        with open(path, 'w') as f:
+            f.write(text)
+    return write
+
+
+def test_store_keeps_only_the_newest_profiles(tmp_path):
+    """Saving past max_profiles deletes the oldest profiles, and ids outside the store are rejected"""
+    store = ProfileStore(str(tmp_path / 'profiles'), max_profiles=3)
+    assert store.list() == [] and not (tmp_path / 'profiles').exists()
+    ids = [store.save('collapsed', write_text(f'main {i}\n'), {'path': f'/{i}'}) for i in range(5)]
+
+    assert [profile['id'] for profile in store.list()] == ids[:1:-1]
+    assert store.get(ids[0]) is None
+    path, metadata = store.get(ids[-1])
+    assert metadata['path'] == '/4' and open(path).read() == 'main 4\n'
+    assert store.get('../../etc/passwd') is None
+    assert len(list((tmp_path / 'profiles').iterdir())) == 6
+
+
+def profiled_app(tmp_path, **options):
+    app = Flask(__name__)
+    profiler = RequestProfiler(ProfileStore(str(tmp_path)), token='secret', sampler_interval=0.001, **options)
+    profiler.init_app(app)
+
+    @app.route('/fast')
+    def fast():
+        return 'ok'
+
+    @app.route('/slow')
+    def slow():
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        return 'ok'
+
+    return app, profiler
+
+
+def test_header_with_token_captures_cprofile(tmp_path):
+    """Only the correct token in the profile header records a cProfile profile"""
+    app, profiler = profiled_app(tmp_path)
+    client = app.test_client()
+    client.get('/fast', headers={'X-Profile': 'wrong'})
+    client.get('/fast')
+    assert profiler.store.list() == []
+
+    client.get('/slow', headers={'X-Profile': 'secret'})
+    [profile] = profiler.store.list()
+    assert profile['trigger'] == 'header' and profile['format'] == 'pstats'
+    stats = pstats.Stats(profiler.store.get(profile['id'])[0])
+    assert any(function == 'slow' for _, _, function in stats.stats)
+
+
+def test_slow_requests_keep_collapsed_stacks(tmp_path):
+    """With slow_ms set, only requests over the threshold keep their sampled stacks"""
+    app, profiler = profiled_app(tmp_path, slow_ms=20)
+    client = app.test_client()
+    client.get('/fast')
+    client.get('/slow')
+
+    [profile] = profiler.store.list()
+    assert profile['endpoint'] == 'slow' and profile['trigger'] == 'slow' and profile['format'] == 'collapsed'
+    lines = open(profiler.store.get(profile['id'])[0]).read().splitlines()
+    assert any('slow (test_profiling.py' in line.rsplit(' ', 1)[0] for line in lines)
+    assert all(int(line.rsplit(' ', 1)[1]) > 0 for line in lines)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Tests for the raster mesh and encoding helpers
+"""
+import io
+
+import numpy as np
+import pytest
+
+from raster import encode_raster, parse_bbox, raster_mesh, raster_shape
+
+
+def test_mesh_covers_bbox_north_first():
+    """Cell centres start at the north-west corner and step by the resolution"""
+    bounds = (5.0, -1.0, 6.0, 0.5)
+    assert raster_shape(bounds, 0.1) == (10, 15)
+
+    latitudes, longitudes = raster_mesh(bounds, 0.1)
+    assert latitudes.shape == longitudes.shape == (150,)
+    assert np.isclose(latitudes[0], 5.95) and np.isclose(longitudes[0], -0.95)
+    assert np.isclose(latitudes[-1], 5.05) and np.isclose(longitudes[-1], 0.45)
+
+
+def test_parse_bbox_rejects_bad_input():
+    """Malformed or inverted boxes raise ValueError"""
+    assert parse_bbox('4.5,-3.5,11.5,1.5') == (4.5, -3.5, 11.5, 1.5)
+    for text in ['4,-3,11', '4,-3,11,x', '11,-3,4,1', 'nan,-3,11,1']:
+        with pytest.raises(ValueError):
+            parse_bbox(text)
+
+
+def test_encode_raster_round_trips():
+    """Encoded rasters load back with np.load at the requested precision"""
+    layers = np.linspace(0, 40, 24, dtype=np.float32).reshape(2, 3, 4)
+    decoded = np.load(io.BytesIO(encode_raster(layers)))
+    assert decoded.dtype == np.float16 and decoded.shape == (2, 3, 4)
+    assert np.allclose(decoded, layers, atol=0.02)
+    assert np.load(io.BytesIO(encode_raster(layers, 'float32'))).dtype == np.float32
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for asynchronous, sampled request logging
+"""
+import io
+import json
+import logging
+
+from flask import Flask
+
+from request_logging import RequestLogger, annotate_request, parse_sample_rates, setup_async_logging
+
+
+def test_records_are_written_as_json_by_the_listener():
+    """Arguments are formatted by the writer thread and extra fields become JSON keys"""
+    target = logging.getLogger('test_request_logging.async')
+    target.propagate = False
+    stream = io.StringIO()
+
+    listener = setup_async_logging(logging.INFO, stream, target)
+    assert setup_async_logging(logging.INFO, stream, target) is None  # Already configured
+    target.debug('hidden %s', 1)
+    target.info('predicted %d rows', 12, extra={'endpoint': 'predict_weather'})
+    listener.stop()
+    target.handlers.clear()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry['message'] == 'predicted 12 rows'
+    assert entry['level'] == 'INFO' and entry['endpoint'] == 'predict_weather'
+
+
+def test_parse_sample_rates():
+    """Rates are clamped to [0, 1] and empty items are ignored"""
+    assert parse_sample_rates('predict_weather=0.1, static=0,,loud=5') == {
+        'predict_weather': 0.1, 'static': 0.0, 'loud': 1.0
+    }
+    assert parse_sample_rates('') == {}
+
+
+def test_one_sampled_record_per_request(caplog):
+    """Unsampled routes are silent except for server errors, and annotations are included"""
+    app = Flask(__name__)
+    RequestLogger({'quiet': 0.0}, default_rate=1.0).init_app(app)
+
+    @app.route('/quiet')
+    def quiet():
+        return 'ok'
+
+    @app.route('/broken')
+    def broken():
+        return 'broken', 500
+
+    @app.route('/annotated')
+    def annotated():
+        annotate_request(location='Accra', cache_hit=True)
+        return 'ok'
+
+    client = app.test_client()
+    with caplog.at_level(logging.INFO, logger='request_logging'):
+        client.get('/quiet')
+        client.get('/broken')
+        client.get('/annotated')
+
+    records = [record for record in caplog.records if record.name == 'request_logging']
+    assert [record.endpoint for record in records] == ['broken', 'annotated']
+    assert records[0].levelno == logging.ERROR and records[0].sample_rate == 1.0
+    assert records[1].location == 'Accra' and records[1].cache_hit is True
+    assert records[1].duration_ms >= 0
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for the region and climate-zone grid indexes
+"""
+import numpy as np
+
+from spatial import CLIMATE_ZONES, NearestCityIndex, _points_in_polygon, climate_zone_index, haversine_km, region_index
+
+
+def test_climate_zones_follow_latitude_bands():
+    """Zones split at 6°N and 8°N everywhere, including outside the grid"""
+    latitudes = np.array([-20.0, 4.9, 5.999999, 6.0, 7.5, 8.0, 11.0, 40.0])
+    longitudes = np.array([0.0, -2.0, 50.0, -1.0, 1.9, -10.0, 0.0, 0.0])
+    expected = ['coastal', 'coastal', 'coastal', 'forest', 'forest', 'savanna', 'savanna', 'savanna']
+
+    zones = climate_zone_index.classify_many(latitudes, longitudes)
+    assert [CLIMATE_ZONES[zone] for zone in zones] == expected
+    assert [climate_zone_index.classify(lat, lon) for lat, lon in zip(latitudes, longitudes)] == expected
+
+
+def test_regions_of_known_cities():
+    """Regional capitals fall in their own region, points outside Ghana in none"""
+    capitals = {
+        'Greater Accra': (5.6037, -0.1870),
+        'Ashanti': (6.6885, -1.6244),
+        'Northern': (9.4034, -0.8424),
+        'Upper East': (10.7856, -0.8514),
+        'Upper West': (10.0601, -2.5099),
+        'Western': (4.9344, -1.7133),
+        'Central': (5.1053, -1.2466),
+        'Eastern': (6.0940, -0.2571),
+        'Volta': (6.6111, 0.4708),
+        'Brong Ahafo': (7.3386, -2.3265),
+    }
+    for region, (lat, lon) in capitals.items():
+        assert region_index.classify(lat, lon) == region
+    assert region_index.classify(14.0, -1.0, default='Ghana') == 'Ghana'
+
+
+def test_grid_matches_direct_polygon_tests():
+    """The grid answers exactly what testing every polygon would"""
+    rng = np.random.default_rng(0)
+    latitudes = rng.uniform(4.0, 11.5, 20000)
+    longitudes = rng.uniform(-3.5, 1.5, 20000)
+    # Include points exactly on cell borders
+    latitudes[:2000] = np.round(latitudes[:2000] * 16) / 16
+    longitudes[:2000] = np.round(longitudes[:2000] * 16) / 16
+
+    expected = np.full(len(latitudes), -1)
+    for index, vertices in enumerate(region_index.polygons):
+        expected[_points_in_polygon(latitudes, longitudes, vertices)] = index
+
+    np.testing.assert_array_equal(region_index.classify_many(latitudes, longitudes), expected)
+    assert [region_index._classify_point(lat, lon) for lat, lon in zip(latitudes[:500], longitudes[:500])] == expected[:500].tolist()
+
+
+def test_nearest_city_matches_brute_force():
+    """The KD-tree returns the great-circle nearest city, first listed on duplicates"""
+    rng = np.random.default_rng(0)
+    cities = {f'city{i}': (lat, lon) for i, (lat, lon) in
+              enumerate(zip(rng.uniform(4, 12, 300), rng.uniform(-4, 2, 300)))}
+    cities['duplicate'] = cities['city7']
+    index = NearestCityIndex(cities)
+
+    for lat, lon in zip(rng.uniform(3, 13, 200), rng.uniform(-5, 3, 200)):
+        key, distance = index.nearest(lat, lon)
+        expected = min(cities, key=lambda name: haversine_km(lat, lon, *cities[name]))
+        assert distance == haversine_km(lat, lon, *cities[expected])
+        assert key != 'duplicate'
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for tile geometry, encoding and the on-disk tile cache
+"""
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from tiles import TileCache, colourize, encode_png, tile_bounds, tile_pixel_centres, tiles_covering
+
+
+def test_tiles_covering_ghana():
+    """Covering tiles intersect the box and pixel centres lie inside their tile"""
+    bounds = (4.0, -4.0, 12.0, 2.0)
+    tiles = tiles_covering(bounds, 7)
+    assert len(tiles) == 12
+
+    for x, y in tiles:
+        min_lat, min_lon, max_lat, max_lon = tile_bounds(7, x, y)
+        assert min_lat < bounds[2] and max_lat > bounds[0] and min_lon < bounds[3] and max_lon > bounds[1]
+
+        latitudes, longitudes = tile_pixel_centres(7, x, y)
+        assert (latitudes[:-1, 0] > latitudes[1:, 0]).all()
+        assert min_lat < latitudes.min() and latitudes.max() < max_lat
+        assert min_lon < longitudes.min() and longitudes.max() < max_lon
+
+
+def test_encode_png_is_valid():
+    """The PNG stream decodes back to the colour-mapped pixels"""
+    values = np.array([[0.0, 50.0], [100.0, np.nan]])
+    rgba = colourize(values, (0.0, 100.0))
+    assert rgba[1, 1, 3] == 0 and (rgba[:, :, 3].ravel()[:3] == 255).all()
+
+    png = encode_png(rgba)
+    assert png[:8] == b'\x89PNG\r\n\x1a\n'
+    width, height = struct.unpack('>II', png[16:24])
+    assert (width, height) == (2, 2)
+
+    idat_length = struct.unpack('>I', png[33:37])[0]
+    raw = np.frombuffer(zlib.decompress(png[41:41 + idat_length]), dtype=np.uint8).reshape(2, 9)
+    assert (raw[:, 0] == 0).all()
+    assert (raw[:, 1:].reshape(2, 2, 4) == rgba).all()
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Writes past the limit drop the tiles read least recently"""
+    cache = TileCache(str(tmp_path), 3500)
+    for index in range(3):
+        cache.put(('v1', 'Tmax', f'{index}.png'), b'x' * 1000)
+        os.utime(cache.path(('v1', 'Tmax', f'{index}.png')), (index, index))
+
+    assert cache.get(('v1', 'Tmax', '0.png')) == b'x' * 1000
+    cache.put(('v1', 'Tmax', '3.png'), b'x' * 1000)
+
+    assert cache.get(('v1', 'Tmax', '1.png')) is None
+    assert cache.get(('v1', 'Tmax', '0.png')) is not None
+    assert cache.get(('v1', 'Tmax', '3.png')) is not None
+    assert cache.evictions == 1
+
+
+def test_overwritten_tiles_are_counted_once(tmp_path):
+    """Re-rendering a cached tile replaces its bytes in the size estimate instead of adding to them"""
+    cache = TileCache(str(tmp_path), 3500)
+    cache.put(('v1', 'Tmax', '0.png'), b'x' * 1000)
+    for _ in range(5):
+        cache.put(('v1', 'Tmax', '1.png'), b'x' * 1000)
+    cache.put(('v1', 'Tmax', '1.png'), b'x' * 600)
+
+    assert cache._size == 1600
+    assert cache.evictions == 0
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled user database
+"""
+import sqlite3
+import threading
+
+import pytest
+
+from user_db import UserDatabase
+
+
+def make_db(tmp_path, **kwargs):
+    db = UserDatabase(str(tmp_path / 'users.db'), **kwargs)
+    db.create_schema()
+    return db
+
+
+def test_users_and_profiles(tmp_path):
+    """Created users are found by email, get default preferences and reject duplicates"""
+    db = make_db(tmp_path)
+    user_id = db.create_user('Ama', 'ama@example.com', 'hash')
+
+    assert db.find_user('ama@example.com') == (user_id, 'Ama', 'ama@example.com', 'hash', 1)
+    assert db.find_user('kofi@example.com') is None
+    with pytest.raises(sqlite3.IntegrityError):
+        db.create_user('Ama again', 'ama@example.com', 'hash')
+
+    db.record_login(user_id)
+    name, email, _, last_login, locations, temperature_unit, wind_unit = db.get_profile(user_id)
+    assert (name, locations, temperature_unit, wind_unit) == ('Ama', '', 'celsius', 'kmh')
+    assert last_login is not None
+
+
+def test_connections_are_pooled_in_wal_mode(tmp_path):
+    """A released connection is handed out again and runs in WAL mode"""
+    db = make_db(tmp_path, pool_size=1)
+    with db.connection() as first:
+        assert first.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    with db.connection() as second:
+        assert second is first
+        # Beyond the pool size, extra connections are opened and then closed
+        with db.connection() as third:
+            assert third is not first
+
+    with pytest.raises(RuntimeError):
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO users (name, email, password_hash) VALUES ('x', 'x@example.com', 'h')")
+            raise RuntimeError('abort')
+    assert db.find_user('x@example.com') is None
+
+
+def test_concurrent_logins_do_not_lock(tmp_path):
+    """Bursts of read-then-write logins from many threads all succeed"""
+    db = make_db(tmp_path)
+    user_ids = [db.create_user(f'User {i}', f'user{i}@example.com', 'hash') for i in range(8)]
+    errors = []
+
+    def login_repeatedly(user_id, email):
+        try:
+            for _ in range(25):
+                assert db.find_user(email)[0] == user_id
+                db.record_login(user_id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=login_repeatedly, args=(user_id, f'user{i}@example.com'))
+               for i, user_id in enumerate(user_ids)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_history_pages_by_keyset(tmp_path):
+    """Pages follow each other newest first without gaps or repeats, per user"""
+    db = make_db(tmp_path)
+    rows = [(1, f'City {i}', '2024-08-15', '{}', f'2024-08-15 10:00:{i // 3:02d}.000000') for i in range(10)]
+    db.add_forecasts(rows + [(2, 'Elsewhere', '2024-08-15', '{}', '2024-08-15 11:00:00.000000')])
+
+    seen, before = [], None
+    while True:
+        page = db.forecast_history(1, 4, before)
+        seen.extend(row[1] for row in page)
+        if len(page) < 4:
+            break
+        before = (page[-1][4], page[-1][0])
+
+    assert seen == [f'City {i}' for i in reversed(range(10))]
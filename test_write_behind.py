@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the write-behind buffer
+"""
+import threading
+import time
+
+from write_behind import WriteBehindBuffer
+
+
+def test_rows_are_batched_in_the_background():
+    """Rows added within one interval are written in one flush call"""
+    batches = []
+    written = threading.Event()
+
+    def flush(rows):
+        batches.append(list(rows))
+        written.set()
+
+    buffer = WriteBehindBuffer(flush, interval=0.2)
+    for row in range(10):
+        assert buffer.add(row)
+    assert written.wait(5)
+    buffer.close()
+
+    assert batches == [list(range(10))]
+    assert buffer.written == 10 and buffer.batches == 1
+
+
+def test_full_buffer_drops_rows_instead_of_blocking():
+    """Once max_pending rows are waiting, further rows are dropped and counted"""
+    release = threading.Event()
+    buffer = WriteBehindBuffer(lambda rows: release.wait(5), interval=60, max_pending=3)
+    results = [buffer.add(row) for row in range(5)]
+    assert results == [True, True, True, False, False]
+    assert buffer.dropped == 2
+    release.set()
+    buffer.close()
+
+
+def test_close_writes_remaining_rows_and_survives_errors():
+    """Closing flushes what is left; a failing flush is counted, not raised"""
+    batches = []
+    buffer = WriteBehindBuffer(batches.append, interval=60, max_batch=1000)
+    buffer.add('a')
+    buffer.add('b')
+    start = time.time()
+    buffer.close()
+    assert time.time() - start < 5
+    assert [row for batch in batches for row in batch] == ['a', 'b']
+
+    def broken(rows):
+        raise RuntimeError('disk full')
+
+    failing = WriteBehindBuffer(broken, interval=0.01)
+    failing.add('c')
+    failing.close()
+    assert failing.failed == 1
@@ -0,0 +1,234 @@
+"""
+Slippy-map forecast tiles and their on-disk cache
+
+Tiles follow the usual Web Mercator z/x/y scheme: at zoom z the world is
+split into 2**z by 2**z tiles, x counting east from 180°W and y south from
+about 85°N. Each tile is TILE_SIZE pixels square and is rendered either as a
+colour-mapped PNG (transparent where there is no forecast) or as a raw
+float16 .npy array in display units.
+
+Rendered tiles are kept in a TileCache: one file per tile under a directory
+per model version, bounded in total size by evicting the least recently
+used files (by modification time, refreshed on every hit).
+"""
+import hashlib
+import io
+import logging
+import math
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+
+TILE_FORMATS = ('png', 'npy')
+
+# Display-unit range mapped onto the colour ramp for each layer
+TILE_VALUE_RANGES = {
+    'Tmax': (15.0, 45.0),
+    'Tmin': (10.0, 35.0),
+    'Rainfall': (0.0, 50.0),
+    'Relative_Humidity': (0.0, 100.0),
+    'Wind_Speed': (0.0, 40.0),
+}
+
+# Colour ramp from the low to the high end of a layer's range
+COLOUR_STOPS = np.array([
+    [49, 54, 149],
+    [69, 117, 180],
+    [171, 217, 233],
+    [255, 255, 191],
+    [253, 174, 97],
+    [215, 48, 39],
+    [165, 0, 38],
+], dtype=np.float64)
+
+# Eviction trims the cache to this fraction of its limit so it does not run on every write
+EVICTION_LOW_WATER = 0.9
+
+def tile_bounds(z, x, y):
+    """(min_lat, min_lon, max_lat, max_lon) covered by a tile"""
+    n = 2 ** z
+    min_lon = x / n * 360.0 - 180.0
+    max_lon = (x + 1) / n * 360.0 - 180.0
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return min_lat, min_lon, max_lat, max_lon
+
+def tiles_covering(bounds, z):
+    """(x, y) of every tile at zoom z that intersects a (min_lat, min_lon, max_lat, max_lon) box"""
+    min_lat, min_lon, max_lat, max_lon = bounds
+    n = 2 ** z
+
+    def tile_x(lon):
+        return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+    def tile_y(lat):
+        lat_rad = math.radians(lat)
+        return min(n - 1, max(0, int((1 - math.asinh(math.tan(lat_rad)) / math.pi) / 2 * n)))
+
+    return [
+        (x, y)
+        for x in range(tile_x(min_lon), tile_x(max_lon) + 1)
+        for y in range(tile_y(max_lat), tile_y(min_lat) + 1)
+    ]
+
+def tile_pixel_centres(z, x, y, size=TILE_SIZE):
+    """Latitudes and longitudes of every pixel centre, each of shape (size, size), top row first"""
+    n = 2 ** z
+    offsets = (np.arange(size) + 0.5) / size
+    longitudes = (x + offsets) / n * 360.0 - 180.0
+    latitudes = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    return np.meshgrid(latitudes, longitudes, indexing='ij')
+
+def colourize(values, value_range):
+    """Map a 2-D array onto the colour ramp as RGBA bytes, NaN becoming transparent"""
+    low, high = value_range
+    position = np.clip((values - low) / (high - low), 0.0, 1.0) * (len(COLOUR_STOPS) - 1)
+    position = np.nan_to_num(position)
+
+    stop = np.minimum(position.astype(np.intp), len(COLOUR_STOPS) - 2)
+    fraction = (position - stop)[..., np.newaxis]
+    rgb = COLOUR_STOPS[stop] * (1 - fraction) + COLOUR_STOPS[stop + 1] * fraction
+
+    rgba = np.empty(values.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = np.round(rgb)
+    rgba[..., 3] = np.where(np.isnan(values), 0, 255)
+    return rgba
+
+def encode_png(rgba):
+    """Encode an (height, width, 4) uint8 array as a PNG"""
+    height, width = rgba.shape[:2]
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    # Every scanline is prefixed with filter type 0 (none)
+    scanlines = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = rgba.reshape(height, width * 4)
+
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)),
+        chunk(b'IDAT', zlib.compress(scanlines.tobytes(), 6)),
+        chunk(b'IEND', b''),
+    ])
+
+def encode_tile(target, values, tile_format):
+    """Encode a tile's display-unit values in the requested format"""
+    if tile_format == 'png':
+        return encode_png(colourize(values, TILE_VALUE_RANGES.get(target, (0.0, 100.0))))
+    buffer = io.BytesIO()
+    np.save(buffer, values.astype(np.float16), allow_pickle=False)
+    return buffer.getvalue()
+
+def tile_etag(data):
+    """Strong ETag for a tile's bytes"""
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+class TileCache:
+    """Size-bounded directory of rendered tiles, evicting the least recently used"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        # Bytes on disk: measured on the first write, then kept up to date with this
+        # process's writes and re-measured on eviction (other workers write too)
+        self._size = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def path(self, key):
+        """File holding the tile for a key tuple such as (model, date, target, z, x, y.ext)"""
+        return os.path.join(self.directory, *(str(part) for part in key))
+
+    def get(self, key):
+        """Cached tile bytes, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Mark as recently used for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store tile bytes, evicting old tiles if the cache grows past its limit"""
+        if not self.enabled:
+            return
+
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+
+        with self._lock:
+            # A re-rendered tile replaces the existing file, whose bytes are already counted
+            try:
+                replaced_size = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced_size = 0
+            os.replace(tmp_path, path)
+
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += len(data) - replaced_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        """(mtime, size, path) of every cached tile"""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _evict(self):
+        """Delete the least recently used tiles until under the low-water mark (lock must be held)"""
+        files = sorted(self._scan())
+        size = sum(file_size for _, file_size, _ in files)
+        target = self.max_bytes * EVICTION_LOW_WATER
+
+        for _, file_size, path in files:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+            self.evictions += 1
+
+        self._size = size
+        logger.info("✓ Tile cache trimmed to %d bytes (%d tiles evicted so far)", size, self.evictions)
@@ -0,0 +1,287 @@
+"""
+Compile scikit-learn gradient boosting ensembles into flat NumPy arrays
+
+Every tree of an ensemble is concatenated into contiguous feature, threshold,
+left, right and value arrays. Prediction uses the QuickScorer bitvector
+scheme on top of those arrays: for each feature a single searchsorted finds
+every split the row fails, the precomputed leaf masks of those splits are
+ANDed together per tree, and the lowest surviving bit is the exit leaf. This
+skips sklearn's per-call input validation and per-stage iteration.
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows evaluated per step. The (rows x trees) leaf index and value arrays are 8 bytes per
+# element, so at 512 rows and 100 trees they stay within L2; with 4096-row chunks large
+# batches fell out of cache and ended up slower than sklearn
+PREDICT_CHUNK_ROWS = 512
+
+# Leaf masks are stored as one unsigned integer per tree, so trees may have at most 64 leaves
+MAX_LEAVES = 64
+
+# Trees with at most this many leaves look up their value directly from the leaf mask
+SMALL_TREE_LEAVES = 8
+
+def _lowest_bit_index(mask):
+    """Index of the lowest set bit of every element of an unsigned integer array"""
+    lowest = mask & (~mask + mask.dtype.type(1))
+    return np.log2(lowest.astype(np.float64)).astype(np.intp)
+
+class CompiledTreeEnsemble:
+    """Gradient boosted regression trees evaluated from flat arrays
+
+    feature, threshold, left, right and value hold every node of every tree,
+    with left/right as absolute node indices (-1 for leaves), value already
+    scaled by the learning rate, and roots the index of each tree's root.
+    scoring_tables, if given, are tables previously returned by
+    scoring_tables() (e.g. memory-mapped from an artifact) and are used
+    as they are instead of being rebuilt.
+    """
+
+    model_type = "compiled_trees"
+
+    def __init__(self, feature, threshold, left, right, value, roots, base_value, n_features, scoring_tables=None):
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.right = np.asarray(right, dtype=np.intp)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.base_value = float(base_value)
+        self.n_features_in_ = int(n_features)
+
+        if scoring_tables is None:
+            scoring_tables = self._build_scoring_tables()
+        self._load_scoring_tables(**scoring_tables)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _build_scoring_tables(self):
+        """Precompute per-feature sorted thresholds and cumulative leaf masks (see scoring_tables)"""
+        n_trees = self.n_trees
+        tree_leaves = []     # leaf node ids of each tree, left to right
+        split_masks = []     # (tree, node, mask of leaves still reachable if the split fails)
+
+        for tree, root in enumerate(self.roots):
+            leaves = []
+            # Iterative in-order walk; the leaves of a node's left subtree are
+            # exactly those numbered between entering and leaving that subtree
+            stack = [(root, False)]
+            pending = {}
+            while stack:
+                node, visited = stack.pop()
+                if self.left[node] == -1:
+                    leaves.append(node)
+                elif not visited:
+                    pending[node] = len(leaves)
+                    stack.append((self.right[node], False))
+                    stack.append((node, True))
+                    stack.append((self.left[node], False))
+                else:
+                    first, last = pending.pop(node), len(leaves)
+                    left_bits = ((1 << (last - first)) - 1) << first
+                    split_masks.append((tree, node, ~left_bits))
+
+            if len(leaves) > MAX_LEAVES:
+                raise ValueError(f"Tree {tree} has {len(leaves)} leaves, at most {MAX_LEAVES} are supported")
+            tree_leaves.append(leaves)
+
+        max_leaves = max(len(leaves) for leaves in tree_leaves)
+        mask_dtype = np.uint8 if max_leaves <= 8 else np.uint16 if max_leaves <= 16 \
+            else np.uint32 if max_leaves <= 32 else np.uint64
+        all_bits = (1 << (8 * np.dtype(mask_dtype).itemsize)) - 1
+
+        # Leaf values padded to (trees, max_leaves)
+        leaf_values = np.zeros((n_trees, max_leaves))
+        for tree, leaves in enumerate(tree_leaves):
+            leaf_values[tree, :len(leaves)] = self.value[leaves]
+
+        # For each feature: its split thresholds in ascending order and, for every
+        # prefix of them, the AND of the masks of those splits for each tree
+        split_features, split_offsets, thresholds, prefix_masks = [], [0], [], []
+        for feature in range(self.n_features_in_):
+            splits = sorted(
+                (self.threshold[node], tree, mask & all_bits)
+                for tree, node, mask in split_masks if self.feature[node] == feature
+            )
+            if not splits:
+                continue
+            feature_masks = np.full((len(splits) + 1, n_trees), all_bits, dtype=mask_dtype)
+            for k, (_, tree, mask) in enumerate(splits):
+                feature_masks[k + 1] = feature_masks[k]
+                feature_masks[k + 1, tree] &= mask
+            split_features.append(feature)
+            split_offsets.append(split_offsets[-1] + len(splits))
+            thresholds.extend(threshold for threshold, _, _ in splits)
+            prefix_masks.append(feature_masks)
+
+        if max_leaves <= SMALL_TREE_LEAVES:
+            # Map every possible mask straight to its exit leaf value
+            masks = np.arange(1, 256)
+            exit_leaf = np.minimum(_lowest_bit_index(masks.astype(np.uint8)), max_leaves - 1)
+            value_by_mask = np.zeros((n_trees, 256))
+            value_by_mask[:, 1:] = leaf_values[:, exit_leaf]
+            value_table, table_width = value_by_mask.ravel(), 256
+        else:
+            value_table, table_width = leaf_values.ravel(), max_leaves
+
+        return {
+            'split_features': np.array(split_features, dtype=np.intp),
+            'split_offsets': np.array(split_offsets, dtype=np.intp),
+            'split_thresholds': np.array(thresholds, dtype=np.float64),
+            'prefix_masks': np.concatenate(prefix_masks) if prefix_masks else np.full((0, n_trees), all_bits, dtype=mask_dtype),
+            'value_table': value_table,
+            'table_offsets': np.arange(n_trees, dtype=np.intp) * table_width,
+            'mask_is_index': max_leaves <= SMALL_TREE_LEAVES,
+        }
+
+    def _load_scoring_tables(self, split_features, split_offsets, split_thresholds, prefix_masks,
+                             value_table, table_offsets, mask_is_index):
+        """Wrap flat scoring tables in per-feature views, without copying them
+
+        Feature i's thresholds are split_thresholds[split_offsets[i]:split_offsets[i + 1]]
+        and its prefix masks are the next (that count + 1) rows of prefix_masks.
+        """
+        self._scoring_tables = {
+            'split_features': split_features, 'split_offsets': split_offsets, 'split_thresholds': split_thresholds,
+            'prefix_masks': prefix_masks, 'value_table': value_table, 'table_offsets': table_offsets,
+            'mask_is_index': bool(mask_is_index),
+        }
+
+        self._features = []
+        for i, feature in enumerate(split_features):
+            start, end = int(split_offsets[i]), int(split_offsets[i + 1])
+            self._features.append((int(feature), split_thresholds[start:end], prefix_masks[start + i:end + i + 1]))
+
+        self._value_table = value_table
+        self._table_offsets = np.asarray(table_offsets, dtype=np.intp)
+        self._mask_is_index = bool(mask_is_index)
+        self._all_bits = prefix_masks.dtype.type(np.iinfo(prefix_masks.dtype).max)
+
+    def scoring_tables(self):
+        """Flat arrays (and the mask_is_index flag) from which predict works"""
+        return dict(self._scoring_tables)
+
+    def predict(self, X):
+        """Predict for an (N, n_features) matrix, matching sklearn's predict"""
+        # sklearn evaluates trees on float32 inputs, so do the same to take identical branches
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+
+        columns = X.T.astype(np.float64)
+        if X.shape[0] <= PREDICT_CHUNK_ROWS:
+            return self._predict_chunk(columns)
+        return np.concatenate([
+            self._predict_chunk(columns[:, start:start + PREDICT_CHUNK_ROWS])
+            for start in range(0, X.shape[0], PREDICT_CHUNK_ROWS)
+        ])
+
+    def _predict_chunk(self, columns):
+        mask = np.full((columns.shape[1], self.n_trees), self._all_bits)
+        for feature, thresholds, prefix_masks in self._features:
+            # Number of splits on this feature that each row fails (x > threshold)
+            failed = np.searchsorted(thresholds, columns[feature], side='left')
+            mask &= prefix_masks.take(failed, axis=0)
+
+        if self._mask_is_index:
+            index = np.add(mask, self._table_offsets, dtype=np.intp)
+        else:
+            index = _lowest_bit_index(mask)
+            index += self._table_offsets
+
+        return self.base_value + self._value_table.take(index).sum(axis=1)
+
+def _init_value(estimator):
+    """Constant initial prediction of a gradient boosting model"""
+    init = estimator.init_
+    if isinstance(init, str) and init == 'zero':
+        return 0.0
+    if hasattr(init, 'constant_'):
+        return float(np.ravel(init.constant_)[0])
+    raise ValueError(f"Cannot compile a non-constant init estimator: {type(init).__name__}")
+
+def compile_gradient_boosting(estimator):
+    """Flatten a fitted GradientBoostingRegressor into a CompiledTreeEnsemble"""
+    estimators = getattr(estimator, 'estimators_', None)
+    if estimators is None or estimators.ndim != 2 or estimators.shape[1] != 1:
+        raise ValueError(f"Only single-output gradient boosting regressors can be compiled: {type(estimator).__name__}")
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+
+    for tree_estimator in estimators[:, 0]:
+        tree = tree_estimator.tree_
+        is_leaf = tree.children_left == -1
+
+        features.append(np.where(is_leaf, -1, tree.feature))
+        thresholds.append(np.where(is_leaf, np.nan, tree.threshold))
+        lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+        rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+        values.append(tree.value[:, 0, 0] * estimator.learning_rate)
+        roots.append(offset)
+
+        offset += tree.node_count
+
+    return CompiledTreeEnsemble(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        value=np.concatenate(values),
+        roots=roots,
+        base_value=_init_value(estimator),
+        n_features=estimator.n_features_in_,
+    )
+
+def probe_matrix(compiled, n_rows=512, seed=0):
+    """Random rows spanning every split threshold, for checking a compiled model"""
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n_rows, compiled.n_features_in_))
+
+    for feature in range(compiled.n_features_in_):
+        splits = compiled.threshold[compiled.feature == feature]
+        if len(splits) == 0:
+            continue
+        margin = max(1.0, 0.1 * (splits.max() - splits.min()))
+        X[:, feature] = rng.uniform(splits.min() - margin, splits.max() + margin, n_rows)
+
+    return X
+
+def verify_compiled(estimator, compiled, X=None, rtol=1e-7, atol=1e-9):
+    """Check that a compiled ensemble reproduces the estimator's predictions"""
+    if X is None:
+        X = probe_matrix(compiled)
+    return np.allclose(compiled.predict(X), estimator.predict(X), rtol=rtol, atol=atol)
+
+def compile_models(models):
+    """Return a copy of a weather model dict with gradient boosting models compiled
+
+    Models that cannot be compiled, or whose compiled form does not match the
+    original within float tolerance, are kept as they are.
+    """
+    compiled_models = {}
+
+    for weather_type, weather_model in models.items():
+        try:
+            compiled = compile_gradient_boosting(weather_model)
+        except Exception as e:
+            logger.info(f"Not compiling {weather_type} model ({type(weather_model).__name__}): {e}")
+            compiled_models[weather_type] = weather_model
+            continue
+
+        if verify_compiled(weather_model, compiled):
+            logger.info(f"✓ Compiled {weather_type} model: {compiled.n_trees} trees, {len(compiled.value)} nodes")
+            compiled_models[weather_type] = compiled
+        else:
+            logger.warning(f"✗ Compiled {weather_type} model does not match sklearn - keeping the original")
+            compiled_models[weather_type] = weather_model
+
+    return compiled_models
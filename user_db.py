@@ -0,0 +1,201 @@
+"""
+Data access for the user database
+
+Connections are pooled per process and reused across requests, so each
+request skips the connect and pragma setup, and sqlite3's per-connection
+statement cache keeps the prepared statements below compiled. The database
+runs in WAL mode: readers never block the writer and the writer never blocks
+readers, and write transactions start with BEGIN IMMEDIATE so that two
+concurrent read-then-write transactions cannot deadlock on upgrading their
+locks (the usual source of "database is locked" under login bursts).
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Applied to every new connection
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',  # Durable across application crashes; fsyncs only at checkpoints
+    'PRAGMA cache_size=-8000',  # 8 MB page cache
+    'PRAGMA temp_store=MEMORY',
+)
+
+# Prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 128
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_login TIMESTAMP,
+        is_active BOOLEAN DEFAULT 1
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS user_preferences (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        preferred_locations TEXT,
+        temperature_unit TEXT DEFAULT 'celsius',
+        wind_unit TEXT DEFAULT 'kmh',
+        notification_settings TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS forecast_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        location TEXT NOT NULL,
+        forecast_date TIMESTAMP,
+        predictions TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+    # A user's history is read newest first; the rowid is implicitly the last index column
+    'CREATE INDEX IF NOT EXISTS idx_forecast_history_user_created ON forecast_history (user_id, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_forecast_history_created ON forecast_history (created_at)',
+)
+
+class UserDatabase:
+    """Pooled connections to the user database and the queries the auth and history routes need"""
+
+    def __init__(self, path, pool_size=8, timeout=5.0):
+        self.path = path
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Autocommit mode: transactions are opened explicitly by transaction()
+        conn = sqlite3.connect(
+            self.path, timeout=self.timeout, isolation_level=None,
+            check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of the block"""
+        with self._lock:
+            if os.getpid() != self._pid:
+                # Connections must not be shared with the parent of a fork
+                self._idle = queue.LifoQueue(maxsize=self.pool_size)
+                self._pid = os.getpid()
+            idle = self._idle
+
+        try:
+            conn = idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection inside a write transaction, committed unless the block raises"""
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def create_schema(self):
+        with self.transaction() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def find_user(self, email):
+        """(id, name, email, password_hash, is_active) for an email, or None"""
+        with self.connection() as conn:
+            return conn.execute(
+                'SELECT id, name, email, password_hash, is_active FROM users WHERE email = ?', (email,)
+            ).fetchone()
+
+    def create_user(self, name, email, password_hash):
+        """Insert a user with default preferences and return its id
+
+        Raises sqlite3.IntegrityError if the email is already registered.
+        """
+        with self.transaction() as conn:
+            user_id = conn.execute(
+                'INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)', (name, email, password_hash)
+            ).lastrowid
+            conn.execute(
+                'INSERT INTO user_preferences (user_id, preferred_locations, temperature_unit, wind_unit) VALUES (?, ?, ?, ?)',
+                (user_id, '', 'celsius', 'kmh')
+            )
+        return user_id
+
+    def record_login(self, user_id):
+        with self.transaction() as conn:
+            conn.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?', (user_id,))
+
+    def update_password_hash(self, user_id, password_hash):
+        with self.transaction() as conn:
+            conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (password_hash, user_id))
+
+    def get_profile(self, user_id):
+        """(name, email, created_at, last_login, preferred_locations, temperature_unit, wind_unit), or None"""
+        with self.connection() as conn:
+            return conn.execute('''
+                SELECT u.name, u.email, u.created_at, u.last_login,
+                       p.preferred_locations, p.temperature_unit, p.wind_unit
+                FROM users u
+                LEFT JOIN user_preferences p ON u.id = p.user_id
+                WHERE u.id = ?
+            ''', (user_id,)).fetchone()
+
+    def add_forecasts(self, rows):
+        """Insert (user_id, location, forecast_date, predictions, created_at) rows in one transaction"""
+        with self.transaction() as conn:
+            conn.executemany(
+                'INSERT INTO forecast_history (user_id, location, forecast_date, predictions, created_at) VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+
+    def forecast_history(self, user_id, limit, before=None):
+        """A user's most recent forecasts as (id, location, forecast_date, predictions, created_at) rows
+
+        Pages by keyset: before is the (created_at, id) of the last row of the previous
+        page, so every page is an index range scan however deep it is.
+        """
+        with self.connection() as conn:
+            if before is None:
+                return conn.execute('''
+                    SELECT id, location, forecast_date, predictions, created_at FROM forecast_history
+                    WHERE user_id = ?
+                    ORDER BY created_at DESC, id DESC LIMIT ?
+                ''', (user_id, limit)).fetchall()
+            return conn.execute('''
+                SELECT id, location, forecast_date, predictions, created_at FROM forecast_history
+                WHERE user_id = ? AND created_at <= ? AND (created_at < ? OR id < ?)
+                ORDER BY created_at DESC, id DESC LIMIT ?
+            ''', (user_id, before[0], before[0], before[1], limit)).fetchall()
@@ -0,0 +1,92 @@
+"""
+Write-behind buffer for rows that do not need to be stored before responding
+
+Request handlers append rows in memory and return immediately. A background
+thread waits for the first row, gives others up to `interval` seconds to
+join it (or until `max_batch` are waiting), and hands the whole batch to the
+flush function, which writes it in a single transaction. The buffer is
+bounded: if the writer falls behind, new rows are dropped and counted rather
+than blocking requests.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindBuffer:
+    """Batches rows in memory and writes them from a background thread"""
+
+    def __init__(self, flush_fn, interval=0.25, max_batch=500, max_pending=10_000):
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+
+        self._rows = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def add(self, row):
+        """Buffer a row for writing; returns False if it was dropped because the buffer is full"""
+        with self._condition:
+            if len(self._rows) >= self.max_pending:
+                self.dropped += 1
+                return False
+
+            self._rows.append(row)
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+            # The first row opens the writer's batching window, a full batch closes it early
+            if len(self._rows) == 1 or len(self._rows) >= self.max_batch:
+                self._condition.notify()
+            return True
+
+    def _take(self):
+        """Swap out the buffered rows (condition must be held)"""
+        batch, self._rows = self._rows, []
+        return batch
+
+    def _write(self, batch):
+        try:
+            self.flush_fn(batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("✗ Write-behind flush of %d rows failed: %s", len(batch), e)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._rows or self._stopped)
+                self._condition.wait_for(lambda: len(self._rows) >= self.max_batch or self._stopped, timeout=self.interval)
+                batch = self._take()
+                stopped = self._stopped
+            if batch:
+                self._write(batch)
+            if stopped:
+                return
+
+    def flush(self):
+        """Write everything buffered so far from the calling thread"""
+        with self._condition:
+            batch = self._take()
+        if batch:
+            self._write(batch)
+
+    def close(self):
+        """Stop the writer thread and write whatever is still buffered"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()